@@ -0,0 +1,116 @@
+"""
+In-process TTL caches (assembled API responses, authenticated users) and ETag helpers
+Keys are tuples; invalidate() drops every key starting with a given prefix,
+e.g. ("itineraires", depot_id) for all the days of one depot.
+Each process has its own copy: writes made by another process (worker.py,
+depot worker processes) are only seen once the entry expires, so the TTL
+bounds the staleness.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        """Cached value, or None if missing / expired."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Tuple[Hashable, ...], value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)  # least recently used
+
+    def invalidate(self, *prefix: Hashable) -> int:
+        """Drop the entries whose key starts with prefix (all of them if empty)."""
+        with self._lock:
+            keys = [k for k in self._entries if k[: len(prefix)] == prefix]
+            for k in keys:
+                del self._entries[k]
+            return len(keys)
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def payload_etag(payload: Any) -> str:
+    """Strong ETag of a JSON response body: same content, same tag, in every process."""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha1(body.encode()).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as HTTP requires for this header)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def etag_response(request: Request, response: Response, payload: Any, cache_control: str, etag: Optional[str] = None):
+    """Payload with its ETag, or an empty 304 if the client already has this version."""
+    etag = etag or payload_etag(payload)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return payload
+
+
+# Manager dashboard: list_itineraires response per (depot_id, target_day)
+itineraires_cache = TTLCache(
+    ttl_seconds=float(os.getenv("ITINERAIRES_CACHE_TTL_SECONDS", "30")),
+    max_entries=int(os.getenv("ITINERAIRES_CACHE_MAX_ENTRIES", "256")),
+)
+
+# Public tracking page: (payload, etag) per ("tracking", code_tracking)
+tracking_cache = TTLCache(
+    ttl_seconds=float(os.getenv("TRACKING_CACHE_TTL_SECONDS", "15")),
+    max_entries=int(os.getenv("TRACKING_CACHE_MAX_ENTRIES", "10000")),
+)
+
+# get_current_user: UserSnapshot per ("user", user_id)
+user_cache = TTLCache(
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000")),
+)
@@ -1,6 +1,9 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
 from dotenv import load_dotenv
 
@@ -24,6 +27,39 @@ engine = create_engine(
 # Configuration de la session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Moteur asynchrone (routes de lecture) : même base, pilote asyncpg / aiosqlite
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def _async_url(url: str) -> str:
+    """postgresql(+psycopg2|+psycopg)://... -> postgresql+asyncpg://..., sqlite -> sqlite+aiosqlite."""
+    parsed = make_url(url)
+    driver = _ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        return url
+    parsed = parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}")
+    if driver == "asyncpg" and "sslmode" in parsed.query:
+        # asyncpg prend les mêmes valeurs (require, verify-full...) sous le nom ssl
+        query = dict(parsed.query)
+        query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(query=query)
+    return parsed.render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+# Pool explicite : aiosqlite ouvrirait sinon une connexion (et un thread) par session
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20
+    )
+
+# expire_on_commit=False : un attribut expiré ne peut pas être rechargé implicitement en async
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
 # Base pour les modèles
 Base = declarative_base()
 
@@ -35,6 +71,15 @@ def get_db():
     finally:
         db.close()
 
+# Même chose pour les routes async : la connexion est rendue au pool sans passer par le threadpool
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # Fonction pour créer toutes les tables dans la base
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # create_all ne touche pas aux tables existantes : on ajoute les index déclarés depuis
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -1,43 +1,77 @@
+import logging
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from database import AsyncSessionLocal
 from models import User, UserRole
 from security import decode_token
-from typing import List
+from cache import user_cache
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+
+class UserSnapshot(NamedTuple):
+    """What endpoints need of the authenticated user; immutable, shared through user_cache."""
+    id: int
+    role: UserRole
+    depot_id: Optional[int]
+    actif: bool
+
+
+async def _load_user(user_id: int) -> Optional[UserSnapshot]:
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(User.id, User.role, User.depot_id, User.actif).where(User.id == user_id)
+        )).first()
+    return UserSnapshot(*row) if row else None
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    print("TOKEN RECU >>>", credentials.credentials)
+) -> UserSnapshot:
+    """
+    Authenticated user, from the token's user_id. The snapshot is cached for
+    USER_CACHE_TTL_SECONDS: a cache hit costs no session and no query.
+    update_user drops it; other processes see changes once it expires.
+    """
     payload = decode_token(credentials.credentials)
-    print("PAYLOAD >>>", payload)
 
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token"
         )
-    
+
     user_id = payload.get("user_id")
-    user = db.query(User).filter(User.id == user_id).first()
-    
+    cache_key = ("user", user_id)
+    user = user_cache.get(cache_key)
+    if user is None:
+        user = await _load_user(user_id)
+        if user is not None:
+            user_cache.set(cache_key, user)
+
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
-    
-    print(f"✅ USER TROUVÉ: {user.id}, ROLE: {user.role}")  # ⚠️ AJOUTEZ CECI
+
+    if not user.actif:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
+        )
+
+    logger.debug(f"Authenticated user {user.id} ({user.role})")
     return user
 
 def check_role(allowed_roles: List[UserRole]):
     """Check if user has one of the allowed roles"""
-    async def role_checker(current_user: User = Depends(get_current_user)):
+    async def role_checker(current_user: UserSnapshot = Depends(get_current_user)):
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -45,4 +79,3 @@ def check_role(allowed_roles: List[UserRole]):
             )
         return current_user
     return role_checker
-
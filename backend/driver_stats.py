@@ -0,0 +1,242 @@
+"""
+Per-driver performance figures: livraisons (total / livrées) and incidents
+Reports run a fixed number of grouped queries whatever the number of drivers.
+Days already rolled up into driver_daily_stats (nightly, by the scheduler
+leader) are read from there; later days, and livraisons with no planned date,
+come from the raw tables.
+The API writes that move a rolled-up day's figures (livraison statut update,
+livraison created on a past day, livraisons rescheduled by persist_routes)
+re-roll that day in their transaction via reroll(); a new livraison also
+re-rolls the days of its commande's incidents. Other changes (SQL by
+hand, scripts) show after the nightly run if within the last
+DRIVER_STATS_REFRESH_DAYS days, else only after a full refresh.
+A livraison counts on its date_planifiee day, an incident on its date_incident
+day, once, for the driver of the commande's latest livraison.
+The day up to which the rollup is complete is kept in driver_stats_state.
+"""
+
+import logging
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import Date, case, delete, func, select, update
+from sqlalchemy.orm import Session, aliased
+
+from models import DeliveryStatus, DriverDailyStat, DriverStatsState, Incident, Livraison, User, UserRole
+
+logger = logging.getLogger(__name__)
+
+# Days re-aggregated every night, for statuses updated after their day
+ROLLUP_REFRESH_DAYS = int(os.getenv("DRIVER_STATS_REFRESH_DAYS", "7"))
+
+_STATE_ID = 1
+
+
+def _day(column):
+    return func.date(column, type_=Date)
+
+
+def _start_of(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def _in_range(column, start: Optional[date], end: Optional[date]) -> list:
+    """Filters on a datetime column for the days start..end (inclusive, None = open)."""
+    filters = []
+    if start is not None:
+        filters.append(column >= _start_of(start))
+    if end is not None:
+        filters.append(column < _start_of(end + timedelta(days=1)))
+    return filters
+
+
+def _incident_livraison():
+    """Join condition: each incident with the latest livraison (with a driver) of its commande."""
+    other = aliased(Livraison)
+    latest = (
+        select(func.max(other.id))
+        .where(other.commande_id == Incident.commande_id, other.livreur_id.is_not(None))
+        .correlate(Incident)
+        .scalar_subquery()
+    )
+    return Livraison.id == latest
+
+
+# ----------------------------
+# Rollup
+# ----------------------------
+def rolled_through(db: Session) -> Optional[date]:
+    return db.query(DriverStatsState.rolled_through).filter(DriverStatsState.id == _STATE_ID).scalar()
+
+
+def _mark_rolled_through(db: Session, day: date) -> None:
+    result = db.execute(
+        update(DriverStatsState)
+        .where(DriverStatsState.id == _STATE_ID)
+        .values(rolled_through=day)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        db.add(DriverStatsState(id=_STATE_ID, rolled_through=day))
+
+
+def rollup(db: Session, start: date, end: date) -> int:
+    """Recompute the rows of days start..end (inclusive). Returns rows written; the caller commits."""
+    figures = defaultdict(lambda: [0, 0, 0])  # (livreur_id, jour) -> total, livrees, incidents
+
+    livraisons = (
+        select(
+            Livraison.livreur_id,
+            _day(Livraison.date_planifiee),
+            func.count(Livraison.id),
+            func.sum(case((Livraison.statut == DeliveryStatus.LIVREE, 1), else_=0)),
+        )
+        .where(Livraison.livreur_id.is_not(None), *_in_range(Livraison.date_planifiee, start, end))
+        .group_by(Livraison.livreur_id, _day(Livraison.date_planifiee))
+    )
+    for livreur_id, jour, total, livrees in db.execute(livraisons):
+        figures[(livreur_id, jour)][0] += total
+        figures[(livreur_id, jour)][1] += livrees or 0
+
+    incidents = (
+        select(Livraison.livreur_id, _day(Incident.date_incident), func.count(Incident.id))
+        .join(Livraison, _incident_livraison())
+        .where(*_in_range(Incident.date_incident, start, end))
+        .group_by(Livraison.livreur_id, _day(Incident.date_incident))
+    )
+    for livreur_id, jour, count in db.execute(incidents):
+        figures[(livreur_id, jour)][2] += count
+
+    db.execute(delete(DriverDailyStat).where(DriverDailyStat.jour >= start, DriverDailyStat.jour <= end))
+    rows = [
+        {"livreur_id": livreur_id, "jour": jour, "total": total, "livrees": livrees, "incidents": n_incidents}
+        for (livreur_id, jour), (total, livrees, n_incidents) in figures.items()
+    ]
+    if rows:
+        db.bulk_insert_mappings(DriverDailyStat, rows)
+    return len(rows)
+
+
+def reroll(db: Session, days, commande_ids=()) -> int:
+    """
+    Recompute the already rolled-up days among `days` (dates or datetimes,
+    None ignored), after livraisons of those days changed, and the days of the
+    incidents of `commande_ids` (commandes given a new livraison). Rows
+    written; the caller flushes its changes first and commits.
+    """
+    through = rolled_through(db)
+    if through is None:
+        return 0
+    days = {d.date() if isinstance(d, datetime) else d for d in days if d is not None}
+    if commande_ids:
+        days.update(
+            db.scalars(
+                select(_day(Incident.date_incident))
+                .where(Incident.commande_id.in_(set(commande_ids)), *_in_range(Incident.date_incident, None, through))
+                .distinct()
+            )
+        )
+    rows = 0
+    for day in sorted(days):
+        if day <= through:
+            rows += rollup(db, day, day)
+    return rows
+
+
+def refresh(db: Session, today: Optional[date] = None, full: bool = False) -> int:
+    """
+    Nightly job: roll up every day through yesterday. The last ROLLUP_REFRESH_DAYS
+    days are recomputed; the whole history on the first run (or full=True).
+    """
+    today = today or date.today()
+    yesterday = today - timedelta(days=1)
+    through = None if full else rolled_through(db)
+
+    if through is None:
+        first = db.query(func.min(Livraison.date_planifiee)).scalar()
+        first_incident = db.query(func.min(Incident.date_incident)).scalar()
+        firsts = [d.date() for d in (first, first_incident) if d is not None]
+        start = min(firsts) if firsts else yesterday
+    else:
+        start = min(through + timedelta(days=1), today - timedelta(days=ROLLUP_REFRESH_DAYS))
+
+    rows = 0
+    # Month by month, so the first run does not hold the whole history in memory
+    while start <= yesterday:
+        end = min(yesterday, (start.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1))
+        rows += rollup(db, start, end)
+        start = end + timedelta(days=1)
+    _mark_rolled_through(db, yesterday)
+    db.commit()
+    logger.info(f"Driver daily stats rolled up through {yesterday}: {rows} rows written")
+    return rows
+
+
+# ----------------------------
+# Reports
+# ----------------------------
+def performance(
+    db: Session, depot_id: int, date_from: Optional[date] = None, date_to: Optional[date] = None
+) -> Dict[int, dict]:
+    """{livreur_id: {"total", "completees", "incidents"}} for the depot's drivers over from..to (inclusive)."""
+    figures = defaultdict(lambda: {"total": 0, "completees": 0, "incidents": 0})
+    depot_drivers = select(User.id).where(User.depot_id == depot_id, User.role == UserRole.LIVREUR)
+
+    # Pre-aggregated days
+    raw_from = date_from
+    through = rolled_through(db)
+    if through is not None and (date_from is None or date_from <= through):
+        rollup_to = through if date_to is None else min(date_to, through)
+        query = (
+            db.query(
+                DriverDailyStat.livreur_id,
+                func.sum(DriverDailyStat.total),
+                func.sum(DriverDailyStat.livrees),
+                func.sum(DriverDailyStat.incidents),
+            )
+            .filter(DriverDailyStat.livreur_id.in_(depot_drivers), DriverDailyStat.jour <= rollup_to)
+            .group_by(DriverDailyStat.livreur_id)
+        )
+        if date_from is not None:
+            query = query.filter(DriverDailyStat.jour >= date_from)
+        for livreur_id, total, livrees, n_incidents in query:
+            figures[livreur_id]["total"] += total or 0
+            figures[livreur_id]["completees"] += livrees or 0
+            figures[livreur_id]["incidents"] += n_incidents or 0
+        raw_from = rollup_to + timedelta(days=1)
+
+    if date_to is not None and raw_from is not None and raw_from > date_to:
+        return figures
+
+    # Days not rolled up yet, straight from livraisons / incidents
+    ranges = [_in_range(Livraison.date_planifiee, raw_from, date_to)]
+    if date_from is None and date_to is None and raw_from is not None:
+        # Unbounded report: livraisons without a planned date count too, as they never reach the rollup.
+        # Separate query: an OR with IS NULL would scan each driver's whole history.
+        ranges.append([Livraison.date_planifiee.is_(None)])
+    for dated in ranges:
+        livraisons = (
+            db.query(
+                Livraison.livreur_id,
+                func.count(Livraison.id),
+                func.sum(case((Livraison.statut == DeliveryStatus.LIVREE, 1), else_=0)),
+            )
+            .filter(Livraison.livreur_id.in_(depot_drivers), *dated)
+            .group_by(Livraison.livreur_id)
+        )
+        for livreur_id, total, livrees in livraisons:
+            figures[livreur_id]["total"] += total
+            figures[livreur_id]["completees"] += livrees or 0
+
+    incidents = (
+        db.query(Livraison.livreur_id, func.count(Incident.id))
+        .join(Livraison, _incident_livraison())
+        .filter(Livraison.livreur_id.in_(depot_drivers), *_in_range(Incident.date_incident, raw_from, date_to))
+        .group_by(Livraison.livreur_id)
+    )
+    for livreur_id, n_incidents in incidents:
+        figures[livreur_id]["incidents"] += n_incidents
+
+    return figures
@@ -0,0 +1,180 @@
+"""
+Optimization job queue (table optimization_jobs)
+The API only enqueues jobs; worker.py processes claim and run them, so solver
+capacity scales with the number of workers instead of the API processes.
+Claiming is atomic: SELECT ... FOR UPDATE SKIP LOCKED on PostgreSQL, a
+single conditional UPDATE elsewhere (SQLite). Each claim writes a unique token
+in worker_id, and every later write of the run is conditional on it: a worker
+whose job was requeued (stale heartbeat) and claimed elsewhere stops instead of
+overwriting the new run.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import OptimizationJob, JobStatus
+from scheduler import optimization_scheduler
+
+logger = logging.getLogger(__name__)
+
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+# A running job whose worker has not sent a heartbeat for this long is requeued
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "600"))
+
+
+def enqueue_job(db: Session, depot_id: int | None = None, created_by: int | None = None) -> OptimizationJob:
+    job = OptimizationJob(depot_id=depot_id, created_by=created_by, status=JobStatus.QUEUED, progress=0.0)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    logger.info(f"Queued optimization job {job.id} (depot {depot_id or 'all'})")
+    return job
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """Put back in the queue running jobs whose worker stopped sending heartbeats."""
+    limit = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    result = db.execute(
+        update(OptimizationJob)
+        .where(OptimizationJob.status == JobStatus.RUNNING, OptimizationJob.heartbeat_at < limit)
+        .values(status=JobStatus.QUEUED, worker_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount:
+        logger.warning(f"Requeued {result.rowcount} stale optimization job(s)")
+    return result.rowcount
+
+
+def claim_job(db: Session, worker_id: str) -> OptimizationJob | None:
+    """Atomically move the oldest queued job to running for this worker."""
+    requeue_stale_jobs(db)
+    now = datetime.utcnow()
+    claim_token = f"{worker_id}#{uuid.uuid4().hex[:8]}"
+
+    if db.get_bind().dialect.name == "postgresql":
+        job = (
+            db.query(OptimizationJob)
+            .filter(OptimizationJob.status == JobStatus.QUEUED)
+            .order_by(OptimizationJob.id)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if job is None:
+            db.rollback()
+            return None
+        job.status = JobStatus.RUNNING
+        job.worker_id = claim_token
+        job.started_at = now
+        job.heartbeat_at = now
+        db.commit()
+        db.refresh(job)
+        return job
+
+    # SQLite: one UPDATE statement takes the write lock, so only one worker wins a given row
+    oldest = (
+        select(OptimizationJob.id)
+        .where(OptimizationJob.status == JobStatus.QUEUED)
+        .order_by(OptimizationJob.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(OptimizationJob)
+        .where(OptimizationJob.id == oldest, OptimizationJob.status == JobStatus.QUEUED)
+        .values(status=JobStatus.RUNNING, worker_id=claim_token, started_at=now, heartbeat_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if not result.rowcount:
+        return None
+    return db.query(OptimizationJob).filter(OptimizationJob.worker_id == claim_token).first()
+
+
+def _update_job(job_id: int, claim_token: str, **values) -> bool:
+    """Write to the job while this claim still owns it; False once it was requeued."""
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(OptimizationJob)
+            .where(OptimizationJob.id == job_id, OptimizationJob.worker_id == claim_token)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount > 0
+    finally:
+        db.close()
+
+
+def _cancel_requested(job_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return bool(
+            db.query(OptimizationJob.cancel_requested).filter(OptimizationJob.id == job_id).scalar()
+        )
+    finally:
+        db.close()
+
+
+async def run_job(job: OptimizationJob) -> None:
+    """Run a claimed job through the scheduler's parallel depot optimization."""
+    job_id = job.id
+    claim_token = job.worker_id
+    lost = False
+    logger.info(f"Running optimization job {job_id} (depot {job.depot_id or 'all'})")
+
+    # Sync sessions, so every job write runs in a thread instead of blocking the event loop
+    async def write(**values) -> None:
+        nonlocal lost
+        if not lost and not await asyncio.to_thread(_update_job, job_id, claim_token, **values):
+            lost = True
+            logger.warning(f"Optimization job {job_id} was requeued to another worker; stopping")
+
+    async def heartbeat():
+        while not lost:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            await write(heartbeat_at=datetime.utcnow())
+
+    async def on_progress(done: int, total: int, depot_summary: dict):
+        await write(progress=done / total if total else 1.0, heartbeat_at=datetime.utcnow())
+
+    async def is_cancelled() -> bool:
+        return lost or await asyncio.to_thread(_cancel_requested, job_id)
+
+    beating = asyncio.create_task(heartbeat())
+    try:
+        summary = await optimization_scheduler.daily_optimization(
+            depot_ids=[job.depot_id] if job.depot_id is not None else None,
+            on_progress=on_progress,
+            is_cancelled=is_cancelled,
+        )
+    except Exception as e:
+        logger.exception(f"Optimization job {job_id} failed")
+        summary = {"error": str(e)}
+    finally:
+        beating.cancel()
+
+    if summary.get("error"):
+        status = JobStatus.FAILED
+    elif summary.get("cancelled"):
+        status = JobStatus.CANCELLED
+    else:
+        status = JobStatus.DONE
+    await write(
+        status=status,
+        progress=1.0,
+        result=summary,
+        error=summary.get("error"),
+        finished_at=datetime.utcnow(),
+    )
+    if not lost:
+        logger.info(f"Optimization job {job_id} {status.value}")
@@ -0,0 +1,134 @@
+"""
+Leader election for the in-process scheduler
+Every API worker starts OptimizationScheduler; a lease row (scheduler_leases)
+decides which single process runs the nightly optimization. The holder renews
+its lease periodically; if it dies, the lease expires and a standby takes over.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+# Keep the TTL well above the renew interval (and any clock skew between hosts)
+LEASE_TTL_SECONDS = float(os.getenv("SCHEDULER_LEASE_TTL_SECONDS", "60"))
+LEASE_RENEW_SECONDS = float(os.getenv("SCHEDULER_LEASE_RENEW_SECONDS", "20"))
+
+
+class LeaderLease:
+    def __init__(
+        self,
+        name: str,
+        ttl_seconds: float = LEASE_TTL_SECONDS,
+        renew_seconds: float = LEASE_RENEW_SECONDS,
+    ):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.renew_seconds = renew_seconds
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+        self._task: asyncio.Task | None = None
+
+    def try_acquire(self) -> bool:
+        """Take the lease if free or expired, renew it if already ours."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        acquired = False
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.name == self.name,
+                    or_(SchedulerLease.holder == self.holder, SchedulerLease.expires_at < now),
+                )
+                .values(holder=self.holder, expires_at=expires_at, renewed_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                db.commit()
+                acquired = True
+            elif db.query(SchedulerLease.name).filter(SchedulerLease.name == self.name).first() is None:
+                db.add(SchedulerLease(name=self.name, holder=self.holder, expires_at=expires_at, renewed_at=now))
+                try:
+                    db.commit()
+                    acquired = True
+                except IntegrityError:
+                    # Another process created the row first
+                    db.rollback()
+            else:
+                db.rollback()
+        except Exception:
+            # Cannot prove we still hold the lease: step down
+            db.rollback()
+            logger.exception(f"Lease '{self.name}': renewal failed")
+        finally:
+            db.close()
+
+        if acquired != self.is_leader:
+            logger.info(f"Lease '{self.name}': {self.holder} {'is now leader' if acquired else 'lost leadership'}")
+        self.is_leader = acquired
+        return acquired
+
+    def release(self) -> None:
+        """Expire our lease now so a standby does not wait for the TTL."""
+        if not self.is_leader:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name, SchedulerLease.holder == self.holder)
+                .values(expires_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+        self.is_leader = False
+
+    def last_run_for(self) -> str | None:
+        db = SessionLocal()
+        try:
+            return db.query(SchedulerLease.last_run_for).filter(SchedulerLease.name == self.name).scalar()
+        finally:
+            db.close()
+
+    def mark_run(self, run_key: str) -> None:
+        """Record a completed run (e.g. the date) so a standby taking over does not repeat it."""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.name == self.name)
+                .values(last_run_for=run_key)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.to_thread(self.try_acquire)
+            await asyncio.sleep(self.renew_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.release()
@@ -6,9 +6,12 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from database import init_db
-from routes import auth, users, commandes, livraisons, itineraires, reports, clients
+from database import init_db, async_engine
+from routes import auth, users, commandes, livraisons, itineraires, reports, clients, jobs
 from scheduler import optimization_scheduler
+from optimization import shutdown_executor
+from monitoring import loop_lag_monitor
+from security import shutdown_hash_executor
 
 load_dotenv()
 
@@ -30,10 +33,15 @@ async def lifespan(app: FastAPI):
     init_db()
     optimization_scheduler.start()
     logger.info("Route optimization scheduler initialized")
+    loop_lag_monitor.start()
     yield
     # Shutdown
     logger.info("Shutting down application...")
     optimization_scheduler.stop()
+    await loop_lag_monitor.stop()
+    shutdown_executor()
+    shutdown_hash_executor()
+    await async_engine.dispose()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -60,10 +68,11 @@ app.include_router(livraisons.router, prefix="/api/livraisons", tags=["Livraison
 app.include_router(itineraires.router, prefix="/api/itineraires", tags=["Itineraires"])
 app.include_router(reports.router, prefix="/api/reports", tags=["Reports"])
 app.include_router(clients.router, prefix="/api/clients", tags=["Clients"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Jobs"])
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "event_loop_lag": loop_lag_monitor.stats()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Enum, Text, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, Enum, Text, JSON, Index
+from sqlalchemy.orm import column_property, relationship
 from database import Base
 from datetime import datetime
 import enum
@@ -17,6 +17,13 @@ class DeliveryStatus(str, enum.Enum):
     LIVREE = "livree"
     ANNULEE = "annulee"
 
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
 class IncidentType(str, enum.Enum):
     ADRESSE_INVALIDE = "adresse_invalide"
     CLIENT_ABSENT = "client_absent"
@@ -44,6 +51,11 @@ class User(Base):
     depot = relationship("Depot", back_populates="users")
     livraisons = relationship("Livraison", back_populates="livreur")
 
+    __table_args__ = (
+        # Keyset pagination, newest first
+        Index("ix_users_date_creation_id", "date_creation", "id"),
+    )
+
 # ============= DEPOTS =============
 class Depot(Base):
     __tablename__ = "depots"
@@ -70,8 +82,10 @@ class Commande(Base):
     latitude = Column(Float)
     longitude = Column(Float)
     poids = Column(Float)
-    statut = Column(Enum(DeliveryStatus), default=DeliveryStatus.EN_ATTENTE)
-    depot_id = Column(Integer, ForeignKey("depots.id"))
+    # active_history: the previous value is loaded before a set, even on an expired instance,
+    # so the status counters (status_counters.py) always see the transition
+    statut = column_property(Column(Enum(DeliveryStatus), default=DeliveryStatus.EN_ATTENTE), active_history=True)
+    depot_id = column_property(Column(Integer, ForeignKey("depots.id")), active_history=True)
     client_email = Column(String, nullable=True)
     date_creation = Column(DateTime, default=datetime.utcnow)
     date_modification = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -83,6 +97,12 @@ class Commande(Base):
     livraison = relationship("Livraison", uselist=False, back_populates="commande")
     incidents = relationship("Incident", back_populates="commande")
 
+    __table_args__ = (
+        # Keyset pagination of a depot's commandes (all / by statut), newest first
+        Index("ix_commandes_depot_date_creation_id", "depot_id", "date_creation", "id"),
+        Index("ix_commandes_depot_statut_date_creation_id", "depot_id", "statut", "date_creation", "id"),
+    )
+
 # ============= LIVRAISONS =============
 class Livraison(Base):
     __tablename__ = "livraisons"
@@ -100,6 +120,14 @@ class Livraison(Base):
     commande = relationship("Commande", back_populates="livraison")
     livreur = relationship("User", back_populates="livraisons")
 
+    __table_args__ = (
+        # A driver's livraisons, newest first
+        Index("ix_livraisons_livreur_id_id", "livreur_id", "id"),
+        # Performance report: livraisons per driver over a date range
+        Index("ix_livraisons_livreur_date_planifiee", "livreur_id", "date_planifiee"),
+        Index("ix_livraisons_commande_id", "commande_id"),
+    )
+
 # ============= INCIDENTS =============
 class Incident(Base):
     __tablename__ = "incidents"
@@ -115,6 +143,11 @@ class Incident(Base):
     # Relationships
     commande = relationship("Commande", back_populates="incidents")
 
+    __table_args__ = (
+        # Keyset pagination, newest first
+        Index("ix_incidents_date_incident_id", "date_incident", "id"),
+    )
+
 # ============= ITINERAIRES =============
 class Itineraire(Base):
     __tablename__ = "itineraires"
@@ -129,3 +162,86 @@ class Itineraire(Base):
     optimise = Column(Boolean, default=False)
     date_creation = Column(DateTime, default=datetime.utcnow)
     metadonnees = Column(JSON, nullable=True)
+
+    # Relationships
+    stops = relationship(
+        "ItineraireStop",
+        back_populates="itineraire",
+        order_by="ItineraireStop.ordre",
+        cascade="all, delete-orphan",
+    )
+
+# ============= ARRÊTS D'ITINÉRAIRE =============
+class ItineraireStop(Base):
+    __tablename__ = "itineraire_stops"
+
+    id = Column(Integer, primary_key=True, index=True)
+    itineraire_id = Column(Integer, ForeignKey("itineraires.id", ondelete="CASCADE"), nullable=False)
+    commande_id = Column(Integer, ForeignKey("commandes.id"), nullable=False, index=True)
+    ordre = Column(Integer, nullable=False)  # 1 = premier arrêt
+    eta_s = Column(Integer, nullable=True)  # arrivée, en secondes depuis le départ du dépôt
+    leg_distance_m = Column(Integer, nullable=True)  # depuis l'arrêt précédent (ou le dépôt)
+    leg_time_s = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_itineraire_stops_itineraire_ordre", "itineraire_id", "ordre", unique=True),
+    )
+
+    # Relationships
+    itineraire = relationship("Itineraire", back_populates="stops")
+    commande = relationship("Commande")
+
+# ============= JOBS D'OPTIMISATION =============
+class OptimizationJob(Base):
+    __tablename__ = "optimization_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, index=True)
+    depot_id = Column(Integer, ForeignKey("depots.id"), nullable=True)  # None = tous les dépôts
+    progress = Column(Float, default=0.0)  # 0..1, dépôts terminés / dépôts
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, default=False)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    worker_id = Column(String, nullable=True)
+    date_creation = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+# ============= VERROU DU SCHEDULER =============
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String)  # processus leader (host:pid:token)
+    expires_at = Column(DateTime)
+    renewed_at = Column(DateTime)
+    last_run_for = Column(String, nullable=True)  # date du dernier run complet
+
+# ============= COMPTEURS DU DASHBOARD =============
+class DepotStatusCounter(Base):
+    __tablename__ = "depot_status_counters"
+
+    # Nombre de commandes du dépôt par statut, tenu à jour si DASHBOARD_COUNTERS=1 (voir status_counters.py)
+    depot_id = Column(Integer, ForeignKey("depots.id"), primary_key=True)
+    statut = Column(Enum(DeliveryStatus), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+# ============= STATISTIQUES JOURNALIÈRES DES LIVREURS =============
+class DriverDailyStat(Base):
+    __tablename__ = "driver_daily_stats"
+
+    # Agrégat nocturne des livraisons par livreur et par jour (voir driver_stats.py)
+    livreur_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    jour = Column(Date, primary_key=True)  # jour de date_planifiee
+    total = Column(Integer, nullable=False, default=0)
+    livrees = Column(Integer, nullable=False, default=0)
+    incidents = Column(Integer, nullable=False, default=0)  # incidents signalés ce jour-là
+
+class DriverStatsState(Base):
+    __tablename__ = "driver_stats_state"
+
+    # Une seule ligne (id = 1) : dernier jour agrégé dans driver_daily_stats
+    id = Column(Integer, primary_key=True)
+    rolled_through = Column(Date, nullable=True)
@@ -0,0 +1,69 @@
+"""
+Event-loop lag monitor
+A background task sleeps for a fixed interval and records how late it wakes up.
+Any blocking call on the loop (sync DB/HTTP work, a solver run inline...) shows
+up as lag; the stats are exposed on /health.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.1"))
+# Lag above this is logged as a warning
+LOOP_LAG_WARN_SECONDS = float(os.getenv("LOOP_LAG_WARN_SECONDS", "0.5"))
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_SECONDS, window: int = 600):
+        self.interval = interval
+        self.samples = deque(maxlen=window)  # lag (s) of the last `window` wake-ups
+        self.max_lag = 0.0
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > LOOP_LAG_WARN_SECONDS:
+                logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms")
+
+    def stats(self) -> dict:
+        """Lag percentiles (ms) over the recent window, plus the max since start."""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"samples": 0, "max_ms": round(self.max_lag * 1000, 1)}
+
+        def pct(p: float) -> float:
+            return round(ordered[min(int(p * len(ordered)), len(ordered) - 1)] * 1000, 1)
+
+        return {
+            "samples": len(ordered),
+            "p50_ms": pct(0.50),
+            "p99_ms": pct(0.99),
+            "recent_max_ms": round(ordered[-1] * 1000, 1),
+            "max_ms": round(self.max_lag * 1000, 1),
+        }
+
+
+loop_lag_monitor = LoopLagMonitor()
@@ -4,11 +4,14 @@ Notification system for emails and alerts
 
 import smtplib
 import os
+import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List
 import asyncio
 
+logger = logging.getLogger(__name__)
+
 class NotificationService:
     def __init__(self):
         self.smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
@@ -19,7 +22,7 @@ class NotificationService:
     async def send_email(self, to_email: str, subject: str, html_content: str):
         """Send email notification"""
         if not self.sender_email or not self.sender_password:
-            print(f"Email not configured, skipping: {to_email}")
+            logger.info(f"Email not configured, skipping: {to_email}")
             return
         
         try:
@@ -33,7 +36,7 @@ class NotificationService:
             # Send in background
             asyncio.create_task(self._send_smtp(to_email, message.as_string()))
         except Exception as e:
-            print(f"Error sending email: {e}")
+            logger.error(f"Error sending email: {e}")
     
     async def _send_smtp(self, to_email: str, message: str):
         """Internal SMTP sending"""
@@ -43,7 +46,7 @@ class NotificationService:
                 server.login(self.sender_email, self.sender_password)
                 server.sendmail(self.sender_email, to_email, message)
         except Exception as e:
-            print(f"SMTP error: {e}")
+            logger.error(f"SMTP error: {e}")
     
     def get_route_assigned_template(self, driver_name: str, commandes_count: int, date: str) -> str:
         """Email template for route assignment"""
@@ -1,3 +1,5 @@
 from .optimizer import RouteOptimizer
+from .matrix import TravelMatrix
+from .executor import process_context, run_optimization, shutdown_executor
 
-__all__ = ["RouteOptimizer"]
+__all__ = ["RouteOptimizer", "TravelMatrix", "process_context", "run_optimization", "shutdown_executor"]
@@ -0,0 +1,159 @@
+# optimization/cache.py
+"""
+Persistent cache of pairwise travel values (distance m, duration s).
+Keys are (lat, lon) rounded to a fixed precision, so repeat addresses and
+fixed depots hit the cache across optimization runs.
+Stored in a small SQLite file, with TTL expiry and size-bounded LRU eviction.
+"""
+
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+PairKey = Tuple[str, str]
+
+# SQLite default max host parameters is 999 on older builds
+_CHUNK = 400
+
+
+class MatrixCache:
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: int = 7 * 24 * 3600,
+        max_entries: int = 1_000_000,
+        precision: int = 5,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.precision = precision
+        self._init_db()
+
+    @classmethod
+    def from_env(cls) -> Optional["MatrixCache"]:
+        """
+        Cache configured from env vars; OSRM_CACHE_PATH="" disables it.
+        """
+        path = os.getenv("OSRM_CACHE_PATH", "osrm_matrix_cache.sqlite3")
+        if not path:
+            return None
+        return cls(
+            path,
+            ttl_seconds=int(os.getenv("OSRM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+            max_entries=int(os.getenv("OSRM_CACHE_MAX_ENTRIES", "1000000")),
+        )
+
+    # ----------------------------
+    # Storage
+    # ----------------------------
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS travel_pairs (
+                    src TEXT NOT NULL,
+                    dst TEXT NOT NULL,
+                    distance INTEGER NOT NULL,
+                    duration INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (src, dst)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_travel_pairs_last_access ON travel_pairs (last_access)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def key(self, lat: float, lon: float) -> str:
+        return f"{round(lat, self.precision):.{self.precision}f},{round(lon, self.precision):.{self.precision}f}"
+
+    # ----------------------------
+    # Lookups / writes
+    # ----------------------------
+    def get_many(self, keys: Sequence[str]) -> Dict[PairKey, Tuple[int, int]]:
+        """
+        All fresh cached pairs (src, dst) with src and dst in `keys`.
+        Hits are touched so they survive LRU eviction.
+        """
+        unique = sorted(set(keys))
+        if not unique:
+            return {}
+
+        wanted = set(unique)
+        min_created = time.time() - self.ttl_seconds
+        now = time.time()
+        found: Dict[PairKey, Tuple[int, int]] = {}
+
+        conn = self._connect()
+        try:
+            for start in range(0, len(unique), _CHUNK):
+                chunk = unique[start:start + _CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT src, dst, distance, duration FROM travel_pairs "
+                    f"WHERE src IN ({marks}) AND created_at >= ?",
+                    (*chunk, min_created),
+                ).fetchall()
+                for src, dst, distance, duration in rows:
+                    if dst in wanted:
+                        found[(src, dst)] = (distance, duration)
+
+            if found:
+                conn.executemany(
+                    "UPDATE travel_pairs SET last_access = ? WHERE src = ? AND dst = ?",
+                    [(now, src, dst) for src, dst in found],
+                )
+                conn.commit()
+        finally:
+            conn.close()
+        return found
+
+    def put_many(self, entries: Iterable[Tuple[str, str, int, int]]) -> None:
+        """Insert/refresh (src, dst, distance, duration) entries, then evict if needed."""
+        now = time.time()
+        rows: List[Tuple] = [(src, dst, int(d), int(t), now, now) for src, dst, d, t in entries]
+        if not rows:
+            return
+
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO travel_pairs (src, dst, distance, duration, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop expired entries, then least recently used ones above max_entries."""
+        conn.execute("DELETE FROM travel_pairs WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM travel_pairs").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM travel_pairs WHERE rowid IN "
+                "(SELECT rowid FROM travel_pairs ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM travel_pairs")
+            conn.commit()
+        finally:
+            conn.close()
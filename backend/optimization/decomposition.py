@@ -0,0 +1,314 @@
+# optimization/decomposition.py
+"""
+Geographic decomposition of large depots.
+Commandes are clustered (sweep angle around the depot, or k-means on lat/lon),
+drivers are split between clusters in proportion to their load, and every
+cluster is solved as an independent VRP in a process pool. The commandes a
+cluster could not fit are then offered, in one small repair solve, to the
+drivers with spare capacity. The results are merged back into the usual
+optimize() result format.
+"""
+
+import copy
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+SWEEP = "sweep"
+KMEANS = "kmeans"
+METHODS = (SWEEP, KMEANS)
+
+
+# ----------------------------
+# Clustering
+# ----------------------------
+def sweep_clusters(depot_coords: Tuple[float, float], commandes: List[Dict], k: int) -> List[List[Dict]]:
+    """
+    Sort commandes by polar angle around the depot and cut the sweep into k
+    contiguous sectors of roughly equal weight. The sweep starts after the
+    widest empty angular gap so no natural group is split at +/- pi.
+    """
+    if k <= 1 or len(commandes) <= 1:
+        return [list(commandes)]
+
+    depot_lat, depot_lon = depot_coords
+    scale = math.cos(math.radians(depot_lat))
+    angled = sorted(
+        commandes,
+        key=lambda c: math.atan2(c["latitude"] - depot_lat, (c["longitude"] - depot_lon) * scale),
+    )
+    angles = [math.atan2(c["latitude"] - depot_lat, (c["longitude"] - depot_lon) * scale) for c in angled]
+
+    gaps = [(angles[(i + 1) % len(angles)] - angles[i]) % (2 * math.pi) for i in range(len(angles))]
+    start = (max(range(len(gaps)), key=gaps.__getitem__) + 1) % len(angled)
+    angled = angled[start:] + angled[:start]
+
+    total = sum(float(c["poids"]) for c in angled) or 1.0
+    clusters: List[List[Dict]] = [[] for _ in range(k)]
+    cumulative = 0.0
+    for c in angled:
+        weight = float(c["poids"])
+        # Sector chosen by the middle of the commande's weight slice
+        index = min(int((cumulative + weight / 2) / total * k), k - 1)
+        clusters[index].append(c)
+        cumulative += weight
+    return [cluster for cluster in clusters if cluster]
+
+
+def kmeans_clusters(
+    depot_coords: Tuple[float, float],
+    commandes: List[Dict],
+    k: int,
+    iterations: int = 25,
+    seed: int = 0,
+) -> List[List[Dict]]:
+    """k-means (k-means++ init) on lat/lon, longitude scaled by cos(depot latitude)."""
+    if k <= 1 or len(commandes) <= 1:
+        return [list(commandes)]
+
+    k = min(k, len(commandes))
+    scale = math.cos(math.radians(depot_coords[0]))
+    points = np.array([[c["latitude"], c["longitude"] * scale] for c in commandes], dtype=np.float64)
+    rng = np.random.default_rng(seed)
+
+    centers = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        d2 = np.min(((points[:, None, :] - np.array(centers)[None, :, :]) ** 2).sum(axis=2), axis=1)
+        probabilities = d2 / d2.sum() if d2.sum() > 0 else None
+        centers.append(points[rng.choice(len(points), p=probabilities)])
+    centers = np.array(centers)
+
+    labels = np.zeros(len(points), dtype=np.intp)
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new_labels = distances.argmin(axis=1)
+        if np.array_equal(new_labels, labels) and _ > 0:
+            break
+        labels = new_labels
+        for j in range(k):
+            members = points[labels == j]
+            # Empty cluster: restart it on the point farthest from its center
+            centers[j] = members.mean(axis=0) if len(members) else points[distances.min(axis=1).argmax()]
+
+    clusters: List[List[Dict]] = [[] for _ in range(k)]
+    for c, label in zip(commandes, labels):
+        clusters[int(label)].append(c)
+    return [cluster for cluster in clusters if cluster]
+
+
+def allocate_drivers(clusters: List[List[Dict]], drivers: List[Dict]) -> List[List[Dict]]:
+    """
+    Split drivers between clusters in proportion to cluster weight
+    (largest remainder, at least one driver per cluster).
+    Requires len(drivers) >= len(clusters).
+    """
+    loads = [sum(float(c["poids"]) for c in cluster) for cluster in clusters]
+    total = sum(loads) or 1.0
+    spare = len(drivers) - len(clusters)
+
+    shares = [load / total * spare for load in loads]
+    counts = [1 + int(share) for share in shares]
+    leftover = len(drivers) - sum(counts)
+    by_remainder = sorted(range(len(clusters)), key=lambda i: shares[i] - int(shares[i]), reverse=True)
+    for i in by_remainder[:leftover]:
+        counts[i] += 1
+
+    allocation: List[List[Dict]] = []
+    start = 0
+    for count in counts:
+        allocation.append(drivers[start:start + count])
+        start += count
+    return allocation
+
+
+# ----------------------------
+# Solving
+# ----------------------------
+def _solve_cluster(payload: Tuple) -> Dict:
+    """Process pool entry point: solve one cluster with a copy of the caller's optimizer."""
+    optimizer, commandes, drivers, depot_coords, planning_date, kwargs = payload
+    # Copy: the in-process path must not switch off decomposition on the caller's optimizer
+    optimizer = copy.copy(optimizer)
+    optimizer.decompose = None
+    started = time.perf_counter()
+    result = optimizer.optimize(commandes, drivers, depot_coords, planning_date, **kwargs)
+    result["cluster_time_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _repair_payload(
+    optimizer,
+    commandes: List[Dict],
+    drivers: List[Dict],
+    routes: List[Dict],
+    unscheduled_ids: List[int],
+    depot_coords: Tuple[float, float],
+    planning_date: str,
+    cluster_size: int,
+    kwargs: Dict,
+) -> Tuple | None:
+    """
+    Repair solve for the commandes the clusters left out: the drivers that can still
+    take one (idle drivers first, then by spare kg) with their current stops, warm
+    started from their routes, while the solve stays within cluster_size commandes.
+    None if no driver has room.
+    """
+    by_id = {c["id"]: c for c in commandes}
+    leftovers = [by_id[cid] for cid in unscheduled_ids if cid in by_id]
+    if not leftovers:
+        return None
+    lightest = min(float(c["poids"]) for c in leftovers)
+    max_work_seconds = kwargs.get("max_work_seconds")
+    route_of = {route["driver_id"]: route for route in routes}
+
+    candidates = []
+    for driver in drivers:
+        route = route_of.get(driver["id"])
+        stops = route["commandes"] if route else []
+        spare_kg = float(driver.get("capacity_kg", 0)) - sum(float(by_id[s["commande_id"]]["poids"]) for s in stops)
+        has_time = route is None or max_work_seconds is None or route["time_s"] < max_work_seconds
+        if spare_kg >= lightest and has_time:
+            candidates.append((len(stops), -spare_kg, driver, route))
+    candidates.sort(key=lambda candidate: candidate[:2])
+
+    chosen, size = [], len(leftovers)
+    for n_stops, _, driver, route in candidates:
+        if chosen and size + n_stops > cluster_size:
+            break
+        chosen.append((driver, route))
+        size += n_stops
+    if not chosen:
+        return None
+
+    initial_routes = [route for _, route in chosen if route]
+    repair_commandes = leftovers + [by_id[s["commande_id"]] for route in initial_routes for s in route["commandes"]]
+    repair_drivers = [driver for driver, _ in chosen]
+    return (
+        optimizer,
+        repair_commandes,
+        repair_drivers,
+        depot_coords,
+        planning_date,
+        {**kwargs, "initial_routes": initial_routes or None},
+    )
+
+
+def _sum_stats(results: List[Dict], key: str, skip: Tuple[str, ...] = ()) -> Dict:
+    """Sum the numeric fields of a per-cluster stats dict."""
+    merged: Dict = {}
+    for result in results:
+        for name, value in (result.get(key) or {}).items():
+            if name in skip:
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                merged[name] = merged.get(name, 0) + value
+    return merged
+
+
+def solve_decomposed(
+    optimizer,
+    commandes: List[Dict],
+    drivers: List[Dict],
+    depot_coords: Tuple[float, float],
+    planning_date: str,
+    method: str,
+    cluster_size: int,
+    max_workers: int,
+    **kwargs,
+) -> Dict:
+    """
+    Cluster, allocate drivers, solve clusters in parallel and merge.
+    `commandes` must already have coordinates and poids.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown decomposition {method!r} (expected one of {METHODS})")
+
+    started = time.perf_counter()
+    k = max(1, min(len(drivers), math.ceil(len(commandes) / max(cluster_size, 1))))
+    cluster_fn = sweep_clusters if method == SWEEP else kmeans_clusters
+    clusters = cluster_fn(depot_coords, commandes, k)
+    allocation = allocate_drivers(clusters, drivers)
+
+    payloads = [
+        (optimizer, cluster, cluster_drivers, depot_coords, planning_date, kwargs)
+        for cluster, cluster_drivers in zip(clusters, allocation)
+    ]
+    if len(payloads) == 1 or max_workers <= 1:
+        results = [_solve_cluster(p) for p in payloads]
+    else:
+        from .executor import process_context  # executor imports the optimizer, which imports this module
+
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(payloads)), mp_context=process_context()) as pool:
+            results = list(pool.map(_solve_cluster, payloads))
+
+    routes = [route for result in results for route in result.get("routes", [])]
+    unscheduled = [cid for result in results for cid in result.get("unscheduled_ids", [])]
+    errors = [result["error"] for result in results if result.get("error")]
+
+    solved, repair = list(results), None
+    payload = _repair_payload(
+        optimizer, commandes, drivers, routes, unscheduled, depot_coords, planning_date, cluster_size, kwargs
+    )
+    if payload is not None:
+        repair_result = _solve_cluster(payload)
+        solved.append(repair_result)
+        repair_commandes, repair_drivers = payload[1], payload[2]
+        recovered = 0
+        if repair_result.get("success"):
+            already_scheduled = len(repair_commandes) - len(unscheduled)
+            recovered = repair_result["commandes_scheduled"] - already_scheduled
+        repair = {
+            "commandes": len(unscheduled),
+            "drivers": [d["id"] for d in repair_drivers],
+            "recovered": max(recovered, 0),
+            "time_s": repair_result.get("cluster_time_s"),
+            "error": repair_result.get("error"),
+        }
+        if recovered > 0:
+            # The repair routes replace the routes of its drivers
+            replaced = {d["id"] for d in repair_drivers}
+            routes = [route for route in routes if route["driver_id"] not in replaced] + repair_result["routes"]
+            unscheduled = repair_result["unscheduled_ids"]
+
+    matrix_stats = _sum_stats(solved, "matrix_stats", skip=("cache_hit_ratio",))
+    lookups = matrix_stats.get("cache_hits", 0) + matrix_stats.get("cache_misses", 0)
+    matrix_stats["cache_hit_ratio"] = round(matrix_stats["cache_hits"] / lookups, 4) if lookups else None
+
+    return {
+        "success": bool(routes),
+        **({"error": "; ".join(errors)} if errors and not routes else {}),
+        "routes": routes,
+        "total_distance_m": sum(r["distance_m"] for r in routes),
+        "total_time_s": sum(r["time_s"] for r in routes),
+        "total_vehicles_used": len(routes),
+        "planning_date": planning_date,
+        "drop_mode": results[0].get("drop_mode") if results else None,
+        "invalid_commandes_dropped": [],
+        "unscheduled_ids": unscheduled,
+        "commandes_scheduled": sum(len(r["commandes"]) for r in routes),
+        "commandes_unscheduled": len(unscheduled),
+        "matrix_stats": matrix_stats,
+        "solver_stats": {
+            **_sum_stats(solved, "solver_stats", skip=("deadline",)),
+            "deadline": kwargs.get("deadline"),
+        },
+        "decomposition": {
+            "method": method,
+            "wall_time_s": round(time.perf_counter() - started, 3),
+            "clusters": [
+                {
+                    "commandes": len(cluster),
+                    "drivers": [d["id"] for d in cluster_drivers],
+                    "commandes_scheduled": result.get("commandes_scheduled", 0),
+                    "distance_m": result.get("total_distance_m", 0),
+                    "time_s": result.get("cluster_time_s"),
+                    "error": result.get("error"),
+                }
+                for cluster, cluster_drivers, result in zip(clusters, allocation, results)
+            ],
+            "repair": repair,
+        },
+    }
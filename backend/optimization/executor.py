@@ -0,0 +1,67 @@
+# optimization/executor.py
+"""
+Runs RouteOptimizer.optimize off the event loop.
+A solve blocks for seconds to minutes (OSRM requests + OR-Tools search), so
+async endpoints and the scheduler await it in a dedicated executor instead
+of calling it inline; a semaphore bounds how many solves run at once.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict
+
+from .optimizer import RouteOptimizer
+
+logger = logging.getLogger(__name__)
+
+# "process" (default) or "thread"
+OPTIMIZER_EXECUTOR = os.getenv("OPTIMIZER_EXECUTOR", "process")
+# Max concurrent solves per API process
+OPTIMIZER_CONCURRENCY = int(os.getenv("OPTIMIZER_CONCURRENCY", "2"))
+
+_executor: Executor | None = None
+_semaphore = asyncio.Semaphore(OPTIMIZER_CONCURRENCY)
+
+
+def process_context():
+    """
+    Start method of the worker process pools: forkserver (spawn where it does
+    not exist), never fork. The API process runs many threads (scheduler,
+    threadpools, hashing pool, DB drivers): a forked child can inherit a lock
+    one of them held, e.g. a logging handler's, and deadlock on it.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if OPTIMIZER_EXECUTOR == "thread":
+            _executor = ThreadPoolExecutor(max_workers=OPTIMIZER_CONCURRENCY, thread_name_prefix="optimizer")
+        else:
+            _executor = ProcessPoolExecutor(max_workers=OPTIMIZER_CONCURRENCY, mp_context=process_context())
+        logger.info(f"Optimizer executor: {OPTIMIZER_EXECUTOR} x {OPTIMIZER_CONCURRENCY}")
+    return _executor
+
+
+def _optimize(kwargs: Dict) -> Dict:
+    """Executor entry point (module level so it pickles for the process pool)."""
+    return RouteOptimizer().optimize(**kwargs)
+
+
+async def run_optimization(**kwargs) -> Dict:
+    """await RouteOptimizer().optimize(**kwargs) without blocking the event loop."""
+    async with _semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), _optimize, kwargs)
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,36 @@
+# optimization/matrix.py
+"""
+Travel matrices (distances + durations) between a fixed list of points.
+The optimizer fetches one matrix for depot + all commandes per run, then
+solves each relaxation attempt on a sub-matrix of it.
+"""
+
+from typing import List, Sequence
+
+
+class TravelMatrix:
+    """
+    Square distance (meters) and duration (seconds) matrices.
+    Index 0 is the depot, index i > 0 is the i-th commande of the run.
+    """
+
+    def __init__(self, distances: List[List[int]], durations: List[List[int]]):
+        if len(distances) != len(durations):
+            raise ValueError("Distance and duration matrices have different sizes")
+        self.distances = distances
+        self.durations = durations
+
+    def __len__(self) -> int:
+        return len(self.distances)
+
+    def submatrix(self, indices: Sequence[int]) -> "TravelMatrix":
+        """
+        Matrix restricted to `indices`, in that order (row/col k of the result
+        is row/col indices[k] of this matrix).
+        Rows are copied once so the solver callbacks index plain lists.
+        """
+        idx = list(indices)
+        return TravelMatrix(
+            [[self.distances[i][j] for j in idx] for i in idx],
+            [[self.durations[i][j] for j in idx] for i in idx],
+        )
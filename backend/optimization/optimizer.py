@@ -5,32 +5,111 @@ Optimizes delivery routes considering:
 - Vehicle capacity constraints
 - Max working time per vehicle (route duration)
 - Minimize total distance
-Uses OSRM table API for distance/duration matrices, with robust fallbacks + sanitization.
+Uses OSRM table API for distance/duration matrices (one request returns both),
+with robust fallbacks + sanitization.
 
 Extra behavior added:
 - If infeasible, progressively drops the MOST RECENT commandes (latest first)
   until a feasible solution is found.
+- The depot + commandes matrix is fetched ONCE per run; each relaxation
+  attempt solves on a sub-matrix of it.
+- Pairwise travel values are cached on disk (optimization/cache.py); OSRM
+  is only asked for rows/columns with missing pairs.
+- Large tables are fetched as source x destination tiles, concurrently,
+  so they stay under OSRM's max-table-size / URL-length limits.
+- Alternative "disjunction" drop mode: a single solve decides which
+  commandes to postpone, via age-based drop penalties.
+- Solver time budget scales with problem size and the remaining nightly
+  window; the search stops early once the objective stagnates.
+- Optional geographic decomposition of large depots (decomposition.py).
+- Warm start from a prior plan (e.g. yesterday's itineraries) via
+  ReadAssignmentFromRoutes.
 """
 
 from ortools.constraint_solver import routing_enums_pb2, pywrapcp
+import numpy as np
 import requests
 from typing import List, Dict, Tuple
+import logging
 import math
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import MatrixCache
+from .decomposition import METHODS as DECOMPOSITION_METHODS, solve_decomposed
+from .matrix import TravelMatrix
+
+logger = logging.getLogger(__name__)
+
+# "progressive": solve, drop the latest commande, re-solve... (up to N solves)
+# "disjunction": one solve where every commande is optional, with a drop
+#                penalty growing with its age (older = more expensive to postpone)
+DROP_PROGRESSIVE = "progressive"
+DROP_DISJUNCTION = "disjunction"
+DROP_MODES = (DROP_PROGRESSIVE, DROP_DISJUNCTION)
 
 
 class RouteOptimizer:
-    def __init__(self, osrm_url: str = "http://router.project-osrm.org"):
-        self.osrm_url = osrm_url
+    def __init__(
+        self,
+        osrm_url: str | None = None,
+        matrix_cache: MatrixCache | None = None,
+        use_cache: bool = True,
+        tile_size: int | None = None,
+        max_workers: int | None = None,
+        retries: int | None = None,
+        drop_mode: str | None = None,
+        native_matrices: bool = True,
+    ):
+        """
+        osrm_url: OSRM base URL; defaults to OSRM_URL (public demo server if unset)
+        matrix_cache: pairwise travel cache; defaults to MatrixCache.from_env()
+        use_cache: set False to always query OSRM for the full table
+        tile_size: max sources (and destinations) per OSRM table request; a tile
+                   sends at most 2 * tile_size coordinates (keep under OSRM max-table-size)
+        max_workers: concurrent tile requests
+        retries: extra attempts per failed tile
+        drop_mode: how infeasible batches are relaxed (see DROP_MODES)
+        native_matrices: register matrices with OR-Tools (C++ side) instead of
+                         Python transit callbacks evaluated on every arc
+        """
+        self.osrm_url = osrm_url or os.getenv("OSRM_URL", "http://router.project-osrm.org")
         self.distance_matrix: List[List[int]] | None = None
         self.time_matrix: List[List[int]] | None = None
+        self.matrix_cache = (matrix_cache or MatrixCache.from_env()) if use_cache else None
+        self.tile_size = tile_size or int(os.getenv("OSRM_TILE_SIZE", "50"))
+        self.max_workers = max_workers or int(os.getenv("OSRM_MAX_WORKERS", "4"))
+        self.retries = int(os.getenv("OSRM_RETRIES", "2")) if retries is None else retries
+        self.retry_backoff = 0.5  # seconds, doubled on each retry
+        self.drop_mode = drop_mode or os.getenv("OPTIMIZER_DROP_MODE", DROP_PROGRESSIVE)
+        # Solver budget per solve: fixed if time_limit_seconds is set, else
+        # min + per_stop * n (capped), never beyond the optimize() deadline
+        self.time_limit_seconds: float | None = None
+        self.min_time_limit_seconds = float(os.getenv("OPTIMIZER_MIN_SECONDS", "2"))
+        self.time_per_stop_seconds = float(os.getenv("OPTIMIZER_SECONDS_PER_STOP", "0.1"))
+        self.max_time_limit_seconds = float(os.getenv("OPTIMIZER_MAX_SECONDS", "120"))
+        # Stop the search once the objective has not improved for this long (0 = off)
+        self.stagnation_seconds = float(os.getenv("OPTIMIZER_STAGNATION_SECONDS", "5"))
+        self.native_matrices = native_matrices
+        # Geographic decomposition ("sweep" / "kmeans", off by default) for depots
+        # with more than cluster_size commandes; clusters are solved in a process pool
+        self.decompose = os.getenv("OPTIMIZER_DECOMPOSE") or None
+        self.cluster_size = int(os.getenv("OPTIMIZER_CLUSTER_SIZE", "80"))
+        self.decompose_workers = int(os.getenv("OPTIMIZER_DECOMPOSE_WORKERS", str(os.cpu_count() or 1)))
+        # Counters for this instance (reported in optimize() matrix_stats)
+        self.osrm_requests = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     # ----------------------------
     # Matrix utilities
     # ----------------------------
     @staticmethod
-    def _sanitize_matrix(matrix, big: int = 10**9) -> List[List[int]]:
+    def _sanitize_matrix(matrix, big: int = 10**9, shape: Tuple[int, int] | None = None) -> List[List[int]]:
         """
-        Ensure matrix is square NxN and contains ints only.
+        Ensure matrix is square NxN (or exactly `shape` = (rows, cols)) and contains ints only.
         Replace None values with a very large cost to discourage those arcs.
         """
         if not matrix or not isinstance(matrix, list):
@@ -40,8 +119,11 @@ class RouteOptimizer:
         if any(row is None or not isinstance(row, list) for row in matrix):
             raise ValueError("OSRM matrix has null/invalid rows")
 
-        if any(len(row) != n for row in matrix):
-            raise ValueError("OSRM matrix is not square")
+        if shape is None:
+            if any(len(row) != n for row in matrix):
+                raise ValueError("OSRM matrix is not square")
+        elif n != shape[0] or any(len(row) != shape[1] for row in matrix):
+            raise ValueError(f"OSRM matrix is not {shape[0]}x{shape[1]}")
 
         out: List[List[int]] = []
         for row in matrix:
@@ -65,76 +147,278 @@ class RouteOptimizer:
     # ----------------------------
     # OSRM calls + fallbacks
     # ----------------------------
+    def _osrm_table(
+        self,
+        coordinates: List[Tuple[float, float]],
+        annotations: str,
+        sources: List[int] | None = None,
+        destinations: List[int] | None = None,
+    ) -> Dict:
+        """
+        One /table/v1/driving request. sources/destinations are indexes into `coordinates`
+        (OSRM returns a len(sources) x len(destinations) table).
+        Raises on transport errors or a non-Ok OSRM code.
+        """
+        coords_str = ";".join([f"{lon},{lat}" for lat, lon in coordinates])
+        # Built by hand: OSRM expects literal ';' separators in sources/destinations
+        query = f"annotations={annotations}"
+        if sources is not None:
+            query += "&sources=" + ";".join(str(i) for i in sources)
+        if destinations is not None:
+            query += "&destinations=" + ";".join(str(i) for i in destinations)
+
+        url = f"{self.osrm_url}/table/v1/driving/{coords_str}?{query}"
+        resp = requests.get(url, timeout=20)
+        data = resp.json()
+
+        if data.get("code") != "Ok":
+            raise ValueError(f"OSRM table code={data.get('code')} message={data.get('message')}")
+        return data
+
+    def _fetch_tile(
+        self,
+        coordinates: List[Tuple[float, float]],
+        sources: List[int],
+        destinations: List[int],
+    ) -> Tuple[List[List[int]] | None, List[List[int]] | None, int]:
+        """
+        One sources x destinations tile, retried with exponential backoff.
+        Only the coordinates involved in the tile are sent.
+        Returns (distances, durations, requests_sent); matrices are None if every attempt failed.
+        """
+        involved = sorted(set(sources) | set(destinations))
+        position = {idx: k for k, idx in enumerate(involved)}
+        sub_coords = [coordinates[i] for i in involved]
+        src = [position[i] for i in sources]
+        dst = [position[j] for j in destinations]
+        shape = (len(sources), len(destinations))
+
+        # Full square tile: no need for sources/destinations in the URL
+        every = list(range(len(sub_coords)))
+        src_param = None if src == every else src
+        dst_param = None if dst == every else dst
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            started = time.perf_counter()
+            try:
+                data = self._osrm_table(sub_coords, "distance,duration", src_param, dst_param)
+                distances = self._sanitize_matrix(data.get("distances"), shape=shape)
+                if data.get("durations"):
+                    durations = self._sanitize_matrix(data["durations"], shape=shape)
+                else:
+                    durations = self._time_from_distance(distances)
+                logger.debug(
+                    f"OSRM tile {shape[0]}x{shape[1]} ok in {(time.perf_counter() - started) * 1000:.0f} ms "
+                    f"(attempt {attempt + 1})"
+                )
+                return distances, durations, attempt + 1
+            except Exception as e:
+                logger.warning(
+                    f"OSRM tile {shape[0]}x{shape[1]} failed in {(time.perf_counter() - started) * 1000:.0f} ms "
+                    f"(attempt {attempt + 1}/{self.retries + 1}): {e}"
+                )
+
+        return None, None, self.retries + 1
+
+    def _fetch_tables(
+        self,
+        coordinates: List[Tuple[float, float]],
+        sources: List[int],
+        destinations: List[int],
+    ) -> Tuple[List[List[int]], List[List[int]], set]:
+        """
+        Distances + durations for sources x destinations (indexes into `coordinates`).
+        The table is split into tile_size x tile_size tiles, fetched concurrently
+        (at most max_workers in flight) and stitched back together.
+        Tiles that still fail after retries are filled with haversine estimates;
+        their (row, col) offsets are returned so callers can avoid caching them.
+        """
+        ts = self.tile_size
+        tiles = [(r, c) for r in range(0, len(sources), ts) for c in range(0, len(destinations), ts)]
+
+        def run(tile: Tuple[int, int]):
+            r, c = tile
+            return tile, self._fetch_tile(coordinates, sources[r:r + ts], destinations[c:c + ts])
+
+        started = time.perf_counter()
+        if len(tiles) == 1:
+            results = [run(tiles[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tiles))) as pool:
+                results = list(pool.map(run, tiles))
+
+        distances = [[0] * len(destinations) for _ in sources]
+        durations = [[0] * len(destinations) for _ in sources]
+        failed = set()
+
+        for (r, c), (tile_dist, tile_time, sent) in results:
+            self.osrm_requests += sent
+            if tile_dist is None:
+                failed.add((r, c))
+                tile_dist, tile_time = self._haversine_fallback(
+                    coordinates, sources[r:r + ts], destinations[c:c + ts]
+                )
+            for k, row in enumerate(tile_dist):
+                distances[r + k][c:c + len(row)] = row
+            for k, row in enumerate(tile_time):
+                durations[r + k][c:c + len(row)] = row
+
+        log = logger.warning if failed else logger.info
+        log(
+            f"OSRM table {len(sources)}x{len(destinations)}: {len(tiles)} tile(s), "
+            f"{len(failed)} on haversine fallback, {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        return distances, durations, failed
+
     def get_distance_matrix(self, coordinates: List[Tuple[float, float]]) -> List[List[int]]:
         """
         Fetch distance matrix from OSRM API
         coordinates: list of (lat, lon)
         returns: distances in meters (int)
         """
-        if len(coordinates) == 0:
-            return [[]]
-
-        # Validate coords early (avoid hidden None bugs)
-        for lat, lon in coordinates:
-            self._ensure_coords(lat, lon)
-
-        try:
-            coords_str = ";".join([f"{lon},{lat}" for lat, lon in coordinates])
-            url = f"{self.osrm_url}/table/v1/driving/{coords_str}"
-            resp = requests.get(url, params={"annotations": "distance"}, timeout=20)
-            data = resp.json()
-
-            if data.get("code") == "Ok" and data.get("distances"):
-                return self._sanitize_matrix(data["distances"])
-        except Exception as e:
-            print(f"OSRM distance error: {e}")
-
-        # Fallback
-        return self._haversine_distance_matrix(coordinates)
+        return self.get_matrices(coordinates)[0]
 
     def get_time_matrix(self, coordinates: List[Tuple[float, float]]) -> List[List[int]]:
         """
         Fetch time matrix from OSRM API
         returns: durations in seconds (int)
         """
+        return self.get_matrices(coordinates)[1]
+
+    def get_matrices(self, coordinates: List[Tuple[float, float]]) -> Tuple[List[List[int]], List[List[int]]]:
+        """
+        Fetch distance (m) AND duration (s) matrices; each OSRM tile request
+        asks for annotations=distance,duration at once.
+        Fallbacks (per tile): haversine distances; durations derived from distances.
+        """
         if len(coordinates) == 0:
-            return [[]]
+            return [[]], [[]]
 
         for lat, lon in coordinates:
             self._ensure_coords(lat, lon)
 
-        try:
-            coords_str = ";".join([f"{lon},{lat}" for lat, lon in coordinates])
-            url = f"{self.osrm_url}/table/v1/driving/{coords_str}"
-            resp = requests.get(url, params={"annotations": "duration"}, timeout=20)
-            data = resp.json()
+        every = list(range(len(coordinates)))
+        distances, durations, _ = self._fetch_tables(coordinates, every, every)
+        return distances, durations
 
-            if data.get("code") == "Ok" and data.get("durations"):
-                return self._sanitize_matrix(data["durations"])
-        except Exception as e:
-            print(f"OSRM duration error: {e}")
+    def _get_travel_matrix_cached(self, coordinates: List[Tuple[float, float]]) -> TravelMatrix:
+        """
+        Build the matrix from the pairwise cache, asking OSRM only for the
+        rows/columns that have at least one missing pair.
+        """
+        for lat, lon in coordinates:
+            self._ensure_coords(lat, lon)
 
-        # Fallback: derive from distance if possible, else empty
-        if self.distance_matrix:
-            return self._time_from_distance(self.distance_matrix)
+        cache = self.matrix_cache
+        n = len(coordinates)
+        keys = [cache.key(lat, lon) for lat, lon in coordinates]
 
-        return [[]]
+        try:
+            cached = cache.get_many(keys)
+        except sqlite3.Error as e:
+            logger.warning(f"Matrix cache read error: {e}")
+            cached = {}
 
-    def _haversine_distance_matrix(self, coordinates: List[Tuple[float, float]]) -> List[List[int]]:
-        """Distance matrix using Haversine (meters)."""
-        n = len(coordinates)
-        matrix = [[0] * n for _ in range(n)]
+        distances = [[0] * n for _ in range(n)]
+        durations = [[0] * n for _ in range(n)]
+        missing: List[Tuple[int, int]] = []
 
         for i in range(n):
             for j in range(n):
-                if i == j:
+                if keys[i] == keys[j]:
+                    continue  # same (rounded) point
+                hit = cached.get((keys[i], keys[j]))
+                if hit is None:
+                    missing.append((i, j))
+                else:
+                    distances[i][j], durations[i][j] = hit
+
+        self.cache_hits += sum(1 for i in range(n) for j in range(n) if keys[i] != keys[j]) - len(missing)
+        self.cache_misses += len(missing)
+
+        if not missing:
+            return TravelMatrix(distances, durations)
+
+        sources = sorted({i for i, _ in missing})
+        destinations = sorted({j for _, j in missing})
+        sub_dist, sub_time, failed = self._fetch_tables(coordinates, sources, destinations)
+
+        ts = self.tile_size
+        fresh = []
+        for a, i in enumerate(sources):
+            for b, j in enumerate(destinations):
+                if keys[i] == keys[j]:
                     continue
-                lat1, lon1 = coordinates[i]
-                lat2, lon2 = coordinates[j]
-                dist_km = self._haversine(lat1, lon1, lat2, lon2)
-                matrix[i][j] = int(dist_km * 1000)
+                distances[i][j] = sub_dist[a][b]
+                durations[i][j] = sub_time[a][b]
+                # Haversine fallbacks and unroutable arcs (None -> big) are not cached
+                if (a - a % ts, b - b % ts) in failed:
+                    continue
+                if sub_dist[a][b] < 10**9 and sub_time[a][b] < 10**9:
+                    fresh.append((keys[i], keys[j], sub_dist[a][b], sub_time[a][b]))
+
+        try:
+            cache.put_many(fresh)
+        except sqlite3.Error as e:
+            logger.warning(f"Matrix cache write error: {e}")
+
+        return TravelMatrix(distances, durations)
+
+    def _haversine_distance_matrix(self, coordinates: List[Tuple[float, float]]) -> List[List[int]]:
+        """Distance matrix using Haversine (meters)."""
+        every = list(range(len(coordinates)))
+        return self._haversine_table(coordinates, every, every)
+
+    def _haversine_table(
+        self,
+        coordinates: List[Tuple[float, float]],
+        sources: List[int],
+        destinations: List[int],
+    ) -> List[List[int]]:
+        """Haversine distances (meters) for sources x destinations (indexes into `coordinates`)."""
+        return self._haversine_array(coordinates, sources, destinations).tolist()
+
+    def _haversine_fallback(
+        self,
+        coordinates: List[Tuple[float, float]],
+        sources: List[int],
+        destinations: List[int],
+    ) -> Tuple[List[List[int]], List[List[int]]]:
+        """Haversine distances + derived durations for sources x destinations, in one array pass."""
+        meters = self._haversine_array(coordinates, sources, destinations)
+        return meters.tolist(), self._time_from_distance_array(meters).tolist()
+
+    @staticmethod
+    def _haversine_array(
+        coordinates: List[Tuple[float, float]],
+        sources: List[int],
+        destinations: List[int],
+    ) -> np.ndarray:
+        """
+        Broadcasted Haversine (int64 meters), len(sources) x len(destinations).
+        Same formula and operation order as _haversine, so values match the
+        scalar int(km * 1000) exactly.
+        """
+        coords = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        src = np.asarray(sources, dtype=np.intp)
+        dst = np.asarray(destinations, dtype=np.intp)
+
+        lat1 = coords[src, 0][:, None]
+        lon1 = coords[src, 1][:, None]
+        lat2 = coords[dst, 0][None, :]
+        lon2 = coords[dst, 1][None, :]
+
+        R = 6371.0
+        dlat = np.radians(lat2 - lat1)
+        dlon = np.radians(lon2 - lon1)
+        a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2) ** 2
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
 
-        return matrix
+        meters = (R * c * 1000).astype(np.int64)
+        meters[src[:, None] == dst[None, :]] = 0
+        return meters
 
     @staticmethod
     def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -148,13 +432,33 @@ class RouteOptimizer:
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
         return R * c
 
+    @staticmethod
+    def _time_from_distance_array(distances: np.ndarray) -> np.ndarray:
+        """Estimate duration (int64 seconds) from distance (assume 50 km/h average)."""
+        speed_m_s = 50000 / 3600  # 50 km/h
+        return (distances / speed_m_s).astype(np.int64)
+
     @staticmethod
     def _time_from_distance(distance_matrix: List[List[int]]) -> List[List[int]]:
         """Estimate duration from distance (assume 50 km/h average)."""
-        if not distance_matrix:
+        if not distance_matrix or not distance_matrix[0]:
             return [[]]
-        speed_m_s = 50000 / 3600  # 50 km/h
-        return [[int(d / speed_m_s) for d in row] for row in distance_matrix]
+        distances = np.asarray(distance_matrix, dtype=np.int64)
+        return RouteOptimizer._time_from_distance_array(distances).tolist()
+
+    def get_travel_matrix(self, coordinates: List[Tuple[float, float]]) -> TravelMatrix:
+        """
+        Fetch distance + duration matrices for `coordinates` (with fallbacks).
+        With a matrix cache, only missing pairs are requested from OSRM.
+        """
+        if self.matrix_cache is not None and coordinates:
+            matrix = self._get_travel_matrix_cached(coordinates)
+            self.distance_matrix = matrix.distances
+            self.time_matrix = matrix.durations
+            return matrix
+
+        self.distance_matrix, self.time_matrix = self.get_matrices(coordinates)
+        return TravelMatrix(self.distance_matrix, self.time_matrix)
 
     # ----------------------------
     # Optimization (progressive drop-latest)
@@ -166,20 +470,40 @@ class RouteOptimizer:
         depot_coords: Tuple[float, float],
         planning_date: str,
         max_work_seconds: int = 10 * 3600,  # 10 hours
+        drop_mode: str | None = None,
+        deadline: float | None = None,
+        decompose: str | None = None,
+        initial_routes: List[Dict] | None = None,
     ) -> Dict:
         """
-        Progressive relaxation:
+        drop_mode "progressive" (default, see self.drop_mode):
         - Try schedule all commandes
         - If infeasible, drop the MOST RECENT commandes first until feasible
+        drop_mode "disjunction":
+        - One solve; each commande may be left out at an age-based penalty,
+          so the solver postpones the most recent ones first when needed
 
         commandes items must include: id, latitude, longitude, poids
         Optional: service_time_minutes, created_at (for "latest" ordering)
         drivers items must include: id, capacity_kg
         depot_coords: (lat, lon)
+        deadline: time.time() by which solving must be over (end of the nightly window)
+        decompose: "sweep" / "kmeans" to split large depots (default self.decompose)
+        initial_routes: prior plan used as the starting solution, in the routes format
+                        ({"driver_id", "commandes": [{"commande_id"}, ...]}); stops that
+                        are not in the batch are ignored, missing ones inserted greedily
         """
         if not commandes or not drivers:
             return {"error": "No commandes or drivers", "routes": [], "unscheduled_ids": []}
 
+        drop_mode = drop_mode or self.drop_mode
+        if drop_mode not in DROP_MODES:
+            raise ValueError(f"Unknown drop_mode {drop_mode!r} (expected one of {DROP_MODES})")
+
+        decompose = decompose or self.decompose
+        if decompose and decompose not in DECOMPOSITION_METHODS:
+            raise ValueError(f"Unknown decompose {decompose!r} (expected one of {DECOMPOSITION_METHODS})")
+
         # Validate depot coords
         depot_lat, depot_lon = depot_coords
         self._ensure_coords(depot_lat, depot_lon)
@@ -208,6 +532,26 @@ class RouteOptimizer:
                 "commandes_unscheduled": len(invalid_ids),
             }
 
+        if decompose and len(valid_commandes) > self.cluster_size and len(drivers) > 1:
+            result = solve_decomposed(
+                self,
+                valid_commandes,
+                drivers,
+                (depot_lat, depot_lon),
+                planning_date,
+                method=decompose,
+                cluster_size=self.cluster_size,
+                max_workers=self.decompose_workers,
+                max_work_seconds=max_work_seconds,
+                drop_mode=drop_mode,
+                deadline=deadline,
+                initial_routes=initial_routes,
+            )
+            result["invalid_commandes_dropped"] = invalid_ids
+            result["unscheduled_ids"] = invalid_ids + result["unscheduled_ids"]
+            result["commandes_unscheduled"] = len(result["unscheduled_ids"])
+            return result
+
         # Sort so that we drop LATEST first.
         # Prefer created_at; fallback to id.
         def sort_key(c: Dict):
@@ -218,60 +562,253 @@ class RouteOptimizer:
 
         sorted_commandes = sorted(valid_commandes, key=sort_key, reverse=True)  # latest -> oldest
 
-        last_error = None
+        # Fetch the full matrix once: index 0 = depot, index k+1 = sorted_commandes[k]
+        osrm_requests_before = self.osrm_requests
+        hits_before, misses_before = self.cache_hits, self.cache_misses
+        all_coords = [(depot_lat, depot_lon)] + [(c["latitude"], c["longitude"]) for c in sorted_commandes]
+        full_matrix = self.get_travel_matrix(all_coords)
+        attempts = 0
 
-        # Try with all commandes, then drop 1, 2, 3... latest commandes
-        for drop_count in range(0, len(sorted_commandes) + 1):
-            current_batch = sorted_commandes[drop_count:]  # keep older ones
-            dropped_batch = sorted_commandes[:drop_count]  # dropped latest ones
+        def matrix_stats() -> Dict:
+            hits = self.cache_hits - hits_before
+            misses = self.cache_misses - misses_before
+            return {
+                "matrix_fetches": 1,
+                "relaxation_attempts": attempts,
+                "matrix_fetches_avoided": max(attempts - 1, 0),
+                "osrm_requests": self.osrm_requests - osrm_requests_before,
+                "cache_enabled": self.matrix_cache is not None,
+                "cache_hits": hits,
+                "cache_misses": misses,
+                "cache_hit_ratio": round(hits / (hits + misses), 4) if (hits + misses) else None,
+            }
 
-            dropped_ids = [c.get("id") for c in dropped_batch if c.get("id") is not None]
+        def success_result(result: Dict, scheduled: int, dropped_ids: List[int]) -> Dict:
+            return {
+                "success": True,
+                "routes": result["routes"],
+                "total_distance_m": result["total_distance_m"],
+                "total_time_s": result["total_time_s"],
+                "total_vehicles_used": result["total_vehicles_used"],
+                "planning_date": planning_date,
+                "drop_mode": drop_mode,
+                "invalid_commandes_dropped": invalid_ids,
+                "unscheduled_ids": invalid_ids + dropped_ids,
+                "commandes_scheduled": scheduled,
+                "commandes_unscheduled": len(invalid_ids) + len(dropped_ids),
+                "matrix_stats": matrix_stats(),
+                "solver_stats": solver_stats(),
+                "search_stats": result.get("search_stats"),
+            }
+
+        solves: List[Dict] = []
 
-            if not current_batch:
-                break
+        def solver_stats() -> Dict:
+            return {
+                "solves": len(solves),
+                "time_budget_s": round(sum(st["time_budget_s"] for st in solves), 3),
+                "time_used_s": round(sum(st["time_used_s"] for st in solves), 3),
+                "stopped_early": sum(1 for st in solves if st["stopped_early"]),
+                "warm_started": sum(1 for st in solves if st["warm_start"] == "used"),
+                "deadline": deadline,
+            }
 
+        def solve(**kwargs) -> Dict:
             result = self._optimize_batch(
-                commandes=current_batch,
                 drivers=drivers,
                 depot_coords=(depot_lat, depot_lon),
                 max_work_seconds=max_work_seconds,
+                deadline=deadline,
+                initial_routes=initial_routes,
+                **kwargs,
             )
+            if result.get("search_stats"):
+                solves.append(result["search_stats"])
+            return result
 
-            if result.get("success"):
-                return {
-                    "success": True,
-                    "routes": result["routes"],
-                    "total_distance_m": result["total_distance_m"],
-                    "total_time_s": result["total_time_s"],
-                    "total_vehicles_used": result["total_vehicles_used"],
-                    "planning_date": planning_date,
-                    "invalid_commandes_dropped": invalid_ids,
-                    "unscheduled_ids": invalid_ids + dropped_ids,
-                    "commandes_scheduled": len(current_batch),
-                    "commandes_unscheduled": len(invalid_ids) + len(dropped_ids),
-                }
+        last_error = None
 
+        if drop_mode == DROP_DISJUNCTION:
+            attempts = 1
+            result = solve(
+                commandes=sorted_commandes,
+                matrix=full_matrix,
+                drop_penalties=self._age_penalties(full_matrix, len(sorted_commandes)),
+            )
+            if result.get("success"):
+                dropped_ids = result["dropped_ids"]
+                return success_result(result, len(sorted_commandes) - len(dropped_ids), dropped_ids)
             last_error = result.get("error") or "No solution found"
+        else:
+            # Progressive: try with all commandes, then drop 1, 2, 3... latest commandes
+            for drop_count in range(0, len(sorted_commandes) + 1):
+                if deadline is not None and time.time() >= deadline:
+                    last_error = "Optimization window exhausted"
+                    break
+
+                current_batch = sorted_commandes[drop_count:]  # keep older ones
+                dropped_batch = sorted_commandes[:drop_count]  # dropped latest ones
+
+                dropped_ids = [c.get("id") for c in dropped_batch if c.get("id") is not None]
+
+                if not current_batch:
+                    break
+
+                # Keep depot (0) + the commandes still in the batch
+                attempts += 1
+                indices = [0] + list(range(drop_count + 1, len(sorted_commandes) + 1))
+
+                result = solve(
+                    commandes=current_batch,
+                    matrix=full_matrix.submatrix(indices),
+                )
+
+                if result.get("success"):
+                    return success_result(result, len(current_batch), dropped_ids)
+
+                last_error = result.get("error") or "No solution found"
 
         return {
             "success": False,
             "error": last_error or "Unable to schedule any commandes",
             "routes": [],
             "planning_date": planning_date,
+            "drop_mode": drop_mode,
             "invalid_commandes_dropped": invalid_ids,
             "unscheduled_ids": invalid_ids + [c.get("id") for c in sorted_commandes if c.get("id") is not None],
             "commandes_scheduled": 0,
             "commandes_unscheduled": len(invalid_ids) + len(sorted_commandes),
+            "matrix_stats": matrix_stats(),
+            "solver_stats": solver_stats(),
         }
 
+    def _time_budget(self, n_stops: int, deadline: float | None = None) -> float:
+        """Seconds for one solve: fixed, or scaled with the number of stops; capped by the deadline."""
+        if self.time_limit_seconds is not None:
+            budget = float(self.time_limit_seconds)
+        else:
+            budget = self.min_time_limit_seconds + self.time_per_stop_seconds * n_stops
+            budget = min(max(budget, self.min_time_limit_seconds), self.max_time_limit_seconds)
+        if deadline is not None:
+            budget = min(budget, max(deadline - time.time(), 1.0))
+        return budget
+
+    @staticmethod
+    def _age_penalties(matrix: TravelMatrix, n_commandes: int) -> List[int]:
+        """
+        Drop penalties for commandes sorted latest -> oldest (matrix index k+1 = commande k).
+        The base penalty exceeds any single-stop detour (2 x longest routable arc),
+        so a commande is only left out when it cannot fit; it is then multiplied
+        by the age rank so the most recent commandes are postponed first.
+        """
+        longest = max((d for row in matrix.distances for d in row if d < 10**9), default=0)
+        base = 2 * longest + 1
+        return [base * (k + 1) for k in range(n_commandes)]
+
+    @staticmethod
+    def _warm_start_routes(
+        initial_routes: List[Dict],
+        commandes: List[Dict],
+        drivers: List[Dict],
+        matrix: TravelMatrix,
+        demands: List[int],
+        capacities: List[int],
+        service_times: List[int],
+        max_work_seconds: int,
+        optional: bool,
+    ) -> List[List[int]] | None:
+        """
+        Per-vehicle node lists (for ReadAssignmentFromRoutes) from a prior plan.
+        Known stops are kept in their order while capacity and work time allow;
+        batch commandes the plan does not cover are then inserted at their
+        cheapest feasible position (oldest first). Returns None when a commande
+        cannot be placed and commandes are mandatory (no drop penalties).
+        """
+        node_of = {c["id"]: node for node, c in enumerate(commandes, start=1)}
+        vehicle_of = {d["id"]: v for v, d in enumerate(drivers)}
+        dist, dur = matrix.distances, matrix.durations
+
+        routes: List[List[int]] = [[] for _ in drivers]
+        loads = [0] * len(drivers)
+        times = [0] * len(drivers)  # travel + service, back to depot included
+        placed = set()
+
+        def insertion(v: int, node: int, position: int) -> Tuple[int, int]:
+            """(distance delta, time delta) of inserting node at position in route v"""
+            route = routes[v]
+            before = route[position - 1] if position > 0 else 0
+            after = route[position] if position < len(route) else 0
+            d = dist[before][node] + dist[node][after] - dist[before][after]
+            t = dur[before][node] + service_times[node] + dur[node][after] - dur[before][after]
+            return d, t
+
+        def fits(v: int, node: int, time_delta: int) -> bool:
+            return (
+                loads[v] + demands[node] <= capacities[v]
+                and times[v] + time_delta <= max_work_seconds
+                and dist[0][node] < 10**9
+            )
+
+        for route in initial_routes:
+            v = vehicle_of.get(route.get("driver_id"))
+            if v is None:
+                continue
+            for stop in route.get("commandes", []):
+                node = node_of.get(stop.get("commande_id") if isinstance(stop, dict) else stop)
+                if node is None or node in placed:
+                    continue
+                _, time_delta = insertion(v, node, len(routes[v]))
+                if not fits(v, node, time_delta):
+                    continue
+                routes[v].append(node)
+                loads[v] += demands[node]
+                times[v] += time_delta
+                placed.add(node)
+
+        if not placed:
+            return None
+
+        # commandes are sorted latest -> oldest: place the oldest first
+        for node in range(len(commandes), 0, -1):
+            if node in placed:
+                continue
+            best = None
+            for v in range(len(drivers)):
+                for position in range(len(routes[v]) + 1):
+                    distance_delta, time_delta = insertion(v, node, position)
+                    if fits(v, node, time_delta) and (best is None or distance_delta < best[0]):
+                        best = (distance_delta, time_delta, v, position)
+            if best is None:
+                if optional:
+                    continue
+                return None
+            _, time_delta, v, position = best
+            routes[v].insert(position, node)
+            loads[v] += demands[node]
+            times[v] += time_delta
+            placed.add(node)
+
+        return routes
+
     def _optimize_batch(
         self,
         commandes: List[Dict],
         drivers: List[Dict],
         depot_coords: Tuple[float, float],
         max_work_seconds: int,
+        matrix: TravelMatrix | None = None,
+        drop_penalties: List[int] | None = None,
+        deadline: float | None = None,
+        initial_routes: List[Dict] | None = None,
     ) -> Dict:
-        """One optimization attempt for a given batch of commandes (robust OSRM + correct time)."""
+        """
+        One optimization attempt for a given batch of commandes (robust OSRM + correct time).
+        matrix: precomputed depot + commandes matrix (same order); fetched from OSRM if None.
+        drop_penalties: per-commande penalty making each commande optional
+                        (dropped ids are returned in "dropped_ids").
+        deadline: time.time() the solve must not run past (see _time_budget).
+        initial_routes: starting solution (see optimize); cold start if it cannot be made feasible.
+        """
 
         if not commandes or not drivers:
             return {"success": False, "error": "No commandes or drivers"}
@@ -283,11 +820,15 @@ class RouteOptimizer:
         n_locations = len(commandes) + 1  # depot + commandes
         n_vehicles = len(drivers)
 
-        all_coords = [(depot_lat, depot_lon)] + [(c["latitude"], c["longitude"]) for c in commandes]
-
         # Get & sanitize matrices (safe)
-        self.distance_matrix = self.get_distance_matrix(all_coords)
-        self.time_matrix = self.get_time_matrix(all_coords)
+        if matrix is None:
+            all_coords = [(depot_lat, depot_lon)] + [(c["latitude"], c["longitude"]) for c in commandes]
+            matrix = self.get_travel_matrix(all_coords)
+        elif len(matrix) != n_locations:
+            return {"success": False, "error": "Matrix size does not match depot + commandes"}
+
+        self.distance_matrix = matrix.distances
+        self.time_matrix = matrix.durations
 
         # Service times (seconds)
         service_times = [0] + [int(c.get("service_time_minutes", 10) * 60) for c in commandes]
@@ -304,21 +845,45 @@ class RouteOptimizer:
         manager = pywrapcp.RoutingIndexManager(n_locations, n_vehicles, 0)
         routing = pywrapcp.RoutingModel(manager)
 
-        # Distance cost
-        def distance_callback(from_index, to_index):
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            return int(self.distance_matrix[from_node][to_node])
+        if self.native_matrices:
+            # Matrices are copied into OR-Tools: arc evaluations never call back into Python
+            transit_callback_index = routing.RegisterTransitMatrix(self.distance_matrix)
+            demand_callback_index = routing.RegisterUnaryTransitVector(weights_int)
+            # Service time at FROM node folded into the time matrix
+            time_with_service = [
+                [int(travel) + service_times[from_node] for travel in row]
+                for from_node, row in enumerate(self.time_matrix)
+            ]
+            time_callback_index = routing.RegisterTransitMatrix(time_with_service)
+        else:
+            # Distance cost
+            def distance_callback(from_index, to_index):
+                from_node = manager.IndexToNode(from_index)
+                to_node = manager.IndexToNode(to_index)
+                return int(self.distance_matrix[from_node][to_node])
+
+            transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+
+            # Capacity
+            def demand_callback(from_index):
+                from_node = manager.IndexToNode(from_index)
+                return weights_int[from_node]
+
+            demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
+
+            # Time (travel + service at FROM node)
+            def time_callback(from_index, to_index):
+                from_node = manager.IndexToNode(from_index)
+                to_node = manager.IndexToNode(to_index)
+                travel = int(self.time_matrix[from_node][to_node])
+                return travel + int(service_times[from_node])
+
+            time_callback_index = routing.RegisterTransitCallback(time_callback)
 
-        transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+        # Distance cost
         routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
 
         # Capacity dimension
-        def demand_callback(from_index):
-            from_node = manager.IndexToNode(from_index)
-            return weights_int[from_node]
-
-        demand_callback_index = routing.RegisterUnaryTransitCallback(demand_callback)
         routing.AddDimensionWithVehicleCapacity(
             demand_callback_index,
             0,  # slack
@@ -328,13 +893,6 @@ class RouteOptimizer:
         )
 
         # Time dimension (travel + service at FROM node)
-        def time_callback(from_index, to_index):
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            travel = int(self.time_matrix[from_node][to_node])
-            return travel + int(service_times[from_node])
-
-        time_callback_index = routing.RegisterTransitCallback(time_callback)
         routing.AddDimension(
             time_callback_index,
             0,  # slack
@@ -343,17 +901,77 @@ class RouteOptimizer:
             "Time",
         )
 
+        # Optional commandes (disjunction mode)
+        if drop_penalties is not None:
+            for node, penalty in enumerate(drop_penalties, start=1):
+                routing.AddDisjunction([manager.NodeToIndex(node)], int(penalty))
+
         # Search params
+        time_budget = self._time_budget(len(commandes), deadline)
         search_parameters = pywrapcp.DefaultRoutingSearchParameters()
         search_parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
         search_parameters.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
-        search_parameters.time_limit.seconds = 10
+        search_parameters.time_limit.FromMilliseconds(int(time_budget * 1000))
         # Uncomment for solver logs:
         # search_parameters.log_search = True
 
-        solution = routing.SolveWithParameters(search_parameters)
+        # Objective trajectory + stop on stagnation
+        started = time.monotonic()
+        trajectory: List[List[float]] = []  # [elapsed_s, best objective] at each improvement
+        stopped_early = False
+
+        def on_solution():
+            nonlocal stopped_early
+            objective = routing.CostVar().Value()
+            elapsed = time.monotonic() - started
+            if not trajectory or objective < trajectory[-1][1]:
+                trajectory.append([round(elapsed, 3), objective])
+            elif self.stagnation_seconds and elapsed - trajectory[-1][0] > self.stagnation_seconds:
+                stopped_early = True
+                routing.solver().FinishCurrentSearch()
+
+        routing.AddAtSolutionCallback(on_solution)
+
+        # Warm start: load the prior plan as the first solution instead of PATH_CHEAPEST_ARC
+        warm_start = "none"
+        initial_assignment = None
+        if initial_routes:
+            hint = self._warm_start_routes(
+                initial_routes,
+                commandes,
+                drivers,
+                matrix,
+                weights_int,
+                vehicle_capacities,
+                service_times,
+                int(max_work_seconds),
+                optional=drop_penalties is not None,
+            )
+            if hint is not None:
+                routing.CloseModelWithParameters(search_parameters)
+                initial_assignment = routing.ReadAssignmentFromRoutes(hint, True)
+            warm_start = "used" if initial_assignment is not None else "rejected"
+
+        if initial_assignment is not None:
+            solution = routing.SolveFromAssignmentWithParameters(initial_assignment, search_parameters)
+        else:
+            solution = routing.SolveWithParameters(search_parameters)
+        solver = routing.solver()
+        search_stats = {
+            "warm_start": warm_start,
+            "first_solution_s": trajectory[0][0] if trajectory else None,
+            "native_matrices": self.native_matrices,
+            "time_budget_s": round(time_budget, 3),
+            "time_used_s": round(time.monotonic() - started, 3),
+            "stopped_early": stopped_early,
+            "objective_trajectory": trajectory,
+            "wall_time_ms": int(solver.WallTime()),
+            "branches": int(solver.Branches()),
+            "accepted_neighbors": int(solver.AcceptedNeighbors()),
+            "solutions": int(solver.Solutions()),
+        }
         if not solution:
-            return {"success": False, "error": "No solution found"}
+            return {"success": False, "error": "No solution found", "search_stats": search_stats}
 
         # Extract solution
         routes = []
@@ -367,6 +985,7 @@ class RouteOptimizer:
             route_commandes = []
             order = 1
 
+            previous_node = 0
             while not routing.IsEnd(index):
                 node_index = manager.IndexToNode(index)
 
@@ -378,9 +997,14 @@ class RouteOptimizer:
                             "order": order,
                             "lat": commande["latitude"],
                             "lon": commande["longitude"],
+                            # arrival (s since leaving the depot) and leg from the previous stop
+                            "eta_s": int(solution.Value(time_dimension.CumulVar(index))),
+                            "leg_distance_m": int(self.distance_matrix[previous_node][node_index]),
+                            "leg_time_s": int(self.time_matrix[previous_node][node_index]),
                         }
                     )
                     order += 1
+                    previous_node = node_index
 
                 previous_index = index
                 index = solution.Value(routing.NextVar(index))
@@ -402,10 +1026,21 @@ class RouteOptimizer:
                 total_distance += int(route_distance)
                 total_time += int(route_time)
 
+        # Commandes left out (only possible with drop_penalties), latest first like the batch
+        dropped_ids = []
+        if drop_penalties is not None:
+            for node in range(1, n_locations):
+                index = manager.NodeToIndex(node)
+                if solution.Value(routing.NextVar(index)) == index:
+                    dropped_ids.append(commandes[node - 1]["id"])
+
         return {
             "success": True,
             "routes": routes,
             "total_distance_m": int(total_distance),
             "total_time_s": int(total_time),
             "total_vehicles_used": len(routes),
+            "dropped_ids": dropped_ids,
+            "objective": int(solution.ObjectiveValue()),
+            "search_stats": search_stats,
         }
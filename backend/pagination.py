@@ -0,0 +1,108 @@
+"""
+Keyset (cursor) pagination for list endpoints
+Pages are ordered newest first on (sort column, id) and the next page starts
+strictly after the last row sent, so a page costs the same index range scan
+whatever its depth, unlike OFFSET. The cursor is opaque to clients.
+"""
+
+import base64
+import json
+import os
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = int(os.getenv("API_DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", "200"))
+
+
+class PageParams:
+    """Query parameters shared by the paginated endpoints (FastAPI dependency)."""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="next_cursor de la page précédente"),
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, description=f"Taille de page (max {MAX_PAGE_SIZE})"),
+        date_from: Optional[datetime] = Query(None, description="Date de début incluse"),
+        date_to: Optional[datetime] = Query(None, description="Date de fin exclue"),
+    ):
+        self.cursor = cursor
+        self.limit = min(limit, MAX_PAGE_SIZE)
+        self.date_from = _naive_utc(date_from)
+        self.date_to = _naive_utc(date_to)
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Dates are stored as naive UTC (datetime.utcnow)."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, is_datetime: bool = True) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if is_datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(query, params: PageParams, id_column, sort_column=None, serialize=None) -> dict:
+    """
+    One page of `query`, newest first on (sort_column, id_column).
+    sort_column=None pages on the id alone; the date range then does not apply.
+    Returns {"items": [...], "next_cursor": str | None}.
+    """
+    # One extra row tells whether there is a next page
+    rows = _keyset(query, params, id_column, sort_column).limit(params.limit + 1).all()
+    return _page(rows, params, id_column, sort_column, serialize)
+
+
+async def paginate_async(db, stmt, params: PageParams, id_column, sort_column=None, serialize=None) -> dict:
+    """paginate() for a select() run on an AsyncSession."""
+    stmt = _keyset(stmt, params, id_column, sort_column).limit(params.limit + 1)
+    rows = (await db.scalars(stmt)).all()
+    return _page(rows, params, id_column, sort_column, serialize)
+
+
+def _keyset(query, params: PageParams, id_column, sort_column):
+    """Range, cursor and order filters; works on a Query as on a select()."""
+    if sort_column is None:
+        if params.cursor:
+            _, last_id = decode_cursor(params.cursor, is_datetime=False)
+            query = query.filter(id_column < last_id)
+        return query.order_by(id_column.desc())
+
+    if params.date_from is not None:
+        query = query.filter(sort_column >= params.date_from)
+    if params.date_to is not None:
+        query = query.filter(sort_column < params.date_to)
+    if params.cursor:
+        query = query.filter(tuple_(sort_column, id_column) < tuple_(*decode_cursor(params.cursor)))
+    return query.order_by(sort_column.desc(), id_column.desc())
+
+
+def _page(rows, params: PageParams, id_column, sort_column, serialize) -> dict:
+    next_cursor = None
+    if len(rows) > params.limit:
+        rows = rows[: params.limit]
+        last = rows[-1]
+        sort_value = getattr(last, sort_column.key) if sort_column is not None else None
+        next_cursor = encode_cursor(sort_value, getattr(last, id_column.key))
+
+    return {
+        "items": [serialize(row) for row in rows] if serialize else rows,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,80 @@
+"""
+Per-client token-bucket rate limiting for public endpoints
+Each client IP has a bucket of `burst` tokens refilled at `rate` tokens per
+second; a request takes one token, or gets a 429 with Retry-After when the
+bucket is empty. A page refresh now and then never hits the limit, a script
+polling in a loop does.
+Buckets live in the process (like cache.py): with N workers a client can get
+up to N times the limit. The least recently seen clients are forgotten beyond
+max_clients, which only hands them a full bucket again.
+Behind a reverse proxy, set RATE_LIMIT_TRUST_PROXY=1 so the client IP is read
+from X-Forwarded-For instead of the proxy's address.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+
+TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1"
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class TokenBucketLimiter:
+    """FastAPI dependency: `_: None = Depends(limiter)`. rate <= 0 disables it."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """Take a token for key: 0 if granted, else seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    async def __call__(self, request: Request) -> None:
+        wait = self.acquire(client_ip(request))
+        if wait:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+
+
+# Public tracking page: sustained 1 request/s per IP, bursts of 20
+tracking_rate_limit = TokenBucketLimiter(
+    rate=float(os.getenv("TRACKING_RATE_LIMIT_PER_SECOND", "1")),
+    burst=int(os.getenv("TRACKING_RATE_LIMIT_BURST", "20")),
+)
@@ -4,25 +4,43 @@ from notifications import notification_service
 from database import get_db
 from models import User
 from schemas import LoginRequest, TokenResponse, UserBase, UserResponse
-from security import verify_password, get_password_hash, create_access_token, generate_temp_password
+from security import verify_and_update_password, get_password_hash_async, create_access_token, generate_temp_password
+import logging
 import random
 import string
 import asyncio
 
-
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 @router.post("/login", response_model=TokenResponse)
 async def login(credentials: LoginRequest, db: Session = Depends(get_db)):
     """Login endpoint"""
-    user = db.query(User).filter(User.email == credentials.email).first()
-    
-    if not user or not verify_password(credentials.mot_de_passe, user.mot_de_passe_hash):
+    user = db.query(
+        User.id, User.mot_de_passe_hash, User.actif, User.role, User.depot_id
+    ).filter(User.email == credentials.email).first()
+    # Hand the connection back to the pool while bcrypt runs (a few hundred ms)
+    db.rollback()
+
+    # bcrypt runs in the hashing pool, not on the event loop
+    valid, new_hash = (False, None)
+    if user:
+        valid, new_hash = await verify_and_update_password(credentials.mot_de_passe, user.mot_de_passe_hash)
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
+
+    if new_hash:
+        # Hash made with another BCRYPT_ROUNDS: store it with the current cost
+        db.query(User).filter(User.id == user.id).update(
+            {User.mot_de_passe_hash: new_hash}, synchronize_session=False
+        )
+        db.commit()
+        logger.info(f"Password of user {user.id} rehashed with the current bcrypt cost")
     
     if not user.actif:
         raise HTTPException(
@@ -50,7 +68,7 @@ async def register(user_data: UserBase, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Email already registered")
     
     temp_password = generate_temp_password()
-    hashed_password = get_password_hash(temp_password)
+    hashed_password = await get_password_hash_async(temp_password)
 
     db_user = User(
         email=user_data.email,
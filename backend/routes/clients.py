@@ -1,30 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database import get_db
-from models import Commande
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from typing import Optional
+from sqlalchemy import select
+from database import AsyncSessionLocal
+from models import Commande, Livraison
+from cache import tracking_cache, payload_etag, etag_response
+from rate_limit import tracking_rate_limit
 
 router = APIRouter()
 
 @router.get("/tracking/{code_tracking}")
-async def track_order(code_tracking: str, db: Session = Depends(get_db)):
-    """Track order by code (public endpoint)"""
-    commande = db.query(Commande).filter(
-        Commande.code_tracking == code_tracking
-    ).first()
-    
-    if not commande:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    livraison = commande.livraison if commande.livraison else None
-    
-    return {
-        "id": commande.id,
-        "code_tracking": commande.code_tracking,
-        "adresse": commande.adresse,
-        "statut": commande.statut,
-        "date_creation": commande.date_creation,
+async def track_order(
+    code_tracking: str,
+    request: Request,
+    response: Response,
+    _: None = Depends(tracking_rate_limit),
+):
+    """
+    Track order by code (public endpoint, rate limited per client IP)
+    Cached per code for TRACKING_CACHE_TTL_SECONDS, dropped on statut updates;
+    browsers may reuse it as long and then revalidate with If-None-Match.
+    No get_db dependency: a cache hit does not open a session.
+    """
+    cache_key = ("tracking", code_tracking)
+    cached = tracking_cache.get(cache_key)
+    if cached is None:
+        payload = await _load_tracking(code_tracking)
+        if payload is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+        cached = (payload, payload_etag(payload))
+        tracking_cache.set(cache_key, cached)
+
+    payload, etag = cached
+    return etag_response(
+        request, response, payload, f"public, max-age={int(tracking_cache.ttl_seconds)}", etag=etag
+    )
+
+
+async def _load_tracking(code_tracking: str) -> Optional[dict]:
+    """Commande and its latest livraison in one query, JSON-ready (None if unknown)."""
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(
+                Commande.id,
+                Commande.code_tracking,
+                Commande.adresse,
+                Commande.statut,
+                Commande.date_creation,
+                Livraison.id.label("livraison_id"),
+                Livraison.date_planifiee,
+                Livraison.statut.label("livraison_statut"),
+            )
+            .outerjoin(Livraison, Livraison.commande_id == Commande.id)
+            .where(Commande.code_tracking == code_tracking)
+            .order_by(Livraison.id.desc())
+            .limit(1)
+        )).first()
+    if not row:
+        return None
+
+    return jsonable_encoder({
+        "id": row.id,
+        "code_tracking": row.code_tracking,
+        "adresse": row.adresse,
+        "statut": row.statut,
+        "date_creation": row.date_creation,
         "livraison": {
-            "date_planifiee": livraison.date_planifiee if livraison else None,
-            "statut": livraison.statut if livraison else None
-        } if livraison else None
-    }
+            "date_planifiee": row.date_planifiee,
+            "statut": row.livraison_statut
+        } if row.livraison_id is not None else None
+    })
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import get_db
-from models import User, Commande, DeliveryStatus, UserRole
-from schemas import CommandeResponse, CommandeCreate, CommandeUpdate
-from dependencies import get_current_user, check_role
+from database import get_db, get_async_db
+from models import Commande, DeliveryStatus, UserRole
+from schemas import CommandeResponse, CommandeCreate, CommandeUpdate, Page
+from dependencies import UserSnapshot, get_current_user, check_role
+from cache import itineraires_cache, tracking_cache
+from pagination import PageParams, paginate_async
+from typing import Optional
 import pandas as pd
 import uuid
 from geopy.geocoders import Nominatim
@@ -18,7 +23,7 @@ geolocator = Nominatim(user_agent="logistics_app")
 async def import_excel(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     _: None = Depends(check_role([UserRole.ADMIN, UserRole.GESTIONNAIRE]))
 ):
     try:
@@ -96,21 +101,25 @@ async def import_excel(
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/", response_model=list[CommandeResponse])
+@router.get("/", response_model=Page[CommandeResponse])
 async def list_commandes(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    statut: Optional[DeliveryStatus] = None,
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    """List commandes for user's depot"""
-    commandes = db.query(Commande).filter(Commande.depot_id == current_user.depot_id).all()
-    return commandes
+    """List commandes for user's depot, newest first (date range on date_creation)"""
+    stmt = select(Commande).where(Commande.depot_id == current_user.depot_id)
+    if statut is not None:
+        stmt = stmt.where(Commande.statut == statut)
+    return await paginate_async(db, stmt, page, Commande.id, Commande.date_creation)
 
 
 @router.post("/", response_model=CommandeResponse)
 async def create_commande(
     commande_data: CommandeCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     _: None = Depends(check_role([UserRole.GESTIONNAIRE, UserRole.ADMIN]))
 ):
     """Create a new commande"""
@@ -133,7 +142,7 @@ async def update_commande(
     commande_id: int,
     commande_data: CommandeUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     _: None = Depends(check_role([UserRole.GESTIONNAIRE, UserRole.ADMIN]))
 ):
     """Update commande (only if not delivered)"""
@@ -148,6 +157,9 @@ async def update_commande(
         setattr(commande, field, value)
     
     db.commit()
+    # Statut / adresse are shown in the depot's itinerary list
+    itineraires_cache.invalidate("itineraires", commande.depot_id)
+    tracking_cache.invalidate("tracking", commande.code_tracking)
     db.refresh(commande)
     return commande
 
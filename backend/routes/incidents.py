@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from database import get_db
-from models import User, Incident, Commande, IncidentType, DeliveryStatus, UserRole, Livraison
-from schemas import IncidentCreate, IncidentResponse
-from dependencies import get_current_user, check_role
+from models import Incident, Commande, IncidentType, DeliveryStatus, UserRole, Livraison
+from schemas import IncidentCreate, IncidentResponse, Page
+from dependencies import UserSnapshot, get_current_user, check_role
+from cache import itineraires_cache, tracking_cache
+from pagination import PageParams, paginate
+from typing import Optional
 from datetime import datetime
 
 router = APIRouter()
@@ -12,7 +15,7 @@ router = APIRouter()
 async def create_incident(
     incident_data: IncidentCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Create a new incident"""
     
@@ -40,34 +43,44 @@ async def create_incident(
         commande.statut = DeliveryStatus.ANNULEE
     
     db.commit()
+    if incident_data.type_incident == IncidentType.ANNULATION_CLIENT:
+        itineraires_cache.invalidate("itineraires", commande.depot_id)
+        tracking_cache.invalidate("tracking", commande.code_tracking)
     db.refresh(incident)
     return incident
 
-@router.get("/", response_model=list[IncidentResponse])
+@router.get("/", response_model=Page[IncidentResponse])
 async def list_incidents(
+    resolu: Optional[bool] = None,
+    type_incident: Optional[IncidentType] = None,
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    """List incidents for user's depot"""
+    """List incidents for user's depot, newest first (date range on date_incident)"""
     
     if current_user.role == UserRole.LIVREUR:
         # Livreurs see incidents related to their deliveries
-        incidents = db.query(Incident).join(Commande).join(
+        query = db.query(Incident).join(Commande).join(
             Livraison, Commande.id == Livraison.commande_id
-        ).filter(Livraison.livreur_id == current_user.id).all()
+        ).filter(Livraison.livreur_id == current_user.id)
     else:
         # Gestionnaires and Admins see incidents for their depot
-        incidents = db.query(Incident).join(Commande).filter(
+        query = db.query(Incident).join(Commande).filter(
             Commande.depot_id == current_user.depot_id
-        ).all()
+        )
+    if resolu is not None:
+        query = query.filter(Incident.resolu == resolu)
+    if type_incident is not None:
+        query = query.filter(Incident.type_incident == type_incident)
     
-    return incidents
+    return paginate(query, page, Incident.id, Incident.date_incident)
 
 @router.put("/{incident_id}/resolve", response_model=IncidentResponse)
 async def resolve_incident(
     incident_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     _: None = Depends(check_role([UserRole.ADMIN, UserRole.GESTIONNAIRE]))
 ):
     """Mark incident as resolved"""
@@ -1,19 +1,24 @@
 # routes/itineraires.py
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from database import get_db
-from models import User, Commande, Itineraire, DeliveryStatus, UserRole, Depot, Livraison
-from schemas import ItineraireResponse
-from dependencies import get_current_user, check_role
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer
+from database import get_db, get_async_db
+from models import User, Commande, Itineraire, ItineraireStop, DeliveryStatus, UserRole, Depot, Livraison
+from schemas import ItineraireResponse, Page
+from dependencies import UserSnapshot, get_current_user, check_role
 from datetime import datetime, timedelta, date as date_cls
 from typing import Any, Dict, List, Optional
-import json
-from scheduler import optimization_scheduler
+from job_queue import enqueue_job
+from cache import itineraires_cache, etag_response
+from pagination import PageParams, paginate_async
 
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-from optimization import RouteOptimizer
+from optimization import run_optimization
 
 @router.post("/debug-optimization")
 async def debug_optimization(
@@ -57,8 +62,8 @@ async def debug_optimization(
         for d in drivers
     ]
 
-    optimizer = RouteOptimizer()
-    result = optimizer.optimize(
+    # Solver runs in the optimizer executor, not on the event loop
+    result = await run_optimization(
         commandes=commandes_data,
         drivers=drivers_data,
         depot_coords=(depot.latitude, depot.longitude),
@@ -83,10 +88,11 @@ async def debug_optimization(
     }
 
 @router.post("/run-optimization-now")
-async def run_optimization_now():
+async def run_optimization_now(db: Session = Depends(get_db)):
+    """Queue an all-depots optimization job; poll /api/jobs/{job_id} for progress and result."""
     try:
-        await optimization_scheduler.daily_optimization()
-        return {"ok": True, "message": "Optimization finished (check logs for details)"}
+        job = enqueue_job(db)
+        return {"ok": True, "message": "Optimization queued", "job_id": job.id, "status_url": f"/api/jobs/{job.id}"}
     except Exception as e:
         return {"ok": False, "error": str(e)}
     
@@ -120,74 +126,79 @@ def operational_target_date(now: datetime) -> date_cls:
 
 @router.get("/")
 async def list_itineraires(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user),
 ):
     now = datetime.now()
     target = operational_target_date(now)
 
+    # Assembled response cached per (depot, day); dropped when routes or commande statuses change
+    cache_key = ("itineraires", current_user.depot_id, target.isoformat())
+    cached = itineraires_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     start = datetime(target.year, target.month, target.day, 0, 0, 0)
     end = start + timedelta(days=1)
 
-    itineraires = (
-        db.query(Itineraire)
-        .filter(Itineraire.depot_id == current_user.depot_id)
-        .filter(Itineraire.date_planifiee >= start, Itineraire.date_planifiee < end)
-        .all()
-    )
+    itineraires = (await db.scalars(
+        select(Itineraire)
+        .options(defer(Itineraire.metadonnees))
+        .where(Itineraire.depot_id == current_user.depot_id)
+        .where(Itineraire.date_planifiee >= start, Itineraire.date_planifiee < end)
+        .order_by(Itineraire.id)
+    )).all()
+
+    depot = await db.get(Depot, current_user.depot_id) if current_user.depot_id is not None else None
+
+    # One query for the stops of all the day's itineraires (plain rows, no ORM objects)
+    stops_by_itineraire: Dict[int, List[Dict[str, Any]]] = {it.id: [] for it in itineraires}
+    if itineraires:
+        stops = await db.execute(
+            select(
+                ItineraireStop.itineraire_id,
+                ItineraireStop.commande_id,
+                ItineraireStop.ordre,
+                ItineraireStop.eta_s,
+                ItineraireStop.leg_distance_m,
+                ItineraireStop.leg_time_s,
+                Commande.latitude,
+                Commande.longitude,
+                Commande.id_commande,
+                Commande.adresse,
+                Commande.statut,
+                Commande.poids,
+                Commande.client_email,
+                Commande.code_tracking,
+            )
+            .outerjoin(Commande, Commande.id == ItineraireStop.commande_id)
+            .where(ItineraireStop.itineraire_id.in_(stops_by_itineraire))
+            .order_by(ItineraireStop.itineraire_id, ItineraireStop.ordre)
+        )
+        for stop in stops:
+            stops_by_itineraire[stop.itineraire_id].append({
+                "commande_id": stop.commande_id,
+                "order": stop.ordre,
+                "lat": stop.latitude,
+                "lon": stop.longitude,
+                "eta_s": stop.eta_s,
+                "leg_distance_m": stop.leg_distance_m,
+                "leg_time_s": stop.leg_time_s,
 
-    depots = (db.query(Depot).filter(Depot.id == current_user.depot_id).all())
+                # extras (pour UI)
+                "id_commande": stop.id_commande,
+                "adresse": stop.adresse,
+                "statut": stop.statut.value if stop.statut else None,
+                "poids": stop.poids,
+                "client_email": stop.client_email,
+                "code_tracking": stop.code_tracking,
+            })
 
     routes: List[Dict[str, Any]] = []
     itineraires_payload: List[Dict[str, Any]] = []
 
     for it in itineraires:
-        meta = it.metadonnees or {}
-
-        if isinstance(meta, str):
-            try:
-                meta = json.loads(meta)
-            except Exception:
-                meta = {}
-
-        meta_commandes = meta.get("commandes") or []
-
-        commande_ids = [
-            c.get("commande_id") for c in meta_commandes
-            if isinstance(c, dict) and c.get("commande_id") is not None
-        ]
-
-        commandes_db: Dict[int, Commande] = {}
-        if commande_ids:
-            rows = db.query(Commande).filter(Commande.id.in_(commande_ids)).all()
-            commandes_db = {c.id: c for c in rows}
-
-        commandes_for_route: List[Dict[str, Any]] = []
-        for c in sorted(meta_commandes, key=lambda x: (x.get("order", 999999) if isinstance(x, dict) else 999999)):
-            if not isinstance(c, dict):
-                continue
-
-            cid = c.get("commande_id")
-            cdb = commandes_db.get(cid)
-
-            lat = cdb.latitude if (cdb and cdb.latitude is not None) else c.get("lat")
-            lon = cdb.longitude if (cdb and cdb.longitude is not None) else c.get("lon")
-
-            commandes_for_route.append({
-                "commande_id": cid,
-                "order": c.get("order"),
-                "lat": lat,
-                "lon": lon,
-
-                # extras (pour UI)
-                "id_commande": (cdb.id_commande if cdb else None),
-                "adresse": (cdb.adresse if cdb else None),
-                "statut": (cdb.statut.value if cdb and cdb.statut else None),
-                "poids": (cdb.poids if cdb else None),
-                "client_email": (cdb.client_email if cdb else None),
-                "code_tracking": (cdb.code_tracking if cdb else None),
-            })
-        
+        commandes_for_route = stops_by_itineraire[it.id]
 
         route_obj = {
             "itineraire_id": it.id,
@@ -214,52 +225,64 @@ async def list_itineraires(
             "date_creation": it.date_creation.isoformat() if it.date_creation else None,
         })
 
-    return {
+    response = {
         "target_day": target.isoformat(),
         "window": {"start": start.isoformat(), "end": end.isoformat()},
         "routes": routes,
         "itineraires": itineraires_payload,
         "depot": {
-            "id": depots[0].id,
-            "nom": depots[0].nom,
-            "adresse": depots[0].adresse,
-            "lat": depots[0].latitude,
-            "lon": depots[0].longitude,
-        } if depots else None,
+            "id": depot.id,
+            "nom": depot.nom,
+            "adresse": depot.adresse,
+            "lat": depot.latitude,
+            "lon": depot.longitude,
+        } if depot else None,
     }
+    itineraires_cache.set(cache_key, response)
+    return response
 
 
-@router.get("/unscheduled", response_model=list)
+@router.get("/unscheduled", response_model=Page[Dict[str, Any]])
 async def get_unscheduled_orders(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user),
     _: None = Depends(check_role([UserRole.ADMIN, UserRole.GESTIONNAIRE])),
 ):
     depot_id = current_user.depot_id if current_user.role == UserRole.GESTIONNAIRE else None
 
-    query = db.query(Commande).filter(Commande.statut == DeliveryStatus.EN_ATTENTE)
+    stmt = select(Commande).where(Commande.statut == DeliveryStatus.EN_ATTENTE)
     if depot_id:
-        query = query.filter(Commande.depot_id == depot_id)
-
-    unscheduled = query.all()
-
-    return [
-        {
+        stmt = stmt.where(Commande.depot_id == depot_id)
+
+    return await paginate_async(
+        db,
+        stmt,
+        page,
+        Commande.id,
+        Commande.date_creation,
+        serialize=lambda c: {
             "id": c.id,
             "id_commande": c.id_commande,
             "adresse": c.adresse,
             "poids": c.poids,
             "code_tracking": c.code_tracking,
             "date_creation": c.date_creation.isoformat(),
-        }
-        for c in unscheduled
-    ]
+        },
+    )
 
 @router.get("/livreur-itineraire")
 async def get_livreur_itineraire(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user),
 ):
+    """
+    Driver's route of the day. Sent with an ETag of its content (itinerary,
+    stops, statuses): a client repeating it in If-None-Match gets a 304 with no
+    body while the route is unchanged.
+    """
     now = datetime.now()
     target = operational_target_date(now)
 
@@ -267,69 +290,62 @@ async def get_livreur_itineraire(
     end = start + timedelta(days=1)
 
     # 🔒 UN SEUL itinéraire (le plus récent)
-    it = (
-        db.query(Itineraire)
-        .filter(Itineraire.depot_id == current_user.depot_id)
-        .filter(Itineraire.livreur_id == current_user.id)
-        .filter(Itineraire.date_planifiee >= start, Itineraire.date_planifiee < end)
+    latest_id = (
+        select(Itineraire.id)
+        .where(Itineraire.depot_id == current_user.depot_id)
+        .where(Itineraire.livreur_id == current_user.id)
+        .where(Itineraire.date_planifiee >= start, Itineraire.date_planifiee < end)
         .order_by(Itineraire.date_creation.desc())
-        .first()
+        .limit(1)
+        .scalar_subquery()
     )
 
-    if not it:
-        return {
+    # One query: itineraire + depot + stops + commandes + the driver's livraisons
+    rows = (await db.execute(
+        select(Itineraire, Depot, ItineraireStop, Commande, Livraison.id)
+        .options(defer(Itineraire.metadonnees))
+        .outerjoin(Depot, Depot.id == Itineraire.depot_id)
+        .outerjoin(ItineraireStop, ItineraireStop.itineraire_id == Itineraire.id)
+        .outerjoin(Commande, Commande.id == ItineraireStop.commande_id)
+        .outerjoin(
+            Livraison,
+            (Livraison.commande_id == ItineraireStop.commande_id) & (Livraison.livreur_id == current_user.id),
+        )
+        .where(Itineraire.id == latest_id)
+        .order_by(ItineraireStop.ordre, Livraison.id)
+    )).all()
+
+    if not rows:
+        return _with_etag(request, response, {
             "itineraire": None,
             "route": None,
             "depot": None,
-        }
-
-    # 🔹 depot
-    depot = db.query(Depot).filter(Depot.id == current_user.depot_id).first()
-
-    # 🔹 meta
-    meta = it.metadonnees or {}
-    if isinstance(meta, str):
-        try:
-            meta = json.loads(meta)
-        except Exception:
-            meta = {}
-
-    meta_commandes = meta.get("commandes", [])
-
-    commande_ids = [
-        c["commande_id"]
-        for c in meta_commandes
-        if isinstance(c, dict) and "commande_id" in c
-    ]
+        })
 
-    commandes_db = {}
-    if commande_ids:
-        rows = db.query(Commande).filter(Commande.id.in_(commande_ids)).all()
-        commandes_db = {c.id: c for c in rows}
+    it, depot = rows[0][0], rows[0][1]
 
     commandes = []
-    for c in sorted(meta_commandes, key=lambda x: x.get("order", 999999)):
-        cdb = commandes_db.get(c["commande_id"])
-        
-        # ✅ Récupérer la livraison pour avoir son ID
-        livraison = db.query(Livraison).filter(
-            Livraison.commande_id == c["commande_id"],
-            Livraison.livreur_id == current_user.id
-        ).first()
+    seen_stops = set()
+    for _, _, stop, cdb, livraison_id in rows:
+        # Several livraisons for one commande: keep the first, like before
+        if stop is None or stop.id in seen_stops:
+            continue
+        seen_stops.add(stop.id)
 
         commandes.append({
-            "commande_id": c["commande_id"],
-            "livraison_id": livraison.id if livraison else None,  # ✅ AJOUT
-            "order": c.get("order"),
-            "lat": cdb.latitude if cdb and cdb.latitude else c.get("lat"),
-            "lon": cdb.longitude if cdb and cdb.longitude else c.get("lon"),
+            "commande_id": stop.commande_id,
+            "livraison_id": livraison_id,
+            "order": stop.ordre,
+            "lat": cdb.latitude if cdb else None,
+            "lon": cdb.longitude if cdb else None,
+            "eta_s": stop.eta_s,
             "adresse": cdb.adresse if cdb else None,
             "statut": cdb.statut.value if cdb and cdb.statut else None,
             "poids": cdb.poids if cdb else None,
             "code_tracking": cdb.code_tracking if cdb else None,
         })
 
-    return {
+    return _with_etag(request, response, {
         "itineraire": {
             "id": it.id,
             "date_planifiee": it.date_planifiee.isoformat(),
@@ -350,17 +366,21 @@ async def get_livreur_itineraire(
             "lat": depot.latitude,
             "lon": depot.longitude,
         } if depot else None,
-    }
+    })
+
+
+def _with_etag(request: Request, response: Response, payload: dict):
+    # private: per-driver content; no-cache: revalidate on every load (cheap 304)
+    return etag_response(request, response, payload, "private, no-cache")
 
 @router.get("/{itineraire_id}", response_model=ItineraireResponse)
 async def get_itineraire(
     itineraire_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user),
 ):
-    print("🔥 DÉBUT ENDPOINT") 
-    print(f"🔥 DÉBUT ENDPOINT - User: {current_user.id}, Role: {current_user.role}")
-    itineraire = db.query(Itineraire).filter(Itineraire.id == itineraire_id).first()
+    logger.debug(f"get_itineraire {itineraire_id} - User: {current_user.id}, Role: {current_user.role}")
+    itineraire = await db.get(Itineraire, itineraire_id)
     if not itineraire:
         raise HTTPException(status_code=404, detail="Itineraire not found")
 
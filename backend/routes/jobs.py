@@ -0,0 +1,103 @@
+# routes/jobs.py
+"""
+Optimization jobs: submit, poll, cancel
+Jobs are executed by worker.py processes (see job_queue.py).
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from database import get_db
+from models import UserRole, Depot, OptimizationJob, JobStatus
+from schemas import OptimizationJobCreate, OptimizationJobResponse
+from dependencies import UserSnapshot, get_current_user, check_role
+from job_queue import enqueue_job
+from datetime import datetime
+from typing import List
+
+router = APIRouter()
+
+
+def _get_job_for_user(db: Session, job_id: int, current_user: UserSnapshot) -> OptimizationJob:
+    job = db.query(OptimizationJob).filter(OptimizationJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if current_user.role == UserRole.GESTIONNAIRE and job.depot_id != current_user.depot_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return job
+
+
+@router.post("", response_model=OptimizationJobResponse, status_code=202)
+async def submit_job(
+    payload: OptimizationJobCreate,
+    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+    _: None = Depends(check_role([UserRole.ADMIN, UserRole.GESTIONNAIRE]))
+):
+    depot_id = payload.depot_id
+    if current_user.role == UserRole.GESTIONNAIRE:
+        # Managers only optimize their own depot
+        if depot_id not in (None, current_user.depot_id):
+            raise HTTPException(status_code=403, detail="Access denied")
+        depot_id = current_user.depot_id
+
+    if depot_id is not None and not db.query(Depot).filter(Depot.id == depot_id).first():
+        raise HTTPException(status_code=404, detail="Depot not found")
+
+    return enqueue_job(db, depot_id=depot_id, created_by=current_user.id)
+
+
+@router.get("", response_model=List[OptimizationJobResponse])
+async def list_jobs(
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+    _: None = Depends(check_role([UserRole.ADMIN, UserRole.GESTIONNAIRE]))
+):
+    query = db.query(OptimizationJob)
+    if current_user.role == UserRole.GESTIONNAIRE:
+        query = query.filter(OptimizationJob.depot_id == current_user.depot_id)
+    return query.order_by(OptimizationJob.id.desc()).limit(min(limit, 200)).all()
+
+
+@router.get("/{job_id}", response_model=OptimizationJobResponse)
+async def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+    _: None = Depends(check_role([UserRole.ADMIN, UserRole.GESTIONNAIRE]))
+):
+    return _get_job_for_user(db, job_id, current_user)
+
+
+@router.post("/{job_id}/cancel", response_model=OptimizationJobResponse)
+async def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user),
+    _: None = Depends(check_role([UserRole.ADMIN, UserRole.GESTIONNAIRE]))
+):
+    """
+    Queued jobs are cancelled right away; running jobs finish the depots
+    already being solved and skip the others.
+    """
+    job = _get_job_for_user(db, job_id, current_user)
+    if job.status in (JobStatus.DONE, JobStatus.FAILED, JobStatus.CANCELLED):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status.value}")
+
+    # Conditional UPDATEs: a worker may claim the job between the read above and these writes
+    cancelled = db.execute(
+        update(OptimizationJob)
+        .where(OptimizationJob.id == job_id, OptimizationJob.status == JobStatus.QUEUED)
+        .values(status=JobStatus.CANCELLED, cancel_requested=True, finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not cancelled:
+        db.execute(
+            update(OptimizationJob)
+            .where(OptimizationJob.id == job_id)
+            .values(cancel_requested=True)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    db.refresh(job)
+    return job
@@ -1,39 +1,60 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from database import get_db
-from models import User, Livraison, Commande, DeliveryStatus, UserRole
-from schemas import LivraisonResponse, LivraisonCreate, LivraisonUpdate
-from dependencies import get_current_user, check_role
+from models import Livraison, Commande, DeliveryStatus, UserRole
+from schemas import LivraisonResponse, LivraisonCreate, LivraisonUpdate, Page
+from dependencies import UserSnapshot, get_current_user, check_role
+from cache import itineraires_cache, tracking_cache
+from pagination import PageParams, paginate
+import driver_stats
+from typing import Optional
 from datetime import datetime
 
 router = APIRouter()
 
-@router.get("/", response_model=list[LivraisonResponse])
+@router.get("/", response_model=Page[LivraisonResponse])
 async def list_livraisons(
+    statut: Optional[DeliveryStatus] = None,
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    """List livraisons (filtered by depot for gestionnaire, own for livreur)"""
+    """
+    List livraisons (filtered by depot for gestionnaire, own for livreur), newest first.
+    Livraisons have no creation date: pages follow the id, the date range applies to date_planifiee.
+    """
     if current_user.role == UserRole.LIVREUR:
-        livraisons = db.query(Livraison).filter(Livraison.livreur_id == current_user.id).all()
+        query = db.query(Livraison).filter(Livraison.livreur_id == current_user.id)
     else:
-        livraisons = db.query(Livraison).join(Commande).filter(
+        query = db.query(Livraison).join(Commande).filter(
             Commande.depot_id == current_user.depot_id
-        ).all()
-    return livraisons
+        )
+    if statut is not None:
+        query = query.filter(Livraison.statut == statut)
+    if page.date_from is not None:
+        query = query.filter(Livraison.date_planifiee >= page.date_from)
+    if page.date_to is not None:
+        query = query.filter(Livraison.date_planifiee < page.date_to)
+    return paginate(query, page, Livraison.id)
 
 @router.post("/", response_model=LivraisonResponse)
 async def create_livraison(
     livraison_data: LivraisonCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     _: None = Depends(check_role([UserRole.ADMIN, UserRole.GESTIONNAIRE]))
 ):
     """Create a new livraison"""
     livraison = Livraison(**livraison_data.dict())
     db.add(livraison)
+    db.flush()
+    # Planned on a day already rolled up for the performance report;
+    # the commande's incidents now count for this driver
+    driver_stats.reroll(db, [livraison.date_planifiee], [livraison.commande_id])
     db.commit()
     db.refresh(livraison)
+    if livraison.commande:
+        tracking_cache.invalidate("tracking", livraison.commande.code_tracking)
     return livraison
 
 @router.put("/{livraison_id}", response_model=LivraisonResponse)
@@ -41,7 +62,7 @@ async def update_livraison(
     livraison_id: int,
     livraison_data: LivraisonUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Update livraison status (livreur can update own deliveries)"""
     livraison = db.query(Livraison).filter(Livraison.id == livraison_id).first()
@@ -59,7 +80,16 @@ async def update_livraison(
         commande = db.query(Commande).filter(Commande.id == livraison.commande_id).first()
         if commande:
             commande.statut = livraison_data.statut
+        # The performance report of the livraison's day, if already rolled up
+        db.flush()
+        driver_stats.reroll(db, [livraison.date_planifiee])
     
     db.commit()
+    if livraison_data.statut and commande:
+        # Statut is shown in the depot's itinerary list
+        itineraires_cache.invalidate("itineraires", commande.depot_id)
     db.refresh(livraison)
+    # Statut / date_planifiee are shown on the tracking page
+    if livraison.commande:
+        tracking_cache.invalidate("tracking", livraison.commande.code_tracking)
     return livraison
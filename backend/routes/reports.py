@@ -1,46 +1,41 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database import get_db
-from models import User, Commande, Livraison, DeliveryStatus
-from dependencies import get_current_user, check_role
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import User, DeliveryStatus
+from dependencies import UserSnapshot, get_current_user, check_role
 from models import UserRole
+import status_counters
+import driver_stats
+from datetime import date
+from typing import Optional
 
 router = APIRouter()
 
 @router.get("/dashboard-stats")
 async def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Get dashboard statistics"""
     
-    # Filter by depot
-    commandes_total = db.query(Commande).filter(
-        Commande.depot_id == current_user.depot_id
-    ).count()
-    
-    commandes_livrees = db.query(Commande).filter(
-        Commande.depot_id == current_user.depot_id,
-        Commande.statut == DeliveryStatus.LIVREE
-    ).count()
-    
-    commandes_en_attente = db.query(Commande).filter(
-        Commande.depot_id == current_user.depot_id,
-        Commande.statut == DeliveryStatus.EN_ATTENTE
-    ).count()
-    
-    commandes_en_cours = db.query(Commande).filter(
-        Commande.depot_id == current_user.depot_id,
-        Commande.statut.in_([
-            DeliveryStatus.PREPARATION
-        ])
-    ).count()
+    # Commandes of the depot per statut: counters table if enabled, else one GROUP BY
+    # (shared with the sync code, run on the session's connection through run_sync)
+    if status_counters.COUNTERS_ENABLED:
+        par_statut = await db.run_sync(status_counters.read_counts, current_user.depot_id)
+    else:
+        par_statut = await db.run_sync(status_counters.count_by_statut, current_user.depot_id)
+
+    commandes_total = sum(par_statut.values())
+    commandes_livrees = par_statut.get(DeliveryStatus.LIVREE, 0)
+    commandes_en_attente = par_statut.get(DeliveryStatus.EN_ATTENTE, 0)
+    commandes_en_cours = par_statut.get(DeliveryStatus.PREPARATION, 0)
     
-    livreurs_actifs = db.query(User).filter(
+    livreurs_actifs = await db.scalar(select(func.count(User.id)).where(
         User.depot_id == current_user.depot_id,
         User.role == UserRole.LIVREUR,
         User.actif == True
-    ).count()
+    ))
     
     return {
         "total_commandes": commandes_total,
@@ -53,32 +48,33 @@ async def get_dashboard_stats(
 
 @router.get("/performance")
 async def get_performance_report(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    date_from: Optional[date] = Query(None, alias="from", description="Premier jour inclus"),
+    date_to: Optional[date] = Query(None, alias="to", description="Dernier jour inclus"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
-    """Get performance metrics by driver"""
+    """Get performance metrics by driver (livraisons planned / incidents reported between from and to)"""
     
-    livreurs = db.query(User).filter(
+    livreurs = (await db.execute(select(User.id, User.prenom, User.nom).where(
         User.depot_id == current_user.depot_id,
         User.role == UserRole.LIVREUR
-    ).all()
+    ))).all()
+    
+    # Grouped over all the depot's drivers (daily rollups + raw rows not rolled up yet)
+    figures = await db.run_sync(driver_stats.performance, current_user.depot_id, date_from, date_to)
     
     performance = []
     for livreur in livreurs:
-        total_livraisons = db.query(Livraison).filter(
-            Livraison.livreur_id == livreur.id
-        ).count()
-        
-        livraisons_completes = db.query(Livraison).filter(
-            Livraison.livreur_id == livreur.id,
-            Livraison.statut == DeliveryStatus.LIVREE
-        ).count()
+        stats = figures.get(livreur.id, {"total": 0, "completees": 0, "incidents": 0})
+        total_livraisons = stats["total"]
+        livraisons_completes = stats["completees"]
         
         performance.append({
             "livreur_id": livreur.id,
             "livreur_nom": f"{livreur.prenom} {livreur.nom}",
             "total": total_livraisons,
             "completees": livraisons_completes,
+            "incidents": stats["incidents"],
             "taux": (livraisons_completes / total_livraisons * 100) if total_livraisons > 0 else 0
         })
     
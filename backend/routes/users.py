@@ -2,31 +2,50 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from database import get_db
 from models import User, UserRole
-from schemas import UserResponse, UserCreate, UserUpdate
-from dependencies import get_current_user, check_role
+from schemas import UserResponse, UserCreate, UserUpdate, Page
+from dependencies import UserSnapshot, get_current_user, check_role
+from cache import user_cache
+from pagination import PageParams, paginate
+from typing import Optional
 
 router = APIRouter()
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
-    """Get current user information"""
-    return current_user
+async def get_current_user_info(
+    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_user)
+):
+    """Get current user information (full profile: get_current_user only holds id / role / depot)"""
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
-@router.get("/", response_model=list[UserResponse])
+@router.get("/", response_model=Page[UserResponse])
 async def list_users(
+    role: Optional[UserRole] = None,
+    depot_id: Optional[int] = None,
+    actif: Optional[bool] = None,
+    page: PageParams = Depends(),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: UserSnapshot = Depends(get_current_user),
     _: None = Depends(check_role([UserRole.ADMIN]))
 ):
-    """List all users (admin only)"""
-    users = db.query(User).all()
-    return users
+    """List all users (admin only), newest first (date range on date_creation)"""
+    query = db.query(User)
+    if role is not None:
+        query = query.filter(User.role == role)
+    if depot_id is not None:
+        query = query.filter(User.depot_id == depot_id)
+    if actif is not None:
+        query = query.filter(User.actif == actif)
+    return paginate(query, page, User.id, User.date_creation)
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Get user by ID"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -39,7 +58,7 @@ async def update_user(
     user_id: int,
     user_data: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: UserSnapshot = Depends(get_current_user)
 ):
     """Update user information"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -53,5 +72,7 @@ async def update_user(
         setattr(user, field, value)
     
     db.commit()
+    # actif (deactivation) is checked by get_current_user on its cached snapshot
+    user_cache.invalidate("user", user_id)
     db.refresh(user)
     return user
@@ -1,25 +1,327 @@
 """
 Automated scheduler for daily route optimization
-Runs at 21:00 every day, iterates through depots, and sends notifications
+Runs at 21:00 every day, optimizes depots in parallel worker processes,
+and sends notifications from the main process
 """
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from typing import Awaitable, Callable
 import asyncio
 import logging
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
 from database import SessionLocal
-from models import Depot, Commande, User, Livraison, Itineraire, DeliveryStatus, UserRole
-from optimization import RouteOptimizer
+from models import Depot, Commande, User, Livraison, Itineraire, ItineraireStop, DeliveryStatus, UserRole
+from optimization import RouteOptimizer, process_context
 from notifications import notification_service
-import json
+from leader import LeaderLease
+from cache import itineraires_cache, tracking_cache
+import status_counters
+import driver_stats
+import os
+import time
 import pytz
 
 logger = logging.getLogger(__name__)
 
 TIMEZONE = pytz.timezone("Africa/Casablanca")
 
+# Nightly window: solving for all depots must be over this long after the run starts
+OPTIMIZATION_WINDOW_MINUTES = int(os.getenv("OPTIMIZATION_WINDOW_MINUTES", "120"))
+
+# Warm start from the depot's previous plan (recurring addresses matched on rounded coords)
+WARM_START = os.getenv("OPTIMIZER_WARM_START", "1") != "0"
+WARM_START_PRECISION = 5
+
+# A standby waits this long after 21:00 for the leader's lease to expire
+# (leader died) before giving up on tonight's run
+SCHEDULER_TAKEOVER_SECONDS = int(os.getenv("SCHEDULER_TAKEOVER_SECONDS", "3600"))
+
+# Depots optimized concurrently, one worker process (and DB session) per depot
+OPTIMIZER_DEPOT_WORKERS = int(os.getenv("OPTIMIZER_DEPOT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def previous_plan(db: Session, depot: Depot, commandes_data: list) -> list | None:
+    """
+    Latest optimized itineraries of the depot, re-expressed on today's commandes:
+    each past stop is matched to a pending commande at the same (rounded) address.
+    Returns routes in the optimizer format, or None if nothing recurs.
+    """
+    last_date = (
+        db.query(func.max(Itineraire.date_planifiee))
+        .filter(Itineraire.depot_id == depot.id, Itineraire.optimise == True)
+        .scalar()
+    )
+    if last_date is None:
+        return None
+
+    stops = (
+        db.query(Itineraire.id, Itineraire.livreur_id, Commande.latitude, Commande.longitude)
+        .join(ItineraireStop, ItineraireStop.itineraire_id == Itineraire.id)
+        .join(Commande, Commande.id == ItineraireStop.commande_id)
+        .filter(Itineraire.depot_id == depot.id, Itineraire.date_planifiee == last_date)
+        .order_by(Itineraire.id, ItineraireStop.ordre)
+        .all()
+    )
+
+    def address(lat, lon):
+        return round(lat, WARM_START_PRECISION), round(lon, WARM_START_PRECISION)
+
+    pending = {}
+    for c in commandes_data:
+        if c["latitude"] is not None and c["longitude"] is not None:
+            pending.setdefault(address(c["latitude"], c["longitude"]), []).append(c["id"])
+
+    routes_by_itineraire = {}
+    for itineraire_id, livreur_id, lat, lon in stops:
+        if lat is None or lon is None:
+            continue
+        ids = pending.get(address(lat, lon))
+        if ids:
+            route = routes_by_itineraire.setdefault(itineraire_id, {"driver_id": livreur_id, "commandes": []})
+            route["commandes"].append({"commande_id": ids.pop(0)})
+    routes = list(routes_by_itineraire.values())
+
+    matched = sum(len(r["commandes"]) for r in routes)
+    logger.info(f"Depot {depot.nom}: warm start from {last_date.date()} plan, {matched} recurring stops")
+    return routes or None
+
+
+def plan_depot(db: Session, depot: Depot, deadline: float | None = None) -> dict:
+    """
+    Optimize and persist tomorrow's routes for one depot (synchronous, solver inline).
+    Returns a summary: status ("planned", "skipped", "no_routes"), counts, solve_s,
+    and the optimizer result + planning date needed for the notifications.
+    """
+    summary = {"depot_id": depot.id, "depot_nom": depot.nom, "status": "skipped", "solve_s": 0.0}
+
+    # Get waiting commandes for this depot
+    commandes = db.query(Commande).filter(
+        Commande.depot_id == depot.id,
+        Commande.statut == DeliveryStatus.EN_ATTENTE
+    ).all()
+
+    if not commandes:
+        logger.info(f"No pending orders for depot {depot.nom}")
+        return summary
+
+    # Get active drivers for this depot
+    drivers = db.query(User).filter(
+        User.depot_id == depot.id,
+        User.role == UserRole.LIVREUR,
+        User.actif == True
+    ).all()
+
+    if not drivers:
+        logger.warning(f"No active drivers for depot {depot.nom}")
+        return summary
+
+    # Prepare data for optimizer
+    commandes_data = [
+        {
+            "id": c.id,
+            "latitude": c.latitude,
+            "longitude": c.longitude,
+            "poids": c.poids,
+            "service_time_minutes": 10,
+            "created_at": c.date_creation.isoformat()
+        }
+        for c in commandes
+    ]
+
+    drivers_data = [
+        {
+            "id": d.id,
+            "email": d.email,
+            "name": f"{d.prenom} {d.nom}",
+            "capacity_kg": 100  # Default capacity
+        }
+        for d in drivers
+    ]
+
+    initial_routes = previous_plan(db, depot, commandes_data) if WARM_START else None
+
+    # Run optimization
+    solve_started = time.perf_counter()
+    result = RouteOptimizer().optimize(
+        commandes=commandes_data,
+        drivers=drivers_data,
+        depot_coords=(depot.latitude, depot.longitude),
+        planning_date=datetime.now().date().isoformat(),
+        deadline=deadline,
+        initial_routes=initial_routes,
+    )
+    summary["solve_s"] = round(time.perf_counter() - solve_started, 3)
+
+    if not result.get("routes"):
+        logger.warning(f"Optimization returned no routes for depot {depot.nom}")
+        summary["status"] = "no_routes"
+        return summary
+
+    # Save results to database
+    tomorrow = datetime.now().date() + timedelta(days=1)
+    planning_date = datetime.combine(tomorrow, datetime.min.time())
+
+    unscheduled_count = result.get("commandes_unscheduled", 0)
+    scheduled_count = persist_routes(db, depot, result["routes"], planning_date)
+    db.commit()
+
+    logger.info(
+        f"Depot {depot.nom}: {scheduled_count} orders scheduled, "
+        f"{unscheduled_count} postponed"
+    )
+    summary.update(
+        status="planned",
+        scheduled=scheduled_count,
+        unscheduled=unscheduled_count,
+        result=result,
+        planning_date=planning_date,
+    )
+    return summary
+
+
+def persist_routes(db: Session, depot: Depot, routes: list, planning_date: datetime) -> int:
+    """
+    Save optimized routes with a fixed number of statements (no per-stop queries):
+    one load of the commandes and one of their livraisons, then bulk inserts /
+    updates. Stops whose commande no longer exists are skipped, as before.
+    Returns the number of scheduled commandes; the caller commits.
+    """
+    commande_ids = [stop["commande_id"] for route in routes for stop in route["commandes"]]
+    statuts = {}  # commande_id -> current statut, for the dashboard counters
+    livraison_ids = {}  # (commande_id, livreur_id) -> livraison id
+    previous_days = {}  # livraison id -> date_planifiee before rescheduling, for the driver stats
+    if commande_ids:
+        statuts = dict(db.query(Commande.id, Commande.statut).filter(Commande.id.in_(commande_ids)))
+        rows = db.query(Livraison.id, Livraison.commande_id, Livraison.livreur_id, Livraison.date_planifiee).filter(
+            Livraison.commande_id.in_(commande_ids)
+        )
+        for livraison_id, commande_id, livreur_id, date_planifiee in rows:
+            livraison_ids[(commande_id, livreur_id)] = livraison_id
+            previous_days[livraison_id] = date_planifiee
+
+    itineraires = []
+    stops = []  # per route, inserted once the itineraire ids are known
+    livraison_updates = []
+    livraison_inserts = []
+    scheduled_ids = []
+    for route in routes:
+        # Create itinerary record
+        itineraires.append(
+            {
+                "date_planifiee": planning_date,
+                "depot_id": depot.id,
+                "livreur_id": route["driver_id"],
+                "distance_totale": route["distance_m"] / 1000,  # Convert to km
+                "temps_total": int(route["time_s"] / 60),  # Convert to minutes
+                "commandes_count": route["commandes_count"],
+                "optimise": True,
+                "metadonnees": route,
+            }
+        )
+        stops.append(
+            [
+                {
+                    "commande_id": stop["commande_id"],
+                    "ordre": stop["order"],
+                    "eta_s": stop.get("eta_s"),
+                    "leg_distance_m": stop.get("leg_distance_m"),
+                    "leg_time_s": stop.get("leg_time_s"),
+                }
+                for stop in route["commandes"]
+                if stop["commande_id"] in statuts
+            ]
+        )
+
+        # Update or create livraisons with optimized sequence
+        for commande_info in route["commandes"]:
+            commande_id = commande_info["commande_id"]
+            if commande_id not in statuts:
+                continue
+            livraison_id = livraison_ids.get((commande_id, route["driver_id"]))
+            if livraison_id is not None:
+                livraison_updates.append(
+                    {"id": livraison_id, "ordre_visite": commande_info["order"], "date_planifiee": planning_date}
+                )
+            else:
+                livraison_inserts.append(
+                    {
+                        "commande_id": commande_id,
+                        "livreur_id": route["driver_id"],
+                        "date_planifiee": planning_date,
+                        "ordre_visite": commande_info["order"],
+                        "statut": DeliveryStatus.PREPARATION,
+                    }
+                )
+            scheduled_ids.append(commande_id)
+
+    if itineraires:
+        itineraire_ids = db.scalars(
+            insert(Itineraire).returning(Itineraire.id, sort_by_parameter_order=True), itineraires
+        ).all()
+        stop_rows = [
+            {**stop, "itineraire_id": itineraire_id}
+            for itineraire_id, route_stops in zip(itineraire_ids, stops)
+            for stop in route_stops
+        ]
+        if stop_rows:
+            db.bulk_insert_mappings(ItineraireStop, stop_rows)
+    if livraison_updates:
+        db.bulk_update_mappings(Livraison, livraison_updates)
+    if livraison_inserts:
+        db.bulk_insert_mappings(Livraison, livraison_inserts)
+    if scheduled_ids:
+        db.query(Commande).filter(Commande.id.in_(scheduled_ids)).update(
+            {Commande.statut: DeliveryStatus.PREPARATION}, synchronize_session=False
+        )
+        # Bulk UPDATE: not seen by the counters' flush hook
+        transitions = Counter()
+        for commande_id in set(scheduled_ids):
+            if statuts[commande_id] != DeliveryStatus.PREPARATION:
+                transitions[(depot.id, statuts[commande_id])] -= 1
+                transitions[(depot.id, DeliveryStatus.PREPARATION)] += 1
+        status_counters.adjust(db, transitions)
+    # Rescheduled livraisons leave their former day (re-planning a past day is rare, but counts too);
+    # the incidents of commandes given a new livraison now count for its driver
+    driver_stats.reroll(
+        db,
+        [previous_days[u["id"]] for u in livraison_updates] + [planning_date],
+        [i["commande_id"] for i in livraison_inserts],
+    )
+    return len(scheduled_ids)
+
+
+def optimize_depot_in_worker(depot_id: int, deadline: float | None = None) -> dict:
+    """Depot pool entry point: own session, errors returned instead of raised."""
+    started = time.perf_counter()
+    depot = None
+    db = SessionLocal()
+    try:
+        depot = db.get(Depot, depot_id)
+        if depot is None:
+            summary = {"depot_id": depot_id, "status": "failed", "error": "Depot not found"}
+        else:
+            logger.info(f"Optimizing depot: {depot.nom} (ID: {depot.id})")
+            summary = plan_depot(db, depot, deadline=deadline)
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Error optimizing depot {depot_id}")
+        summary = {
+            "depot_id": depot_id,
+            "depot_nom": depot.nom if depot is not None else None,
+            "status": "failed",
+            "error": str(e),
+        }
+    finally:
+        db.close()
+    summary["total_s"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
 class OptimizationScheduler:
     def __init__(self):
         loop = asyncio.get_event_loop()
@@ -27,13 +329,17 @@ class OptimizationScheduler:
             event_loop=loop,
             timezone=TIMEZONE
         )
+        # Only the lease holder (one process across all API workers/hosts) runs the nightly job
+        self.lease = LeaderLease("daily_optimization")
 
 
     def start(self):
         """Start the scheduler"""
 
+        self.lease.start()
+
         self.scheduler.add_job(
-            self.daily_optimization,
+            self.nightly_optimization,
             CronTrigger(hour=21, minute=00, timezone=TIMEZONE),
             id="daily_optimization",
             name="Daily Route Optimization",
@@ -43,6 +349,29 @@ class OptimizationScheduler:
             max_instances=1,
         )
 
+        self.scheduler.add_job(
+            self.nightly_driver_stats,
+            CronTrigger(hour=2, minute=00, timezone=TIMEZONE),
+            id="driver_daily_stats",
+            name="Driver Daily Stats Rollup",
+            replace_existing=True,
+            misfire_grace_time=3600,
+            coalesce=True,
+            max_instances=1,
+        )
+
+        if status_counters.COUNTERS_ENABLED:
+            self.scheduler.add_job(
+                self.nightly_reconcile_counters,
+                CronTrigger(hour=3, minute=00, timezone=TIMEZONE),
+                id="reconcile_status_counters",
+                name="Dashboard Counters Reconciliation",
+                replace_existing=True,
+                misfire_grace_time=3600,
+                coalesce=True,
+                max_instances=1,
+            )
+
         if not self.scheduler.running:
             self.scheduler.start()
             logger.info("✅ Optimization scheduler started - runs daily at 21:00")
@@ -58,153 +387,181 @@ class OptimizationScheduler:
         if self.scheduler.running:
             self.scheduler.shutdown()
             logger.info("Optimization scheduler stopped")
+        self.lease.stop()
+
+    async def nightly_optimization(self):
+        """
+        Cron entry point, fired in every process: only the lease holder runs
+        daily_optimization. Standbys keep waiting so that one of them takes
+        over if the leader dies before tonight's run is recorded as done.
+        """
+        run_key = datetime.now(TIMEZONE).date().isoformat()
+        waited = 0.0
+        while True:
+            if await asyncio.to_thread(self.lease.last_run_for) == run_key:
+                logger.info(f"Nightly optimization for {run_key} already done by the leader")
+                return
+            if self.lease.is_leader:
+                break
+            if waited >= SCHEDULER_TAKEOVER_SECONDS:
+                logger.info("Not the scheduler leader, skipping nightly optimization")
+                return
+            await asyncio.sleep(self.lease.renew_seconds)
+            waited += self.lease.renew_seconds
+
+        logger.info(f"Scheduler leader {self.lease.holder} runs the nightly optimization")
+        summary = await self.daily_optimization()
+        if "error" not in summary:
+            await asyncio.to_thread(self.lease.mark_run, run_key)
     
-    async def daily_optimization(self):
-        """Main optimization function - runs daily"""
+
+    async def nightly_reconcile_counters(self):
+        """Rebuild the dashboard counters from commandes (lease holder only; idempotent)."""
+        if not self.lease.is_leader:
+            return
+
+        def reconcile() -> int:
+            db = SessionLocal()
+            try:
+                return status_counters.reconcile(db)
+            finally:
+                db.close()
+
+        rows = await asyncio.to_thread(reconcile)
+        logger.info(f"Dashboard counters rebuilt: {rows} rows")
+
+    async def nightly_driver_stats(self):
+        """Roll up yesterday's (and recent days') driver figures (lease holder only; idempotent)."""
+        if not self.lease.is_leader:
+            return
+
+        def refresh() -> int:
+            db = SessionLocal()
+            try:
+                return driver_stats.refresh(db, today=datetime.now(TIMEZONE).date())
+            finally:
+                db.close()
+
+        await asyncio.to_thread(refresh)
+
+    async def daily_optimization(
+        self,
+        depot_ids: list | None = None,
+        on_progress: Callable[[int, int, dict], Awaitable[None]] | None = None,
+        is_cancelled: Callable[[], Awaitable[bool]] | None = None,
+    ) -> dict:
+        """
+        Main optimization function - runs daily; depots are optimized in parallel.
+        depot_ids: restrict to these depots (default: all)
+        on_progress(done, total, depot_summary): awaited as each depot finishes
+        is_cancelled(): awaited before each depot starts; remaining depots are skipped once True
+        """
         logger.info("🚀 Starting daily route optimization...")
 
+        started = time.perf_counter()
+        deadline = time.time() + OPTIMIZATION_WINDOW_MINUTES * 60
         db = SessionLocal()
         try:
-            depots = db.query(Depot).all()
+            query = db.query(Depot)
+            if depot_ids is not None:
+                query = query.filter(Depot.id.in_(depot_ids))
+            depots = query.all()
+            workers = max(1, min(OPTIMIZER_DEPOT_WORKERS, len(depots)))
+            slots = asyncio.Semaphore(workers)
+            done = 0
 
-            for depot in depots:
-                await self.optimize_depot(db, depot)
+            async def run(depot: Depot, pool: ProcessPoolExecutor) -> dict:
+                nonlocal done
+                # Depots wait for a free worker here, so cancellation skips those not started yet
+                async with slots:
+                    if is_cancelled is not None and await is_cancelled():
+                        summary = {"depot_id": depot.id, "depot_nom": depot.nom, "status": "cancelled"}
+                    else:
+                        summary = await self.optimize_depot(db, depot, deadline=deadline, pool=pool)
+                done += 1
+                if on_progress is not None:
+                    await on_progress(done, len(depots), summary)
+                return summary
 
-            logger.info("✅ Daily optimization completed successfully")
+            # Fresh processes (not forked), each opening its own DB connections
+            with ProcessPoolExecutor(max_workers=workers, mp_context=process_context()) as pool:
+                summaries = await asyncio.gather(*(run(depot, pool) for depot in depots))
+
+            wall_s = time.perf_counter() - started
+            solve_s = sum(s.get("solve_s", 0.0) for s in summaries)
+            failed = [s for s in summaries if s["status"] == "failed"]
+            summary = {
+                "depots": len(depots),
+                "workers": workers,
+                "failed": len(failed),
+                "cancelled": sum(1 for s in summaries if s["status"] == "cancelled"),
+                "wall_time_s": round(wall_s, 3),
+                "sum_solve_s": round(solve_s, 3),
+                "sum_depot_s": round(sum(s.get("total_s", 0.0) for s in summaries), 3),
+                "per_depot": [
+                    {k: v for k, v in s.items() if k not in ("result", "planning_date")} for s in summaries
+                ],
+            }
+            logger.info(
+                f"✅ Daily optimization completed: {len(depots)} depots ({len(failed)} failed) "
+                f"in {wall_s:.1f}s wall, {solve_s:.1f}s of solving, {workers} workers"
+            )
+            return summary
 
         except Exception as e:
             logger.exception("❌ Error in daily optimization")
+            return {"error": str(e)}
         finally:
             db.close()
-    
-    async def optimize_depot(self, db: Session, depot: Depot):
-        """Optimize routes for a specific depot"""
-        logger.info(f"Optimizing depot: {depot.nom} (ID: {depot.id})")
-        
+
+    async def optimize_depot(
+        self,
+        db: Session,
+        depot: Depot,
+        deadline: float | None = None,
+        pool: ProcessPoolExecutor | None = None,
+    ) -> dict:
+        """
+        Optimize routes for a specific depot (solving stops at `deadline`, a time.time()).
+        Planning runs in a worker process with its own session (`pool`, or a
+        one-off single worker); notifications are sent from here with `db`.
+        """
+        loop = asyncio.get_running_loop()
         try:
-            # Get waiting commandes for this depot
-            commandes = db.query(Commande).filter(
-                Commande.depot_id == depot.id,
-                Commande.statut == DeliveryStatus.EN_ATTENTE
-            ).all()
-            
-            if not commandes:
-                logger.info(f"No pending orders for depot {depot.nom}")
-                return
-            
-            # Get active drivers for this depot
-            drivers = db.query(User).filter(
-                User.depot_id == depot.id,
-                User.role == UserRole.LIVREUR,
-                User.actif == True
-            ).all()
-            
-            if not drivers:
-                logger.warning(f"No active drivers for depot {depot.nom}")
-                return
-            
-            # Prepare data for optimizer
-            commandes_data = [
-                {
-                    "id": c.id,
-                    "latitude": c.latitude,
-                    "longitude": c.longitude,
-                    "poids": c.poids,
-                    "service_time_minutes": 10,
-                    "created_at": c.date_creation.isoformat()
-                }
-                for c in commandes
-            ]
-            
-            drivers_data = [
-                {
-                    "id": d.id,
-                    "email": d.email,
-                    "name": f"{d.prenom} {d.nom}",
-                    "capacity_kg": 100  # Default capacity
-                }
-                for d in drivers
-            ]
-            
-            # Run optimization
-            optimizer = RouteOptimizer()
-            result = optimizer.optimize(
-                commandes=commandes_data,
-                drivers=drivers_data,
-                depot_coords=(depot.latitude, depot.longitude),
-                planning_date=datetime.now().date().isoformat()
+            if pool is None:
+                with ProcessPoolExecutor(max_workers=1, mp_context=process_context()) as own_pool:
+                    summary = await loop.run_in_executor(own_pool, optimize_depot_in_worker, depot.id, deadline)
+            else:
+                summary = await loop.run_in_executor(pool, optimize_depot_in_worker, depot.id, deadline)
+        except Exception as e:
+            # e.g. BrokenProcessPool: the worker died
+            logger.exception(f"Error optimizing depot {depot.nom}")
+            return {"depot_id": depot.id, "depot_nom": depot.nom, "status": "failed", "error": str(e)}
+
+        if summary["status"] == "failed":
+            logger.error(f"Error optimizing depot {depot.nom}: {summary.get('error')}")
+        else:
+            logger.info(
+                f"Depot {depot.nom}: {summary['status']} in {summary['total_s']:.1f}s "
+                f"(solver {summary['solve_s']:.1f}s)"
             )
-            
-            if not result.get("routes"):
-                logger.warning(f"Optimization returned no routes for depot {depot.nom}")
-                return
-            
-            # Save results to database
-            tomorrow = datetime.now().date() + timedelta(days=1)
-            planning_date = datetime.combine(tomorrow, datetime.min.time())
-            
-            scheduled_count = 0
-            unscheduled_count = result.get("commandes_unscheduled", 0)
-            
-            for route in result["routes"]:
-                # Create itinerary record
-                itineraire = Itineraire(
-                    date_planifiee=planning_date,
-                    depot_id=depot.id,
-                    livreur_id=route["driver_id"],
-                    distance_totale=route["distance_m"] / 1000,  # Convert to km
-                    temps_total=int(route["time_s"] / 60),  # Convert to minutes
-                    commandes_count=route["commandes_count"],
-                    optimise=True,
-                    metadonnees=json.dumps(route)
-                )
-                db.add(itineraire)
-                
-                # Update or create livraisons with optimized sequence
-                for commande_info in route["commandes"]:
-                    commande = db.query(Commande).filter(
-                        Commande.id == commande_info["commande_id"]
-                    ).first()
-                    
-                    if commande:
-                        livraison = db.query(Livraison).filter(
-                            Livraison.commande_id == commande.id,
-                            Livraison.livreur_id == route["driver_id"]
-                        ).first()
-                        
-                        if livraison:
-                            livraison.ordre_visite = commande_info["order"]
-                            livraison.date_planifiee = planning_date
-                        else:
-                            livraison = Livraison(
-                                commande_id=commande.id,
-                                livreur_id=route["driver_id"],
-                                date_planifiee=planning_date,
-                                ordre_visite=commande_info["order"],
-                                statut=DeliveryStatus.PREPARATION
-                            )
-                            db.add(livraison)
-                        
-                        commande.statut = DeliveryStatus.PREPARATION
-                        scheduled_count += 1
-            
-            db.commit()
-            
+
+        if summary["status"] == "planned":
+            # Routes were written by the worker process: drop this process's cached lists
+            itineraires_cache.invalidate("itineraires", depot.id)
+            # Scheduled commandes went to preparation; their codes are not at hand, drop all
+            tracking_cache.invalidate("tracking")
+            result = summary["result"]
+            planning_date = summary["planning_date"]
+
             # Send notifications to drivers
             await self.send_driver_notifications(db, result["routes"], planning_date)
-            
+
             # Send summary to depot manager
             await self.send_manager_notification(db, depot, result, planning_date)
-            
-            logger.info(
-                f"Depot {depot.nom}: {scheduled_count} orders scheduled, "
-                f"{unscheduled_count} postponed"
-            )
-        
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Error optimizing depot {depot.nom}: {str(e)}")
-    
+
+        return summary
+
     async def send_driver_notifications(self, db: Session, routes: list, planning_date):
         """Send itinerary notifications to each driver"""
         for route in routes:
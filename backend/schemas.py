@@ -1,7 +1,14 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional, List
-from models import UserRole, DeliveryStatus, IncidentType
+from typing import Any, Generic, Optional, List, TypeVar
+from models import UserRole, DeliveryStatus, IncidentType, JobStatus
+
+T = TypeVar("T")
+
+# ============= PAGINATION =============
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None  # None: dernière page
 
 # ============= USER SCHEMAS =============
 class UserBase(BaseModel):
@@ -126,6 +133,26 @@ class ItineraireResponse(BaseModel):
     class Config:
         orm_mode = True
 
+# ============= JOB SCHEMAS =============
+class OptimizationJobCreate(BaseModel):
+    depot_id: Optional[int] = None  # None = all depots
+
+class OptimizationJobResponse(BaseModel):
+    id: int
+    status: JobStatus
+    depot_id: Optional[int] = None
+    progress: float
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    cancel_requested: bool
+    worker_id: Optional[str] = None
+    date_creation: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
 class LoginRequest(BaseModel):
     email: str
     mot_de_passe: str
@@ -0,0 +1,739 @@
+"""
+Benchmarks for the API / persistence layer on a seeded SQLite database
+Run: python scripts/benchmark_api.py <benchmark> [options]
+Uses DATABASE_URL if set, else a throwaway SQLite file (tables are dropped and recreated).
+
+Benchmarks:
+- persist: saving optimized routes, per-stop queries vs bulk statements
+- itineraires: manager itinerary list, per-itinerary queries vs one batched stops query vs cached
+- pages: commande list page latency as the table grows, full list vs OFFSET vs keyset cursor
+- dashboard: dashboard stats, five COUNT queries vs one GROUP BY vs the counters table
+- performance: driver performance report, per-driver COUNTs vs grouped query vs daily rollups
+- auth: get_current_user, query + prints per request vs cached user snapshot
+- login: burst of concurrent logins, bcrypt on the event loop vs in the hashing pool
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'benchmark_api.sqlite3')}"
+
+from sqlalchemy import event  # noqa: E402
+
+from database import AsyncSessionLocal, Base, SessionLocal, async_engine, engine  # noqa: E402
+from models import Commande, DeliveryStatus, Depot, Incident, IncidentType, Itineraire, Livraison, User, UserRole  # noqa: E402
+
+
+# ----------------------------
+# Helpers
+# ----------------------------
+class QueryCounter:
+    """Counts statements sent to the database (an executemany counts once)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", counter)
+
+
+_loop = asyncio.new_event_loop()
+
+
+def run_async(coro):
+    """Run coro on one loop for the whole benchmark: asyncpg connections stay bound to the loop that opened them."""
+    return _loop.run_until_complete(coro)
+
+
+def reset_database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+def seed_depot(db, n_commandes: int, n_drivers: int, seed: int = 42):
+    """One depot with n_drivers livreurs and n_commandes pending commandes around Casablanca."""
+    rng = random.Random(seed)
+    depot = Depot(nom="Dépôt benchmark", adresse="Casablanca", latitude=33.5731, longitude=-7.5898, capacite_max=1e6)
+    db.add(depot)
+    db.flush()
+
+    db.bulk_insert_mappings(
+        User,
+        [
+            {
+                "email": f"livreur{d}@bench.shipora.ma",
+                "nom": f"Livreur{d}",
+                "prenom": "Bench",
+                "role": UserRole.LIVREUR,
+                "depot_id": depot.id,
+                "actif": True,
+            }
+            for d in range(n_drivers)
+        ],
+    )
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(
+        Commande,
+        [
+            {
+                "id_commande": f"BENCH-{k}",
+                "adresse": f"{k} rue du benchmark",
+                "latitude": 33.5731 + rng.uniform(-0.15, 0.15),
+                "longitude": -7.5898 + rng.uniform(-0.15, 0.15),
+                "poids": rng.randint(1, 30),
+                "statut": DeliveryStatus.EN_ATTENTE,
+                "depot_id": depot.id,
+                "code_tracking": f"BT{k:06d}",
+                "date_creation": now - timedelta(minutes=k),
+                "date_modification": now,
+            }
+            for k in range(n_commandes)
+        ],
+    )
+    db.commit()
+    return depot
+
+
+def round_robin_routes(db) -> list:
+    """Routes as returned by the optimizer: commandes dealt round-robin to the drivers."""
+    drivers = [u.id for u in db.query(User.id).filter(User.role == UserRole.LIVREUR).order_by(User.id)]
+    commandes = [c.id for c in db.query(Commande.id).order_by(Commande.id)]
+    routes = []
+    for d, driver_id in enumerate(drivers):
+        stops = commandes[d::len(drivers)]
+        routes.append(
+            {
+                "driver_id": driver_id,
+                "commandes": [{"commande_id": cid, "order": k + 1} for k, cid in enumerate(stops)],
+                "distance_m": 1000 * len(stops),
+                "time_s": 600 * len(stops),
+                "commandes_count": len(stops),
+            }
+        )
+    return routes
+
+
+def timed_requests(label: str, call, repeat: int) -> None:
+    """Run call() `repeat` times, print latency percentiles and queries per request."""
+    latencies = []
+    with count_queries() as counter:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            call()
+            latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"  {label:<27} p50={statistics.median(latencies):8.2f} ms  p99={p99:8.2f} ms  "
+        f"queries/request={counter.count / repeat:.1f}"
+    )
+
+
+# ----------------------------
+# Benchmarks
+# ----------------------------
+def _legacy_persist(db, depot, routes, planning_date) -> int:
+    """Former optimize_depot persistence (two queries per stop), kept here as the reference."""
+    scheduled_count = 0
+    for route in routes:
+        db.add(
+            Itineraire(
+                date_planifiee=planning_date,
+                depot_id=depot.id,
+                livreur_id=route["driver_id"],
+                distance_totale=route["distance_m"] / 1000,
+                temps_total=int(route["time_s"] / 60),
+                commandes_count=route["commandes_count"],
+                optimise=True,
+                metadonnees=route,
+            )
+        )
+        for commande_info in route["commandes"]:
+            commande = db.query(Commande).filter(Commande.id == commande_info["commande_id"]).first()
+            if commande:
+                livraison = db.query(Livraison).filter(
+                    Livraison.commande_id == commande.id,
+                    Livraison.livreur_id == route["driver_id"],
+                ).first()
+                if livraison:
+                    livraison.ordre_visite = commande_info["order"]
+                    livraison.date_planifiee = planning_date
+                else:
+                    db.add(
+                        Livraison(
+                            commande_id=commande.id,
+                            livreur_id=route["driver_id"],
+                            date_planifiee=planning_date,
+                            ordre_visite=commande_info["order"],
+                            statut=DeliveryStatus.PREPARATION,
+                        )
+                    )
+                commande.statut = DeliveryStatus.PREPARATION
+                scheduled_count += 1
+    return scheduled_count
+
+
+def bench_persist(args):
+    from scheduler import persist_routes
+
+    planning_date = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    print(f"{args.n} commandes, {args.drivers} routes, {int(args.existing * 100)}% with an existing livraison")
+
+    for label, persist in (("per-stop queries", _legacy_persist), ("bulk statements", persist_routes)):
+        reset_database()
+        db = SessionLocal()
+        depot_id = seed_depot(db, args.n, args.drivers).id
+
+        routes = round_robin_routes(db)
+        # Livraisons left over from an earlier run for part of the stops
+        existing = [
+            {"commande_id": stop["commande_id"], "livreur_id": route["driver_id"], "statut": DeliveryStatus.EN_ATTENTE}
+            for route in routes
+            for stop in route["commandes"][: int(len(route["commandes"]) * args.existing)]
+        ]
+        db.bulk_insert_mappings(Livraison, existing)
+        db.commit()
+        db.close()
+
+        db = SessionLocal()
+        depot = db.get(Depot, depot_id)
+        with count_queries() as counter:
+            started = time.perf_counter()
+            scheduled = persist(db, depot, routes, planning_date)
+            db.commit()
+            elapsed = time.perf_counter() - started
+        livraisons = db.query(Livraison).count()
+        db.close()
+        print(
+            f"  {label:<17} {elapsed * 1000:9.1f} ms  queries={counter.count:<6} "
+            f"scheduled={scheduled:<5} livraisons={livraisons}"
+        )
+
+
+def _legacy_list_itineraires(db, depot_id, start, end) -> list:
+    """Former list_itineraires body (one commande query per itinerary), kept here as the reference."""
+    routes = []
+    for it in (
+        db.query(Itineraire)
+        .filter(Itineraire.depot_id == depot_id)
+        .filter(Itineraire.date_planifiee >= start, Itineraire.date_planifiee < end)
+        .all()
+    ):
+        meta = it.metadonnees or {}
+        if isinstance(meta, str):
+            meta = json.loads(meta)
+        meta_commandes = meta.get("commandes") or []
+        commande_ids = [c.get("commande_id") for c in meta_commandes]
+        commandes_db = {c.id: c for c in db.query(Commande).filter(Commande.id.in_(commande_ids)).all()}
+        commandes = []
+        for c in sorted(meta_commandes, key=lambda x: x.get("order", 999999)):
+            cdb = commandes_db.get(c.get("commande_id"))
+            commandes.append(
+                {
+                    "commande_id": c.get("commande_id"),
+                    "order": c.get("order"),
+                    "lat": cdb.latitude if cdb else c.get("lat"),
+                    "lon": cdb.longitude if cdb else c.get("lon"),
+                    "id_commande": cdb.id_commande if cdb else None,
+                    "adresse": cdb.adresse if cdb else None,
+                    "statut": cdb.statut.value if cdb and cdb.statut else None,
+                    "poids": cdb.poids if cdb else None,
+                    "client_email": cdb.client_email if cdb else None,
+                    "code_tracking": cdb.code_tracking if cdb else None,
+                }
+            )
+        routes.append({"itineraire_id": it.id, "driver_id": it.livreur_id, "commandes": commandes})
+    db.query(Depot).filter(Depot.id == depot_id).all()
+    return routes
+
+
+def bench_itineraires(args):
+    from cache import itineraires_cache
+    from routes.itineraires import list_itineraires, operational_target_date
+    from scheduler import persist_routes
+
+    target = operational_target_date(datetime.now())
+    start = datetime(target.year, target.month, target.day)
+    end = start + timedelta(days=1)
+
+    reset_database()
+    db = SessionLocal()
+    depot_id = seed_depot(db, args.n, args.drivers).id
+    persist_routes(db, db.get(Depot, depot_id), round_robin_routes(db), start)
+    manager = User(
+        email="gestionnaire@bench.shipora.ma", nom="Gestionnaire", prenom="Bench",
+        role=UserRole.GESTIONNAIRE, depot_id=depot_id, actif=True,
+    )
+    db.add(manager)
+    db.commit()
+    manager_id = manager.id
+    db.close()
+    print(f"{args.n} commandes on {args.drivers} itineraires, {args.repeat} requests each")
+
+    db = SessionLocal()
+    adb = AsyncSessionLocal()
+    manager = db.get(User, manager_id)
+    db.expunge(manager)  # as get_current_user would hand it over: loaded, no refresh queries
+
+    def legacy():
+        _legacy_list_itineraires(db, depot_id, start, end)
+        db.expire_all()
+
+    def batched():
+        itineraires_cache.clear()
+        run_async(list_itineraires(db=adb, current_user=manager))
+        adb.expire_all()
+
+    def cached():
+        run_async(list_itineraires(db=adb, current_user=manager))
+
+    timed_requests("per-itinerary queries", legacy, args.repeat)
+    timed_requests("batched stops query", batched, args.repeat)
+    itineraires_cache.clear()
+    timed_requests("batched + cache", cached, args.repeat)
+    run_async(adb.close())
+    db.close()
+
+
+def bench_pages(args):
+    from pagination import PageParams, encode_cursor
+    from routes.commandes import list_commandes
+
+    def page_params(cursor=None):
+        return PageParams(cursor=cursor, limit=args.limit, date_from=None, date_to=None)
+
+    for n in args.sizes:
+        reset_database()
+        db = SessionLocal()
+        depot_id = seed_depot(db, n, 1).id
+        manager = User(
+            email="gestionnaire@bench.shipora.ma", nom="Gestionnaire", prenom="Bench",
+            role=UserRole.GESTIONNAIRE, depot_id=depot_id, actif=True,
+        )
+        db.add(manager)
+        db.commit()
+        manager_id = manager.id
+        db.close()
+
+        db = SessionLocal()
+        adb = AsyncSessionLocal()
+        manager = db.get(User, manager_id)
+        db.expunge(manager)
+        newest_first = (Commande.date_creation.desc(), Commande.id.desc())
+        middle = db.query(Commande).order_by(*newest_first).offset(n // 2).first()
+        middle_cursor = encode_cursor(middle.date_creation, middle.id)
+        print(f"{n} commandes, pages of {args.limit}")
+
+        def full_list():
+            db.query(Commande).filter(Commande.depot_id == depot_id).all()
+            db.expunge_all()
+
+        def offset_middle():
+            db.query(Commande).filter(Commande.depot_id == depot_id).order_by(*newest_first).offset(n // 2).limit(args.limit).all()
+            db.expunge_all()
+
+        def keyset(cursor):
+            def call():
+                run_async(list_commandes(statut=None, page=page_params(cursor), db=adb, current_user=manager))
+                adb.expunge_all()
+            return call
+
+        timed_requests("full list (before)", full_list, max(1, args.repeat // 10))
+        timed_requests("OFFSET, middle page", offset_middle, args.repeat)
+        timed_requests("keyset, first page", keyset(None), args.repeat)
+        timed_requests("keyset, middle page", keyset(middle_cursor), args.repeat)
+        run_async(adb.close())
+        db.close()
+
+
+def _legacy_dashboard_counts(db, depot_id) -> dict:
+    """Former get_dashboard_stats counting (one COUNT per figure), kept here as the reference."""
+    base = db.query(Commande).filter(Commande.depot_id == depot_id)
+    return {
+        "total": base.count(),
+        "livrees": base.filter(Commande.statut == DeliveryStatus.LIVREE).count(),
+        "en_attente": base.filter(Commande.statut == DeliveryStatus.EN_ATTENTE).count(),
+        "en_cours": base.filter(Commande.statut.in_([DeliveryStatus.PREPARATION])).count(),
+        "livreurs": db.query(User).filter(
+            User.depot_id == depot_id, User.role == UserRole.LIVREUR, User.actif == True  # noqa: E712
+        ).count(),
+    }
+
+
+def bench_dashboard(args):
+    import status_counters
+    from routes.reports import get_dashboard_stats
+
+    statuts = list(DeliveryStatus)
+    for n in args.sizes:
+        reset_database()
+        db = SessionLocal()
+        depot_id = seed_depot(db, n, 20).id
+        # Spread the history over every statut; a second depot doubles the table
+        for k, statut in enumerate(statuts):
+            db.query(Commande).filter(Commande.id % len(statuts) == k).update(
+                {Commande.statut: statut}, synchronize_session=False
+            )
+        other = Depot(nom="Autre dépôt", adresse="Rabat", latitude=34.02, longitude=-6.84, capacite_max=1e6)
+        db.add(other)
+        db.flush()
+        db.query(Commande).filter(Commande.id % 2 == 0).update({Commande.depot_id: other.id}, synchronize_session=False)
+        db.commit()
+        status_counters.reconcile(db)
+        manager = User(
+            email="gestionnaire@bench.shipora.ma", nom="Gestionnaire", prenom="Bench",
+            role=UserRole.GESTIONNAIRE, depot_id=depot_id, actif=True,
+        )
+        db.add(manager)
+        db.commit()
+        db.refresh(manager)
+        db.expunge(manager)
+        print(f"{n} commandes over 2 depots")
+        adb = AsyncSessionLocal()
+
+        def endpoint(counters: bool):
+            def call():
+                status_counters.COUNTERS_ENABLED = counters
+                run_async(get_dashboard_stats(db=adb, current_user=manager))
+            return call
+
+        timed_requests("five COUNT queries (before)", lambda: _legacy_dashboard_counts(db, depot_id), args.repeat)
+        timed_requests("one GROUP BY statut", endpoint(False), args.repeat)
+        timed_requests("counters table", endpoint(True), args.repeat)
+        run_async(adb.close())
+        db.close()
+
+
+def _legacy_performance(db, depot_id) -> list:
+    """Former get_performance_report (two COUNTs per driver), kept here as the reference."""
+    performance = []
+    for livreur in db.query(User).filter(User.depot_id == depot_id, User.role == UserRole.LIVREUR).all():
+        total = db.query(Livraison).filter(Livraison.livreur_id == livreur.id).count()
+        completees = db.query(Livraison).filter(
+            Livraison.livreur_id == livreur.id, Livraison.statut == DeliveryStatus.LIVREE
+        ).count()
+        performance.append({"livreur_id": livreur.id, "total": total, "completees": completees})
+    return performance
+
+
+def bench_performance(args):
+    import driver_stats
+    from routes.reports import get_performance_report
+
+    reset_database()
+    db = SessionLocal()
+    depot_id = seed_depot(db, 0, args.drivers).id
+    drivers = [u.id for u in db.query(User.id).filter(User.role == UserRole.LIVREUR)]
+    rng = random.Random(42)
+    today = datetime.now().date()
+    statuts = [DeliveryStatus.LIVREE] * 8 + [DeliveryStatus.ANNULEE, DeliveryStatus.EN_TRANSIT]
+    commande_id = 0
+    for day_offset in range(args.days, -1, -1):
+        day = datetime.combine(today - timedelta(days=day_offset), datetime.min.time())
+        livraisons = []
+        for driver_id in drivers:
+            for _ in range(args.per_day):
+                commande_id += 1
+                livraisons.append(
+                    {"commande_id": commande_id, "livreur_id": driver_id, "date_planifiee": day, "statut": rng.choice(statuts)}
+                )
+        db.bulk_insert_mappings(Livraison, livraisons)
+        db.bulk_insert_mappings(
+            Incident,
+            [
+                {"commande_id": rng.randint(1, commande_id), "type_incident": IncidentType.CLIENT_ABSENT,
+                 "description": "benchmark", "date_incident": day + timedelta(hours=12)}
+                for _ in range(len(livraisons) // 100)
+            ],
+        )
+    db.commit()
+    manager = User(
+        email="gestionnaire@bench.shipora.ma", nom="Gestionnaire", prenom="Bench",
+        role=UserRole.GESTIONNAIRE, depot_id=depot_id, actif=True,
+    )
+    db.add(manager)
+    db.commit()
+    db.refresh(manager)
+    db.expunge(manager)
+    print(f"{len(drivers)} drivers, {commande_id} livraisons over {args.days} days, {args.repeat} requests each")
+
+    month = (today - timedelta(days=30), today)
+    adb = AsyncSessionLocal()
+
+    def report(date_from=None, date_to=None):
+        def call():
+            run_async(get_performance_report(date_from=date_from, date_to=date_to, db=adb, current_user=manager))
+            adb.expunge_all()
+        return call
+
+    timed_requests("per-driver COUNTs (before)", lambda: _legacy_performance(db, depot_id), args.repeat)
+    timed_requests("grouped, all history", report(), args.repeat)
+    timed_requests("grouped, last 30 days", report(*month), args.repeat)
+    started = time.perf_counter()
+    rows = driver_stats.refresh(db, today=today)
+    print(f"  first rollup: {rows} rows in {time.perf_counter() - started:.1f}s")
+    timed_requests("rollups, all history", report(), args.repeat)
+    timed_requests("rollups, last 30 days", report(*month), args.repeat)
+    run_async(adb.close())
+    db.close()
+
+
+def _legacy_get_current_user(token: str, db):
+    """Former get_current_user (query + three prints per request), kept here as the reference."""
+    from security import decode_token
+
+    print("TOKEN RECU >>>", token)
+    payload = decode_token(token)
+    print("PAYLOAD >>>", payload)
+    user = db.query(User).filter(User.id == payload.get("user_id")).first()
+    print(f"✅ USER TROUVÉ: {user.id}, ROLE: {user.role}")
+    return user
+
+
+def bench_auth(args):
+    from contextlib import redirect_stdout
+
+    from fastapi import Depends, FastAPI
+    from fastapi.security.http import HTTPAuthorizationCredentials
+    from fastapi.testclient import TestClient
+
+    from cache import user_cache
+    from database import get_db
+    from dependencies import get_current_user, security
+    from security import create_access_token
+
+    reset_database()
+    db = SessionLocal()
+    depot_id = seed_depot(db, 0, args.users).id
+    tokens = [
+        create_access_token({"user_id": user_id, "role": UserRole.LIVREUR, "depot_id": depot_id})
+        for (user_id,) in db.query(User.id)
+    ]
+    print(f"{len(tokens)} users, {args.repeat} requests each; the former prints go to a log file")
+    log = open(os.path.join(tempfile.mkdtemp(), "stdout.log"), "w")
+
+    def legacy_user(token, session):
+        with redirect_stdout(log):
+            return _legacy_get_current_user(token, session)
+
+    # Both dependencies behind the same trivial endpoint, through the full HTTP stack
+    app = FastAPI()
+
+    @app.get("/legacy")
+    async def legacy(credentials=Depends(security), session=Depends(get_db)):
+        return {"id": legacy_user(credentials.credentials, session).id}
+
+    @app.get("/current")
+    async def current(user=Depends(get_current_user)):
+        return {"id": user.id}
+
+    rng = random.Random(42)
+
+    def request(path: str, clear_cache: bool = False):
+        def call():
+            if clear_cache:
+                user_cache.clear()
+            client.get(path, headers={"Authorization": f"Bearer {rng.choice(tokens)}"})
+        return call
+
+    # One client (one event loop) for all the requests, like a server
+    with TestClient(app) as client:
+        request("/legacy")()
+        timed_requests("query + prints (before)", request("/legacy"), args.repeat)
+        timed_requests("snapshot, cache miss", request("/current", clear_cache=True), args.repeat)
+        for token in tokens:  # every user seen once
+            client.get("/current", headers={"Authorization": f"Bearer {token}"})
+        timed_requests("snapshot, cached", request("/current"), args.repeat)
+        # Connections opened on the client's loop go back before it closes
+        client.portal.call(async_engine.dispose)
+
+    # The dependency alone
+    credentials = [HTTPAuthorizationCredentials(scheme="Bearer", credentials=token) for token in tokens]
+    timed_requests("dependency only (before)", lambda: legacy_user(rng.choice(tokens), db), args.repeat)
+    timed_requests(
+        "dependency only (cached)",
+        lambda: run_async(get_current_user(rng.choice(credentials))),
+        args.repeat,
+    )
+    log.close()
+    db.close()
+
+
+def _percentiles(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return f"p50={statistics.median(latencies):8.1f} ms  p99={p99:8.1f} ms"
+
+
+def bench_login(args):
+    import httpx
+    from fastapi import Depends, FastAPI, HTTPException
+    from sqlalchemy.orm import Session
+
+    import security
+    from database import get_db
+    from routes import auth
+
+    security.pwd_context.update(
+        bcrypt__default_rounds=args.rounds, bcrypt__min_rounds=args.rounds, bcrypt__max_rounds=args.rounds
+    )
+    reset_database()
+    db = SessionLocal()
+    depot_id = seed_depot(db, 0, 0).id
+    password_hash = security.get_password_hash("driver123")  # same password for everyone: hashed once
+    db.bulk_insert_mappings(
+        User,
+        [
+            {"email": f"driver{k}@bench.shipora.ma", "nom": f"Driver{k}", "prenom": "Bench",
+             "mot_de_passe_hash": password_hash, "role": UserRole.LIVREUR, "depot_id": depot_id, "actif": True}
+            for k in range(args.n)
+        ],
+    )
+    db.commit()
+    db.close()
+
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api/auth")
+
+    @app.post("/legacy/login")
+    async def legacy_login(credentials: auth.LoginRequest, session: Session = Depends(get_db)):
+        """
+        Former login: bcrypt inline on the event loop. Like the new one it gives its
+        connection back first; the former code kept it, and past the pool size
+        (10 + 20) concurrent logins waited on the pool from the blocked loop.
+        """
+        user = session.query(User.id, User.mot_de_passe_hash).filter(User.email == credentials.email).first()
+        session.rollback()
+        if not user or not security.verify_password(credentials.mot_de_passe, user.mot_de_passe_hash):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        return {"access_token": security.create_access_token({"user_id": user.id})}
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    async def burst(path: str):
+        """n logins at once, while another client sends a cheap request every 10 ms."""
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            pings = []
+            done = asyncio.Event()
+
+            async def pinger():
+                # Latency from the scheduled send time: what a request arriving then would wait
+                scheduled = time.perf_counter()
+                while not done.is_set():
+                    await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                    await client.get("/ping")
+                    now = time.perf_counter()
+                    pings.append((now - scheduled) * 1000)
+                    scheduled = max(scheduled + 0.01, now)
+
+            async def login(k: int):
+                started = time.perf_counter()
+                response = await client.post(path, json={"email": f"driver{k}@bench.shipora.ma", "mot_de_passe": "driver123"})
+                assert response.status_code == 200, response.text
+                return (time.perf_counter() - started) * 1000
+
+            pinging = asyncio.create_task(pinger())
+            started = time.perf_counter()
+            logins = await asyncio.gather(*(login(k) for k in range(args.n)))
+            elapsed = time.perf_counter() - started
+            done.set()
+            await pinging
+        return logins, pings, elapsed
+
+    print(
+        f"{args.n} concurrent logins, bcrypt cost {args.rounds}, "
+        f"hashing pool of {security.PASSWORD_HASH_WORKERS} threads, {os.cpu_count()} CPU"
+    )
+    for label, path in (("inline (before)", "/legacy/login"), ("hashing pool", "/api/auth/login")):
+        logins, pings, elapsed = asyncio.run(burst(path))
+        print(f"  {label:<16} logins  {_percentiles(logins)}  burst done in {elapsed:.1f}s")
+        print(f"  {'':<16} /ping   {_percentiles(pings)}  ({len(pings)} pings during the burst)")
+    security.shutdown_hash_executor()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = sub.add_parser("persist", help="saving optimized routes")
+    p.add_argument("--n", type=int, default=2000)
+    p.add_argument("--drivers", type=int, default=20)
+    p.add_argument("--existing", type=float, default=0.5, help="share of stops with an existing livraison")
+    p.set_defaults(func=bench_persist)
+
+    p = sub.add_parser("itineraires", help="manager itinerary list")
+    p.add_argument("--n", type=int, default=2000)
+    p.add_argument("--drivers", type=int, default=50)
+    p.add_argument("--repeat", type=int, default=50)
+    p.set_defaults(func=bench_itineraires)
+
+    p = sub.add_parser("pages", help="commande list pagination")
+    p.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[10_000, 100_000, 300_000])
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--repeat", type=int, default=50)
+    p.set_defaults(func=bench_pages)
+
+    p = sub.add_parser("dashboard", help="dashboard statistics")
+    p.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[10_000, 100_000, 300_000])
+    p.add_argument("--repeat", type=int, default=20)
+    p.set_defaults(func=bench_dashboard)
+
+    p = sub.add_parser("performance", help="driver performance report")
+    p.add_argument("--drivers", type=int, default=80)
+    p.add_argument("--days", type=int, default=180)
+    p.add_argument("--per-day", type=int, default=20, help="livraisons per driver and day")
+    p.add_argument("--repeat", type=int, default=10)
+    p.set_defaults(func=bench_performance)
+
+    p = sub.add_parser("auth", help="authenticated request overhead")
+    p.add_argument("--users", type=int, default=200)
+    p.add_argument("--repeat", type=int, default=2000)
+    p.set_defaults(func=bench_auth)
+
+    p = sub.add_parser("login", help="concurrent logins")
+    p.add_argument("--n", type=int, default=100)
+    p.add_argument("--rounds", type=int, default=None, help="bcrypt cost (default BCRYPT_ROUNDS)")
+    p.set_defaults(func=bench_login)
+
+    args = parser.parse_args()
+    if getattr(args, "rounds", 0) is None:
+        from security import BCRYPT_ROUNDS
+
+        args.rounds = BCRYPT_ROUNDS
+    try:
+        args.func(args)
+    finally:
+        # Pooled aiosqlite connections each hold a (non-daemon) thread until disposed
+        run_async(async_engine.dispose())
+
+
+if __name__ == "__main__":
+    main()
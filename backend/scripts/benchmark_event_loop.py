@@ -0,0 +1,67 @@
+"""
+Event-loop lag while an optimization runs (no real OSRM needed)
+Run: python scripts/benchmark_event_loop.py [--n 150] [--time-limit 5]
+
+Compares the former inline call (RouteOptimizer.optimize inside a coroutine)
+with run_optimization() on the thread and process executors, measuring the
+loop lag seen by a concurrent coroutine (what every other request would feel).
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_optimizer import random_instance, start_fake_osrm  # noqa: E402
+from monitoring import LoopLagMonitor  # noqa: E402
+from optimization import RouteOptimizer, executor  # noqa: E402
+
+
+async def measure(label: str, run) -> None:
+    monitor = LoopLagMonitor(interval=0.05)
+    monitor.start()
+    await asyncio.sleep(0.2)
+    await run()
+    await asyncio.sleep(0.2)  # let the monitor record the last wake-up
+    await monitor.stop()
+    stats = monitor.stats()
+    print(f"  {label:<18} p50={stats['p50_ms']:8.1f} ms  p99={stats['p99_ms']:8.1f} ms  max={stats['max_ms']:8.1f} ms")
+
+
+async def main(args):
+    server = start_fake_osrm(max_table_size=10_000)
+    os.environ["OSRM_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["OSRM_CACHE_PATH"] = ""
+    os.environ["OPTIMIZER_MAX_SECONDS"] = str(args.time_limit)
+    depot, commandes, drivers = random_instance(args.n, args.drivers, args.capacity)
+    kwargs = dict(commandes=commandes, drivers=drivers, depot_coords=depot, planning_date="2026-01-02")
+
+    print(f"{args.n} commandes, {args.drivers} drivers, solver capped at {args.time_limit}s")
+
+    async def inline():
+        RouteOptimizer().optimize(**kwargs)
+
+    await measure("inline (before)", inline)
+
+    for mode in ("thread", "process"):
+        executor.OPTIMIZER_EXECUTOR = mode
+        executor.shutdown_executor()
+
+        async def offloaded():
+            await executor.run_optimization(**kwargs)
+
+        await measure(f"{mode} executor", offloaded)
+
+    executor.shutdown_executor()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=150)
+    parser.add_argument("--drivers", type=int, default=8)
+    parser.add_argument("--capacity", type=float, default=400)
+    parser.add_argument("--time-limit", type=int, default=5, help="solver seconds")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,372 @@
+"""
+Benchmarks for the route optimizer (no real OSRM needed)
+Run: python scripts/benchmark_optimizer.py <benchmark> [options]
+
+Benchmarks:
+- matrix: tiled/concurrent OSRM table fetch against a local fake OSRM server
+- haversine: NumPy fallback matrices vs the former nested-loop implementation
+- drop: progressive drop-latest loop vs single-solve disjunction penalties
+- callbacks: native OR-Tools matrices vs Python transit callbacks
+- decompose: monolithic solve vs sweep / k-means geographic decomposition
+- warmstart: cold start vs warm start from the previous day's plan
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from optimization import RouteOptimizer  # noqa: E402
+from optimization.decomposition import METHODS as DECOMPOSITION_METHODS  # noqa: E402
+from optimization.optimizer import DROP_MODES  # noqa: E402
+
+
+# ----------------------------
+# Fake OSRM server
+# ----------------------------
+class FakeOSRMHandler(BaseHTTPRequestHandler):
+    """
+    Minimal /table/v1/driving: straight-line distance x 1.3, 30 km/h durations.
+    Honours sources/destinations and rejects requests above max_table_size.
+    """
+
+    max_table_size = 100
+    latency_s = 0.0
+    requests_count = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        type(self).requests_count += 1
+        url = urlsplit(self.path)
+        coords = [tuple(map(float, c.split(","))) for c in unquote(url.path.rsplit("/", 1)[-1]).split(";")]
+        query = dict(kv.split("=", 1) for kv in unquote(url.query).split("&") if kv)
+
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+        if len(coords) > self.max_table_size:
+            return self._reply({"code": "TooBig", "message": "Too many table coordinates"}, status=400)
+
+        everyone = list(range(len(coords)))
+        sources = [int(i) for i in query["sources"].split(";")] if "sources" in query else everyone
+        destinations = [int(i) for i in query["destinations"].split(";")] if "destinations" in query else everyone
+
+        def meters(a: int, b: int) -> float:
+            (lon1, lat1), (lon2, lat2) = coords[a], coords[b]
+            dx = (lon2 - lon1) * 111_320 * math.cos(math.radians((lat1 + lat2) / 2))
+            dy = (lat2 - lat1) * 110_540
+            return round(math.hypot(dx, dy) * 1.3, 1)
+
+        annotations = query.get("annotations", "duration").split(",")
+        body = {"code": "Ok"}
+        if "distance" in annotations:
+            body["distances"] = [[meters(i, j) for j in destinations] for i in sources]
+        if "duration" in annotations:
+            body["durations"] = [[round(meters(i, j) / (30 / 3.6), 1) for j in destinations] for i in sources]
+        self._reply(body)
+
+    def _reply(self, body: dict, status: int = 200):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_fake_osrm(max_table_size: int = 100, latency_s: float = 0.0) -> ThreadingHTTPServer:
+    FakeOSRMHandler.max_table_size = max_table_size
+    FakeOSRMHandler.latency_s = latency_s
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOSRMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def random_points(n: int, seed: int = 42, center=(33.5731, -7.5898), spread: float = 0.15):
+    rng = random.Random(seed)
+    return [(center[0] + rng.uniform(-spread, spread), center[1] + rng.uniform(-spread, spread)) for _ in range(n)]
+
+
+def random_instance(n_commandes: int, n_drivers: int, capacity_kg: float, seed: int = 42):
+    """Commandes/drivers dicts shaped like the scheduler's, around a fixed depot."""
+    rng = random.Random(seed)
+    points = random_points(n_commandes + 1, seed=seed)
+    depot = points[0]
+    commandes = [
+        {
+            "id": k,
+            "latitude": lat,
+            "longitude": lon,
+            "poids": rng.randint(5, 30),
+            "service_time_minutes": 10,
+            "created_at": f"2026-01-01T{k // 60:02d}:{k % 60:02d}:00",
+        }
+        for k, (lat, lon) in enumerate(points[1:], start=1)
+    ]
+    drivers = [{"id": 1000 + d, "capacity_kg": capacity_kg} for d in range(n_drivers)]
+    return depot, commandes, drivers
+
+
+# ----------------------------
+# Benchmarks
+# ----------------------------
+def bench_matrix(args):
+    server = start_fake_osrm(max_table_size=args.max_table_size, latency_s=args.latency)
+    osrm_url = f"http://127.0.0.1:{server.server_address[1]}"
+    points = random_points(args.n)
+
+    print(f"{args.n} points, fake OSRM max-table-size={args.max_table_size}, latency={args.latency}s")
+    for label, tile_size, workers in [
+        ("single request", args.n, 1),
+        (f"tiles {args.tile_size}, 1 worker", args.tile_size, 1),
+        (f"tiles {args.tile_size}, {args.workers} workers", args.tile_size, args.workers),
+    ]:
+        optimizer = RouteOptimizer(osrm_url, use_cache=False, tile_size=tile_size, max_workers=workers, retries=0)
+        FakeOSRMHandler.requests_count = 0
+        started = time.perf_counter()
+        distances, _ = optimizer.get_matrices(points)
+        elapsed = time.perf_counter() - started
+        haversine = optimizer._haversine_distance_matrix(points)
+        print(
+            f"  {label:<28} {elapsed * 1000:8.0f} ms  requests={FakeOSRMHandler.requests_count:<4} "
+            f"osrm_data={'yes' if distances != haversine else 'no (haversine fallback)'}"
+        )
+
+    server.shutdown()
+
+
+def _legacy_haversine_matrices(coordinates):
+    """Former pure-Python fallback (nested loops), kept here as the reference."""
+    n = len(coordinates)
+    distances = [[0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                continue
+            lat1, lon1 = coordinates[i]
+            lat2, lon2 = coordinates[j]
+            distances[i][j] = int(RouteOptimizer._haversine(lat1, lon1, lat2, lon2) * 1000)
+    speed_m_s = 50000 / 3600
+    durations = [[int(d / speed_m_s) for d in row] for row in distances]
+    return distances, durations
+
+
+def bench_haversine(args):
+    optimizer = RouteOptimizer(use_cache=False)
+    for n in args.sizes:
+        points = random_points(n)
+        every = list(range(n))
+
+        legacy_s = numpy_s = float("inf")
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            legacy = _legacy_haversine_matrices(points)
+            legacy_s = min(legacy_s, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            vectorized = optimizer._haversine_fallback(points, every, every)
+            numpy_s = min(numpy_s, time.perf_counter() - started)
+
+        print(
+            f"  n={n:<5} loops {legacy_s * 1000:9.1f} ms   numpy {numpy_s * 1000:8.1f} ms   "
+            f"speedup x{legacy_s / max(numpy_s, 1e-9):6.1f}   identical={legacy == vectorized}"
+        )
+
+
+def bench_drop(args):
+    server = start_fake_osrm(max_table_size=10_000)
+    osrm_url = f"http://127.0.0.1:{server.server_address[1]}"
+    depot, commandes, drivers = random_instance(args.n, args.drivers, args.capacity)
+    total_kg = sum(c["poids"] for c in commandes)
+
+    print(
+        f"{args.n} commandes ({total_kg} kg), {args.drivers} drivers x {args.capacity} kg, "
+        f"time limit {args.time_limit}s per solve"
+    )
+    for mode in DROP_MODES:
+        optimizer = RouteOptimizer(osrm_url, use_cache=False, drop_mode=mode)
+        optimizer.time_limit_seconds = args.time_limit
+        started = time.perf_counter()
+        result = optimizer.optimize(commandes, drivers, depot, planning_date="2026-01-02")
+        elapsed = time.perf_counter() - started
+        print(
+            f"  {mode:<12} wall {elapsed:7.1f} s  solves={result['matrix_stats']['relaxation_attempts']:<4} "
+            f"scheduled={result['commandes_scheduled']:<4} distance={result.get('total_distance_m', 0) / 1000:.1f} km"
+        )
+
+    server.shutdown()
+
+
+def bench_callbacks(args):
+    server = start_fake_osrm(max_table_size=10_000)
+    osrm_url = f"http://127.0.0.1:{server.server_address[1]}"
+    depot, commandes, drivers = random_instance(args.n, args.drivers, args.capacity)
+
+    print(f"{args.n} commandes, {args.drivers} drivers, one {args.time_limit}s solve (disjunction mode)")
+    for native in (False, True):
+        optimizer = RouteOptimizer(osrm_url, use_cache=False, drop_mode="disjunction", native_matrices=native)
+        optimizer.time_limit_seconds = args.time_limit
+        optimizer.stagnation_seconds = 0  # compare over the full time limit
+        result = optimizer.optimize(commandes, drivers, depot, planning_date="2026-01-02")
+        stats = result["search_stats"]
+        seconds = max(stats["wall_time_ms"], 1) / 1000
+        print(
+            f"  {'native matrices' if native else 'python callbacks':<17} "
+            f"neighbors/s={stats['accepted_neighbors'] / seconds:9.0f}  branches/s={stats['branches'] / seconds:10.0f}  "
+            f"scheduled={result['commandes_scheduled']:<4} distance={result['total_distance_m'] / 1000:.1f} km"
+        )
+
+    server.shutdown()
+
+
+def bench_decompose(args):
+    server = start_fake_osrm(max_table_size=10_000)
+    osrm_url = f"http://127.0.0.1:{server.server_address[1]}"
+    depot, commandes, drivers = random_instance(args.n, args.drivers, args.capacity)
+
+    print(
+        f"{args.n} commandes, {args.drivers} drivers, clusters of ~{args.cluster_size}, "
+        f"{args.workers} workers, {args.time_limit}s per solve (disjunction mode)"
+    )
+    baseline = None
+    for method in (None, *DECOMPOSITION_METHODS):
+        optimizer = RouteOptimizer(osrm_url, use_cache=False, drop_mode="disjunction")
+        optimizer.time_limit_seconds = args.time_limit
+        optimizer.cluster_size = args.cluster_size
+        optimizer.decompose_workers = args.workers
+        started = time.perf_counter()
+        result = optimizer.optimize(commandes, drivers, depot, planning_date="2026-01-02", decompose=method)
+        elapsed = time.perf_counter() - started
+
+        distance_km = result.get("total_distance_m", 0) / 1000
+        scheduled = result["commandes_scheduled"]
+        if baseline is None:
+            baseline = (scheduled, distance_km)
+        decomposition = result.get("decomposition", {})
+        clusters = len(decomposition.get("clusters", [])) or 1
+        repaired = (decomposition.get("repair") or {}).get("recovered", 0)
+        # Distances only compare at equal service: fewer commandes make shorter routes
+        if scheduled == baseline[0] and baseline[1]:
+            gap = f"gap={(distance_km / baseline[1] - 1) * 100:+6.1f} %"
+        else:
+            gap = f"gap n/a ({scheduled - baseline[0]:+d} scheduled)"
+        print(
+            f"  {method or 'monolithic':<11} wall {elapsed:7.1f} s  clusters={clusters:<3} "
+            f"scheduled={scheduled:<5} unscheduled={result['commandes_unscheduled']:<4} "
+            f"repaired={repaired:<3} distance={distance_km:9.1f} km  {gap}"
+        )
+
+    server.shutdown()
+
+
+def bench_warmstart(args):
+    server = start_fake_osrm(max_table_size=10_000)
+    osrm_url = f"http://127.0.0.1:{server.server_address[1]}"
+    depot, yesterday, drivers = random_instance(args.n, args.drivers, args.capacity)
+
+    # Today: a share of yesterday's addresses recur (new commande ids), the rest are new
+    rng = random.Random(7)
+    recurring = rng.sample(yesterday, int(args.n * args.recurring))
+    _, fresh, _ = random_instance(args.n - len(recurring), args.drivers, args.capacity, seed=99)
+    today = [
+        {**c, "id": 10_000 + k, "created_at": f"2026-01-02T{k // 60 % 24:02d}:{k % 60:02d}:00"}
+        for k, c in enumerate(recurring + fresh)
+    ]
+    new_id = {c["id"]: 10_000 + k for k, c in enumerate(recurring)}
+
+    optimizer = RouteOptimizer(osrm_url, use_cache=False, drop_mode=args.drop_mode)
+    optimizer.time_limit_seconds = args.time_limit
+    optimizer.stagnation_seconds = 0  # compare over the full time limit
+    plan = optimizer.optimize(yesterday, drivers, depot, planning_date="2026-01-01")["routes"]
+    initial_routes = [
+        {
+            "driver_id": route["driver_id"],
+            "commandes": [
+                {"commande_id": new_id[stop["commande_id"]]} for stop in route["commandes"] if stop["commande_id"] in new_id
+            ],
+        }
+        for route in plan
+    ]
+
+    print(
+        f"{args.n} commandes ({len(recurring)} recurring addresses), {args.drivers} drivers, "
+        f"{args.time_limit}s solve ({args.drop_mode} mode)"
+    )
+    for label, routes in (("cold start", None), ("warm start", initial_routes)):
+        result = optimizer.optimize(today, drivers, depot, planning_date="2026-01-02", initial_routes=routes)
+        stats = result["search_stats"]
+        trajectory = stats["objective_trajectory"]
+        print(
+            f"  {label:<11} first feasible {stats['first_solution_s'] * 1000:7.1f} ms  "
+            f"first cost={trajectory[0][1]:<10} final cost={trajectory[-1][1]:<10} "
+            f"scheduled={result['commandes_scheduled']:<4} warm_start={stats['warm_start']}"
+        )
+
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = sub.add_parser("matrix", help="tiled OSRM table fetch")
+    p.add_argument("--n", type=int, default=400)
+    p.add_argument("--tile-size", type=int, default=50)
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--max-table-size", type=int, default=100)
+    p.add_argument("--latency", type=float, default=0.05, help="simulated OSRM latency per request (s)")
+    p.set_defaults(func=bench_matrix)
+
+    p = sub.add_parser("haversine", help="haversine fallback matrices")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100, 300, 1000])
+    p.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    p.set_defaults(func=bench_haversine)
+
+    p = sub.add_parser("drop", help="order dropping strategies")
+    p.add_argument("--n", type=int, default=40)
+    p.add_argument("--drivers", type=int, default=3)
+    p.add_argument("--capacity", type=float, default=150)
+    p.add_argument("--time-limit", type=int, default=2, help="solver seconds per solve")
+    p.set_defaults(func=bench_drop)
+
+    p = sub.add_parser("callbacks", help="native matrices vs Python callbacks")
+    p.add_argument("--n", type=int, default=150)
+    p.add_argument("--drivers", type=int, default=8)
+    p.add_argument("--capacity", type=float, default=400)
+    p.add_argument("--time-limit", type=int, default=5, help="solver seconds")
+    p.set_defaults(func=bench_callbacks)
+
+    p = sub.add_parser("decompose", help="geographic decomposition")
+    p.add_argument("--n", type=int, default=400)
+    p.add_argument("--drivers", type=int, default=12)
+    p.add_argument("--capacity", type=float, default=600)
+    p.add_argument("--cluster-size", type=int, default=80)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--time-limit", type=int, default=10, help="solver seconds per solve")
+    p.set_defaults(func=bench_decompose)
+
+    p = sub.add_parser("warmstart", help="warm start from the previous plan")
+    p.add_argument("--n", type=int, default=200)
+    p.add_argument("--drivers", type=int, default=8)
+    p.add_argument("--capacity", type=float, default=600)
+    p.add_argument("--recurring", type=float, default=0.8, help="share of recurring addresses")
+    p.add_argument("--drop-mode", choices=DROP_MODES, default="disjunction")
+    p.add_argument("--time-limit", type=int, default=5, help="solver seconds")
+    p.set_defaults(func=bench_warmstart)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
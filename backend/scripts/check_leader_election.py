@@ -0,0 +1,102 @@
+"""
+Leader election check with several local processes
+Run: python scripts/check_leader_election.py [--processes 3] [--ttl 3]
+
+Starts N processes competing for the same scheduler lease (SQLite file by
+default, or DATABASE_URL), checks that exactly one is leader, kills the
+leader without releasing the lease, then checks that exactly one standby
+takes over once the lease has expired. Exits 1 on failure.
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'leader_check.sqlite3')}"
+
+
+def contender(ttl: float, renew: float, states):
+    import asyncio
+
+    from leader import LeaderLease
+
+    async def run():
+        lease = LeaderLease("leader_check", ttl_seconds=ttl, renew_seconds=renew)
+        lease.start()
+        while True:
+            states[os.getpid()] = lease.is_leader
+            await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+
+
+def leaders(states, alive):
+    return sorted(pid for pid, is_leader in states.items() if is_leader and pid in alive)
+
+
+def observe(states, alive, seconds: float) -> set:
+    """Leader sets seen while sampling for `seconds`."""
+    seen = set()
+    end = time.time() + seconds
+    while time.time() < end:
+        seen.add(tuple(leaders(states, alive)))
+        time.sleep(0.05)
+    return seen
+
+
+def main(args):
+    import models  # noqa: F401  (registers the tables)
+    from database import init_db
+
+    init_db()
+    renew = args.ttl / 3
+    manager = mp.Manager()
+    states = manager.dict()
+    processes = [mp.Process(target=contender, args=(args.ttl, renew, states)) for _ in range(args.processes)]
+    for p in processes:
+        p.start()
+    alive = {p.pid for p in processes}
+    ok = True
+
+    time.sleep(renew * 2)
+    seen = observe(states, alive, args.ttl)
+    print(f"phase 1: leader sets seen {sorted(seen)}")
+    if len(seen) != 1 or len(next(iter(seen))) != 1:
+        print("  FAIL: expected exactly one stable leader")
+        ok = False
+
+    leader_pid = leaders(states, alive)[0] if leaders(states, alive) else None
+    if leader_pid is not None:
+        killed = next(p for p in processes if p.pid == leader_pid)
+        killed.kill()
+        killed.join()
+        alive.discard(leader_pid)
+        print(f"killed leader {leader_pid}")
+
+        seen = observe(states, alive, args.ttl + renew * 3)
+        multi = [s for s in seen if len(s) > 1]
+        final = leaders(states, alive)
+        print(f"phase 2: leader sets seen {sorted(seen)}, final {final}")
+        if multi or len(final) != 1:
+            print("  FAIL: expected exactly one standby to take over, never two leaders")
+            ok = False
+
+    for p in processes:
+        if p.is_alive():
+            p.kill()
+            p.join()
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=3)
+    parser.add_argument("--ttl", type=float, default=3.0, help="lease TTL (s); renewed every ttl / 3")
+    main(parser.parse_args())
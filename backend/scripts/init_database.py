@@ -9,6 +9,7 @@ sys.path.insert(0, '/backend')
 from database import SessionLocal, init_db
 from models import User, Depot, Commande, UserRole, DeliveryStatus
 from security import get_password_hash
+import status_counters
 from datetime import datetime, timedelta
 import uuid
 
@@ -155,6 +156,8 @@ def init_database():
             db.add(commande)
         
         db.commit()
+        if status_counters.COUNTERS_ENABLED:
+            status_counters.reconcile(db)
         print("Database initialized successfully!")
         print("\nDemo credentials:")
         print("- Admin: admin@example.com / admin123")
@@ -0,0 +1,141 @@
+"""
+Read endpoints under concurrent load, sync Session vs AsyncSession, one uvicorn worker
+Run: python scripts/load_test_async_db.py [--n 5000] [--duration 10] [--concurrency 16] [--latency-ms 0,2,5]
+Uses DATABASE_URL if set, else a throwaway SQLite file (tables are dropped and recreated).
+
+Same harness as load_test_tracking.py: each scenario starts a fresh
+single-worker uvicorn server and keeps `concurrency` connections busy on
+- the commande list (first page), one query
+- the dashboard stats, two queries
+served either by the former handlers (sync Session, queries run on the event
+loop) or by the routes (AsyncSession). Authentication is stubbed out: it is the
+same in both stacks.
+
+--latency-ms adds a round trip to every statement (SQLite only), as a database
+across the network would: the sync driver waits on the event loop, blocking
+every other request, aiosqlite waits in its own thread like asyncpg waits on
+its socket. 0 measures the driver overhead alone, on a local file.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_api import reset_database, seed_depot  # noqa: E402
+from database import DATABASE_URL, SessionLocal  # noqa: E402
+from load_test_tracking import dispose_on_shutdown, forget_parent_connections, measure, run_server  # noqa: E402
+from models import Commande, DeliveryStatus, User, UserRole  # noqa: E402
+
+
+class _SlowCursor(sqlite3.Cursor):
+    latency = 0.0
+
+    def execute(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super().execute(*args, **kwargs)
+
+
+class _SlowConnection(sqlite3.Connection):
+    def cursor(self, factory=_SlowCursor):
+        return super().cursor(factory)
+
+
+def _add_latency(latency_ms: float) -> None:
+    """Rebind both session factories to engines whose statements each wait latency_ms first."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    import database
+
+    _SlowCursor.latency = latency_ms / 1000
+    options = {"pool_size": 10, "max_overflow": 20, "connect_args": {"factory": _SlowConnection}}
+    database.SessionLocal.configure(bind=create_engine(database.DATABASE_URL, **options))
+    database.async_engine = create_async_engine(database.ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, **options)
+    database.AsyncSessionLocal.configure(bind=database.async_engine)
+
+
+def _serve(port: int, stack: str, latency_ms: float, manager) -> None:
+    """Server process: the routes (async) or the former handlers (sync) under the same paths."""
+    from fastapi import Depends, FastAPI
+    from sqlalchemy.orm import Session
+
+    import status_counters
+    from database import get_db
+    from dependencies import get_current_user
+    from pagination import PageParams, paginate
+    from routes import commandes, reports
+    from schemas import CommandeResponse, Page
+
+    forget_parent_connections()
+    if latency_ms:
+        _add_latency(latency_ms)
+
+    app = FastAPI(lifespan=dispose_on_shutdown)
+    app.dependency_overrides[get_current_user] = lambda: manager
+
+    if stack == "async":
+        app.include_router(commandes.router, prefix="/api/commandes")
+        app.include_router(reports.router, prefix="/api/reports")
+    else:
+        @app.get("/api/commandes/", response_model=Page[CommandeResponse])
+        async def legacy_list_commandes(page: PageParams = Depends(), db: Session = Depends(get_db)):
+            query = db.query(Commande).filter(Commande.depot_id == manager.depot_id)
+            return paginate(query, page, Commande.id, Commande.date_creation)
+
+        @app.get("/api/reports/dashboard-stats")
+        async def legacy_dashboard_stats(db: Session = Depends(get_db)):
+            par_statut = status_counters.count_by_statut(db, manager.depot_id)
+            livreurs_actifs = db.query(User).filter(
+                User.depot_id == manager.depot_id, User.role == UserRole.LIVREUR, User.actif == True  # noqa: E712
+            ).count()
+            return {"total_commandes": sum(par_statut.values()), "livreurs_actifs": livreurs_actifs}
+
+    run_server(app, port)
+
+
+def main(args):
+    from dependencies import UserSnapshot
+
+    latencies = [float(v) for v in args.latency_ms.split(",")]
+    if any(latencies) and not DATABASE_URL.startswith("sqlite"):
+        raise SystemExit("--latency-ms only applies to SQLite; against a remote database the latency is real, use 0")
+
+    reset_database()
+    db = SessionLocal()
+    depot_id = seed_depot(db, args.n, args.drivers).id
+    statuts = list(DeliveryStatus)
+    for k, statut in enumerate(statuts):
+        db.query(Commande).filter(Commande.id % len(statuts) == k).update(
+            {Commande.statut: statut}, synchronize_session=False
+        )
+    db.commit()
+    db.close()
+    manager = UserSnapshot(id=0, role=UserRole.GESTIONNAIRE, depot_id=depot_id, actif=True)
+    print(
+        f"{args.n} commandes, 1 uvicorn worker, {args.concurrency} connections, "
+        f"{args.duration:.0f}s per scenario, {os.cpu_count()} CPU"
+    )
+
+    endpoints = (("commande page", "/api/commandes/"), ("dashboard stats", "/api/reports/dashboard-stats"))
+    for latency_ms in latencies:
+        print(f"{latency_ms:g} ms per statement" + (" (local file)" if not latency_ms else ""))
+        for name, path in endpoints:
+            for stack in ("sync", "async"):
+                label = f"{name}, {stack}" + (" (before)" if stack == "sync" else "")
+                measure(label, args, [path], _serve, (stack, latency_ms, manager))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=5000, help="commandes in the depot")
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    # Below the connection pool size (10 + 20 overflow): the sync handlers hold a connection until teardown
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", default="0,2,5", help="comma-separated round trips to simulate, in ms")
+    main(parser.parse_args())
@@ -0,0 +1,243 @@
+"""
+Sustained load on the public tracking endpoint, one uvicorn worker
+Run: python scripts/load_test_tracking.py [--n 5000] [--duration 10] [--concurrency 16]
+Uses DATABASE_URL if set, else a throwaway SQLite file (tables are dropped and recreated).
+
+Each scenario starts a fresh single-worker uvicorn server (separate process)
+and keeps `concurrency` HTTP connections busy for `duration` seconds, asking
+for random tracking codes. Reports the requests/second measured, the
+requests/second one worker sustains per core of CPU (server CPU time per
+request, read from /proc) and latency percentiles:
+- before: former handler (commande lookup + lazy-loaded livraison)
+- joined query: new handler with the cache disabled
+- cached: new handler, every code already cached
+- revalidation: cached, the client sends If-None-Match (304, no body)
+- one IP, rate limited: a single client hammering one code with the default limits
+The load generator runs on the same machine: on few cores it competes with the
+server, so read the figures relative to each other.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import statistics
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_api import reset_database, round_robin_routes, seed_depot  # noqa: E402
+from database import SessionLocal, async_engine, engine  # noqa: E402
+from models import Commande, Depot  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process (Linux /proc; 0 elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def forget_parent_connections() -> None:
+    """In a forked server: do not share the parent's pooled connections."""
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+@asynccontextmanager
+async def dispose_on_shutdown(app):
+    """Lifespan of the test servers: each pooled aiosqlite connection keeps a thread alive until disposed."""
+    import database
+
+    yield
+    await database.async_engine.dispose()  # looked up now: a benchmark may have rebound it
+
+
+def run_server(app, port: int) -> None:
+    import logging
+
+    import uvicorn
+
+    logging.getLogger("sqlalchemy").setLevel(logging.ERROR)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error", access_log=False)
+
+
+def _serve(port: int, cache_ttl: float, rate: float) -> None:
+    """Server process: tracking router only (no scheduler), plus the former handler."""
+    from fastapi import Depends, FastAPI, HTTPException
+    from sqlalchemy.orm import Session
+
+    from cache import tracking_cache
+    from database import get_db
+    from rate_limit import tracking_rate_limit
+    from routes import clients
+
+    forget_parent_connections()
+    tracking_cache.ttl_seconds = cache_ttl
+    tracking_rate_limit.rate = rate
+
+    app = FastAPI(lifespan=dispose_on_shutdown)
+    app.include_router(clients.router, prefix="/api/clients")
+
+    @app.get("/legacy/tracking/{code_tracking}")
+    async def legacy_track_order(code_tracking: str, db: Session = Depends(get_db)):
+        commande = db.query(Commande).filter(Commande.code_tracking == code_tracking).first()
+        if not commande:
+            raise HTTPException(status_code=404, detail="Order not found")
+        livraison = commande.livraison if commande.livraison else None
+        return {
+            "id": commande.id,
+            "code_tracking": commande.code_tracking,
+            "adresse": commande.adresse,
+            "statut": commande.statut,
+            "date_creation": commande.date_creation,
+            "livraison": {
+                "date_planifiee": livraison.date_planifiee if livraison else None,
+                "statut": livraison.statut if livraison else None,
+            } if livraison else None,
+        }
+
+    run_server(app, port)
+
+
+async def _load(base_url: str, paths: list, duration: float, concurrency: int, headers: dict) -> tuple:
+    import httpx
+
+    statuses = Counter()
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def user(client):
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.get(rng.choice(paths), headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(user(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return statuses, latencies, elapsed
+
+
+def scenario(label: str, args, paths: list, cache_ttl: float = 0, rate: float = 0, headers=None, warmup=False):
+    measure(label, args, paths, _serve, (cache_ttl, rate), headers=headers, warmup=warmup)
+
+
+def measure(label: str, args, paths: list, serve, serve_args=(), headers=None, warmup=False) -> None:
+    """
+    Start serve(port, *serve_args) in a forked process, keep args.concurrency
+    connections busy on `paths` for args.duration seconds, print one result line.
+    """
+    import httpx
+
+    port = free_port()
+    server = multiprocessing.get_context("fork").Process(target=serve, args=(port, *serve_args), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/docs", timeout=1)
+            break
+        except httpx.TransportError:
+            time.sleep(0.1)
+    else:
+        server.terminate()
+        raise RuntimeError("uvicorn did not start")
+
+    try:
+        if warmup:
+            with httpx.Client(base_url=base_url) as client:
+                for path in paths:
+                    client.get(path)
+        cpu_before = cpu_seconds(server.pid)
+        statuses, latencies, elapsed = asyncio.run(
+            _load(base_url, paths, args.duration, args.concurrency, headers or {})
+        )
+        server_cpu = cpu_seconds(server.pid) - cpu_before
+    finally:
+        server.terminate()
+        server.join()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    requests = sum(statuses.values())
+    codes = " ".join(f"{code}:{count}" for code, count in sorted(statuses.items()))
+    # Server CPU per request: what one worker sustains on a core of its own
+    capacity = f"{requests / server_cpu:8.0f} req/s per core" if server_cpu else ""
+    print(
+        f"  {label:<30} {requests / elapsed:6.0f} req/s measured  {capacity}  "
+        f"p50={statistics.median(latencies):7.2f} ms  p99={p99:7.2f} ms  [{codes}]"
+    )
+
+
+def main(args):
+    from scheduler import persist_routes
+
+    reset_database()
+    db = SessionLocal()
+    depot_id = seed_depot(db, args.n, args.drivers).id
+    persist_routes(db, db.get(Depot, depot_id), round_robin_routes(db), datetime.utcnow())
+    db.commit()
+    codes = [code for (code,) in db.query(Commande.code_tracking)]
+    db.close()
+    print(
+        f"{len(codes)} commandes, 1 uvicorn worker, {args.concurrency} connections, "
+        f"{args.duration:.0f}s per scenario"
+    )
+
+    new = [f"/api/clients/tracking/{code}" for code in codes]
+    scenario("before", args, [f"/legacy/tracking/{code}" for code in codes])
+    scenario("joined query", args, new)
+    scenario("cached", args, new, cache_ttl=3600, warmup=True)
+
+    # The client already holds the current version of the code it asks for
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from routes import clients
+
+    app = FastAPI(lifespan=dispose_on_shutdown)
+    app.include_router(clients.router, prefix="/api/clients")
+    probe = new[:1]
+    with TestClient(app) as client:
+        etag = client.get(probe[0]).headers["etag"]
+    scenario("revalidation (304)", args, probe, cache_ttl=3600, headers={"If-None-Match": etag}, warmup=True)
+
+    from rate_limit import tracking_rate_limit
+
+    scenario(
+        "one IP, rate limited", args, probe, cache_ttl=3600, rate=tracking_rate_limit.rate, warmup=True
+    )
+    print(
+        f"  (limit: {tracking_rate_limit.rate:g} request/s per IP, bursts of {tracking_rate_limit.burst}; "
+        f"the 200s above are what one IP got in {args.duration:.0f}s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=5000, help="commandes (tracking codes)")
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    # Below the connection pool size (10 + 20 overflow): the sync handlers hold a connection until teardown
+    parser.add_argument("--concurrency", type=int, default=16)
+    main(parser.parse_args())
@@ -0,0 +1,105 @@
+"""
+Migration: itineraire_stops table + backfill from Itineraire.metadonnees
+Run once after deploying: python scripts/migrate_itineraire_stops.py [--batch-size 500]
+
+Creates the table (and its indexes) if missing, then creates the stop rows
+of every itinerary that has none yet, from the route stored in metadonnees
+(a JSON string in older rows). Idempotent: already migrated rows are skipped.
+ETA and leg values are only known for routes that carried them.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from database import SessionLocal, init_db  # noqa: E402
+from models import Commande, Itineraire, ItineraireStop  # noqa: E402
+
+
+def stops_from_route(route: dict, known_ids: set) -> list:
+    """Stop rows of a stored route, commandes that no longer exist left out."""
+    stops = [
+        c for c in (route or {}).get("commandes") or []
+        if isinstance(c, dict) and c.get("commande_id") in known_ids
+    ]
+    stops.sort(key=lambda c: c.get("order") or 0)
+    # Renumber from 1: (itineraire_id, ordre) is unique
+    return [
+        {
+            "commande_id": c["commande_id"],
+            "ordre": rank,
+            "eta_s": c.get("eta_s"),
+            "leg_distance_m": c.get("leg_distance_m"),
+            "leg_time_s": c.get("leg_time_s"),
+        }
+        for rank, c in enumerate(stops, start=1)
+    ]
+
+
+def migrate(batch_size: int) -> None:
+    init_db()  # creates itineraire_stops if missing
+    db = SessionLocal()
+    try:
+        migrated = skipped = created = 0
+        last_id = 0
+        while True:
+            batch = (
+                db.query(Itineraire.id, Itineraire.metadonnees)
+                .filter(Itineraire.id > last_id)
+                .filter(~Itineraire.stops.any())
+                .order_by(Itineraire.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            metas = {}
+            referenced = set()
+            for itineraire_id, meta in batch:
+                if isinstance(meta, str):
+                    try:
+                        meta = json.loads(meta)
+                    except ValueError:
+                        meta = {}
+                metas[itineraire_id] = meta
+                referenced.update(
+                    c.get("commande_id") for c in (meta or {}).get("commandes") or [] if isinstance(c, dict)
+                )
+            referenced.discard(None)
+            known_ids = set()
+            if referenced:
+                known_ids = {cid for (cid,) in db.query(Commande.id).filter(Commande.id.in_(referenced))}
+
+            rows = []
+            for itineraire_id, meta in metas.items():
+                stops = stops_from_route(meta, known_ids)
+                if not stops:
+                    skipped += 1
+                    continue
+                rows.extend({**stop, "itineraire_id": itineraire_id} for stop in stops)
+                migrated += 1
+
+            if rows:
+                db.bulk_insert_mappings(ItineraireStop, rows)
+            db.commit()
+            created += len(rows)
+            print(f"  up to itineraire {last_id}: {migrated} migrated, {skipped} without stops, {created} stops")
+
+        print(f"✅ Done: {migrated} itineraires migrated, {created} stops created, {skipped} skipped")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    migrate(parser.parse_args().batch_size)
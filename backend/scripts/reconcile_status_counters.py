@@ -0,0 +1,36 @@
+"""
+Rebuild the dashboard counters (table depot_status_counters) from commandes
+Run once after setting DASHBOARD_COUNTERS=1: python scripts/reconcile_status_counters.py [--depot-id 3]
+The scheduler leader also runs it every night at 03:00 while the counters are enabled.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from database import SessionLocal, init_db  # noqa: E402
+import status_counters  # noqa: E402
+
+
+def main(depot_id):
+    init_db()  # creates depot_status_counters if missing
+    db = SessionLocal()
+    try:
+        rows = status_counters.reconcile(db, depot_id=depot_id)
+        print(f"✅ {rows} counter rows rebuilt")
+        if not status_counters.COUNTERS_ENABLED:
+            print("⚠️  DASHBOARD_COUNTERS is not 1: the counters are neither maintained nor read")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depot-id", type=int, default=None, help="only this depot (default: all)")
+    main(parser.parse_args().depot_id)
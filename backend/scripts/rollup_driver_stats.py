@@ -0,0 +1,36 @@
+"""
+Roll up livraisons / incidents into driver_daily_stats (per driver and day)
+Run: python scripts/rollup_driver_stats.py [--full]
+The scheduler leader runs the same job every night at 02:00; its first run
+backfills the whole history. --full recomputes every day (e.g. after fixing
+old statuses, which the nightly job only revisits for DRIVER_STATS_REFRESH_DAYS).
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from database import SessionLocal, init_db  # noqa: E402
+import driver_stats  # noqa: E402
+
+
+def main(full: bool):
+    init_db()  # creates driver_daily_stats if missing
+    db = SessionLocal()
+    try:
+        rows = driver_stats.refresh(db, full=full)
+        print(f"✅ {rows} rows written, rolled up through {driver_stats.rolled_through(db)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="recompute the whole history")
+    main(parser.parse_args().full)
@@ -0,0 +1,166 @@
+"""
+Per-depot commande counts by statut (table depot_status_counters)
+Optional, DASHBOARD_COUNTERS=1: every statut change adjusts the counters in
+the same transaction, so the dashboard reads a handful of rows instead of
+aggregating the depot's whole history.
+- ORM changes (new commandes, commande.statut = ...) are picked up by a
+  session after_flush hook; Commande.statut / depot_id are active_history,
+  so the previous value is known even when set on an expired instance;
+- bulk UPDATE statements bypass it and call adjust() themselves.
+reconcile() recomputes every counter from commandes: run nightly by the
+scheduler leader to absorb any drift, and once by hand after enabling (see
+its docstring for concurrent writers).
+"""
+
+import logging
+import os
+from collections import Counter
+from typing import Dict, Optional
+
+from sqlalchemy import delete, event, func, insert, select, text, update
+from sqlalchemy.orm import Session, attributes
+
+from models import Commande, DeliveryStatus, DepotStatusCounter
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_ENABLED = os.getenv("DASHBOARD_COUNTERS", "0") == "1"
+
+
+def count_by_statut(db: Session, depot_id: int) -> Dict[DeliveryStatus, int]:
+    """Commandes of the depot per statut, one GROUP BY over commandes."""
+    rows = (
+        db.query(Commande.statut, func.count(Commande.id))
+        .filter(Commande.depot_id == depot_id)
+        .group_by(Commande.statut)
+    )
+    return {statut: count for statut, count in rows if statut is not None}
+
+
+def read_counts(db: Session, depot_id: int) -> Dict[DeliveryStatus, int]:
+    """Same as count_by_statut, from the counters table (one row per statut)."""
+    rows = db.query(DepotStatusCounter.statut, DepotStatusCounter.count).filter(
+        DepotStatusCounter.depot_id == depot_id
+    )
+    return {statut: count for statut, count in rows}
+
+
+def adjust(db: Session, deltas: Counter) -> None:
+    """Add deltas {(depot_id, statut): n} to the counters (creates missing rows)."""
+    if not COUNTERS_ENABLED:
+        return
+    _apply(db.connection(), deltas)
+
+
+def _apply(conn, deltas: Counter) -> None:
+    rows = [
+        {"depot_id": depot_id, "statut": statut, "count": n}
+        for (depot_id, statut), n in deltas.items()
+        if n and depot_id is not None and statut is not None
+    ]
+    if not rows:
+        return
+
+    dialect = conn.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        stmt = upsert(DepotStatusCounter)
+        conn.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[DepotStatusCounter.depot_id, DepotStatusCounter.statut],
+                set_={"count": DepotStatusCounter.count + stmt.excluded["count"]},
+            ),
+            rows,
+        )
+        return
+
+    # Other databases: increment, insert the rows that did not exist yet
+    for row in rows:
+        result = conn.execute(
+            update(DepotStatusCounter)
+            .where(DepotStatusCounter.depot_id == row["depot_id"], DepotStatusCounter.statut == row["statut"])
+            .values(count=DepotStatusCounter.count + row["count"])
+        )
+        if not result.rowcount:
+            conn.execute(insert(DepotStatusCounter), [row])
+
+
+def _track_flush(session: Session, flush_context) -> None:
+    """after_flush: counter deltas of the Commande rows just inserted / updated / deleted."""
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Commande):
+            deltas[(obj.depot_id, obj.statut or DeliveryStatus.EN_ATTENTE)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Commande):
+            old_depot = _old_value(obj, "depot_id")
+            deltas[(old_depot, _old_value(obj, "statut"))] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, Commande):
+            continue
+        statut = attributes.get_history(obj, "statut")
+        depot = attributes.get_history(obj, "depot_id")
+        if not (statut.has_changes() or depot.has_changes()):
+            continue
+        deltas[(_old_value(obj, "depot_id"), _old_value(obj, "statut"))] -= 1
+        deltas[(obj.depot_id, obj.statut)] += 1
+    if deltas:
+        _apply(session.connection(), deltas)
+
+
+def _old_value(obj: Commande, key: str):
+    history = attributes.get_history(obj, key)
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, key)
+
+
+def reconcile(db: Session, depot_id: Optional[int] = None) -> int:
+    """
+    Rebuild the counters from commandes (all depots by default). Returns rows written.
+    On PostgreSQL the counters table is locked until commit: writers that already
+    adjusted a counter commit first and their commandes are counted; the others
+    wait and add their delta on top of the rebuilt counters. Not locked elsewhere:
+    SQLite allows one writer at a time, other databases need writers quiesced.
+    """
+    deleted = delete(DepotStatusCounter)
+    source = (
+        select(Commande.depot_id, Commande.statut, func.count(Commande.id))
+        .where(Commande.depot_id.is_not(None), Commande.statut.is_not(None))
+        .group_by(Commande.depot_id, Commande.statut)
+    )
+    if depot_id is not None:
+        deleted = deleted.where(DepotStatusCounter.depot_id == depot_id)
+        source = source.where(Commande.depot_id == depot_id)
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Blocks adjust() / the flush hook (ROW EXCLUSIVE), not the dashboard reads; each
+        # statement below takes its snapshot after the lock (READ COMMITTED)
+        db.execute(text(f"LOCK TABLE {DepotStatusCounter.__tablename__} IN EXCLUSIVE MODE"))
+    before = {(r.depot_id, r.statut): r.count for r in db.query(DepotStatusCounter)}
+    db.execute(deleted)
+    result = db.execute(
+        insert(DepotStatusCounter).from_select(
+            [DepotStatusCounter.depot_id, DepotStatusCounter.statut, DepotStatusCounter.count], source
+        )
+    )
+    db.commit()
+
+    after = {(r.depot_id, r.statut): r.count for r in db.query(DepotStatusCounter)}
+    drift = {key: after.get(key, 0) - before.get(key, 0) for key in before.keys() | after.keys()}
+    drift = {key: n for key, n in drift.items() if n and (depot_id is None or key[0] == depot_id)}
+    if drift:
+        logger.warning(
+            f"Status counters reconciled, drift corrected on {len(drift)} counters "
+            f"({sum(abs(n) for n in drift.values())} commandes)"
+        )
+    else:
+        logger.info("Status counters reconciled, no drift")
+    return result.rowcount
+
+
+if COUNTERS_ENABLED:
+    event.listen(Session, "after_flush", _track_flush)
@@ -0,0 +1,47 @@
+"""
+Optimization worker: claims queued jobs (optimization_jobs) and runs them
+Run: python worker.py   (start as many as needed, on any host sharing the DB)
+"""
+
+import asyncio
+import logging
+import os
+import socket
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database import SessionLocal, init_db  # noqa: E402
+from job_queue import JOB_POLL_SECONDS, claim_job, run_job  # noqa: E402
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("worker")
+
+
+async def main():
+    init_db()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Optimization worker {worker_id} started")
+
+    while True:
+        db = SessionLocal()
+        try:
+            job = claim_job(db, worker_id)
+        finally:
+            db.close()
+
+        if job is None:
+            await asyncio.sleep(JOB_POLL_SECONDS)
+            continue
+        await run_job(job)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Optimization worker stopped")
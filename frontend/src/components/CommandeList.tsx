@@ -5,6 +5,7 @@ import axios from "axios"
 import type { User } from "../App"
 
 const API_URL = "http://localhost:8000/api"
+const PAGE_SIZE = 100
 
 interface Commande {
   id: number
@@ -22,30 +23,43 @@ interface CommandeListProps {
 
 export default function CommandeList({ user, refreshTrigger }: CommandeListProps) {
   const [commandes, setCommandes] = useState<Commande[]>([])
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [filter, setFilter] = useState("all")
 
   useEffect(() => {
+    setLoading(true)
     fetchCommandes()
-  }, [refreshTrigger])
+  }, [refreshTrigger, filter])
 
-  const fetchCommandes = async () => {
+  // Pages triées des plus récentes aux plus anciennes ; cursor = next_cursor de la page précédente
+  const fetchCommandes = async (cursor: string | null = null) => {
     try {
       const config = {
         headers: { Authorization: `Bearer ${user.token}` },
+        params: {
+          limit: PAGE_SIZE,
+          statut: filter === "all" ? undefined : filter,
+          cursor: cursor ?? undefined,
+        },
       }
-      console.log("Token:", user.token)
       const response = await axios.get(`${API_URL}/commandes/`, config)
-      setCommandes(response.data)
+      setCommandes((prev) => (cursor ? [...prev, ...response.data.items] : response.data.items))
+      setNextCursor(response.data.next_cursor)
     } catch (err) {
       console.error("Erreur lors du chargement des commandes", err)
     } finally {
       setLoading(false)
+      setLoadingMore(false)
     }
   }
 
-  const filtered =
-    filter === "all" ? commandes : commandes.filter((c) => c.statut.toLowerCase() === filter.toLowerCase())
+  const loadMore = () => {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    fetchCommandes(nextCursor)
+  }
 
   return (
     <div className="card">
@@ -75,14 +89,14 @@ export default function CommandeList({ user, refreshTrigger }: CommandeListProps
             </tr>
           </thead>
           <tbody>
-            {filtered.length === 0 ? (
+            {commandes.length === 0 ? (
               <tr>
                 <td colSpan={5} style={{ textAlign: "center" }}>
                   Aucune commande
                 </td>
               </tr>
             ) : (
-              filtered.map((commande) => (
+              commandes.map((commande) => (
                 <tr key={commande.id}>
                   <td>{commande.id_commande}</td>
                   <td>{commande.adresse}</td>
@@ -97,6 +111,14 @@ export default function CommandeList({ user, refreshTrigger }: CommandeListProps
           </tbody>
         </table>
       )}
+
+      {!loading && nextCursor && (
+        <div style={{ marginTop: "20px", textAlign: "center" }}>
+          <button className="primary" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? "Chargement..." : "Charger plus"}
+          </button>
+        </div>
+      )}
     </div>
   )
 }